@@ -1,27 +1,101 @@
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.base import BaseSession
 import asyncio
-from config import load_config, set_bot_commands
+import time
+from typing import Tuple
+from config import Config, load_config, set_bot_commands
 from database import *
 from keyboards import *
-from database.models import init_db
-from handlers import base, plans, statistics, user
-from database.init_db import create_default_plans
+from handlers import base, plans, search, statistics, user
+from database.init_db import create_default_plans, upgrade_db
+from database.models import SessionLocal, engine
+from database.user import identity_cache
+from middlewares import (
+    DbSessionMiddleware,
+    EditDedupMiddleware,
+    MetricsStorage,
+    RateLimitMiddleware,
+    register_cache,
+    setup_metrics,
+)
+from prometheus_client import start_http_server
+from services import DayRolloverScheduler, TaskToggleBuffer
+from states.storage import OrderedEventIsolation, create_storage
+from utils import logger, plan_render_stats
+from webhook import run_webhook
 
 
-async def main():
-    init_db()
-    create_default_plans()
-    config = load_config()
-    bot = Bot(token=config.bot_token)
-    dp = Dispatcher()
+def create_app(
+    config: Config, session: BaseSession | None = None, rate_limit: bool = True
+) -> Tuple[Bot, Dispatcher]:
+    """
+    Создает бота и диспетчер со всеми middleware и роутерами
+    :param config: Конфигурация
+    :param session: HTTP-сессия бота, по умолчанию aiohttp
+    :param rate_limit: Подключить ограничитель частоты запросов к Bot API
+    :return: Бот и диспетчер
+    """
+    bot = Bot(token=config.bot_token, session=session)
+    edit_dedup = EditDedupMiddleware(maxsize=config.message_state_cache_size)
+    bot.session.middleware(edit_dedup)
+    if rate_limit:
+        bot.session.middleware(
+            RateLimitMiddleware(
+                global_rate=config.tg_global_rate,
+                chat_rate=config.tg_chat_rate,
+                group_rate=config.tg_group_rate,
+            )
+        )
+    update_ordering = OrderedEventIsolation(max_concurrency=config.update_concurrency)
+    dp = Dispatcher(
+        storage=MetricsStorage(create_storage(config, SessionLocal)),
+        events_isolation=update_ordering,
+    )
+    setup_metrics(dp, bot, engine)
+    register_cache("identity", identity_cache.stats)
+    register_cache("plan_render", plan_render_stats)
+    dp.update.outer_middleware(DbSessionMiddleware(session_pool=SessionLocal))
+    dp["edit_dedup"] = edit_dedup
+    dp["update_ordering"] = update_ordering
+    dp.shutdown.register(edit_dedup.report)
+    toggle_buffer = TaskToggleBuffer(SessionLocal, delay=config.toggle_flush_delay)
+    dp["toggle_buffer"] = toggle_buffer
+    dp.shutdown.register(toggle_buffer.close)
+    rollover = DayRolloverScheduler(
+        bot,
+        SessionLocal,
+        toggle_buffer=toggle_buffer,
+        interval=config.rollover_interval,
+        window=config.rollover_window,
+    )
+    dp["rollover"] = rollover
+    dp.startup.register(rollover.start)
+    dp.shutdown.register(rollover.close)
 
     dp.include_router(user.router)
     dp.include_router(plans.router)
     dp.include_router(statistics.router)
+    dp.include_router(search.router)
     dp.include_router(base.router)
+    return bot, dp
+
+
+async def main():
+    started_at = time.perf_counter()
+    if await upgrade_db():
+        await create_default_plans()
+    logger.info(f"Database ready in {(time.perf_counter() - started_at) * 1000:.1f} ms")
+    config = load_config()
+    bot, dp = create_app(config)
 
     await set_bot_commands(bot)
-    await dp.start_polling(bot)
+    logger.info(f"Cold start finished in {time.perf_counter() - started_at:.3f} s")
+    if config.webhook_url:
+        await run_webhook(dp, bot, config)
+    else:
+        if config.metrics_port:
+            start_http_server(config.metrics_port, addr=config.webapp_host)
+        await dp.start_polling(bot)
 
 
 if __name__ == "__main__":
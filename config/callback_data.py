@@ -16,6 +16,18 @@ class PlansView(CallbackData, prefix="plans_view"):
     plan_type: PlanType
 
 
+class PlansPage(CallbackData, prefix="plans_page"):
+    """
+    Переход между страницами списка планов. cursor — ID плана в hex
+    (32 символа), чтобы упакованные данные укладывались в 64 байта
+    """
+
+    plan_type: Literal["base", "user"]
+    cursor: str
+    before: bool = False
+    from_types: bool = False
+
+
 class TaskAction(CallbackData, prefix="task_action"):
     action: Literal["edit", "add", "toggle", "add_after"]
     task_index: int | None = None
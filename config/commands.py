@@ -6,8 +6,11 @@ BOT_COMMANDS = [
     BotCommand(command="info", description="О планировании"),
     BotCommand(command="create_plan", description="Создать новый план"),
     BotCommand(command="view_plans", description="Посмотреть планы"),
+    BotCommand(command="find", description="Найти план"),
     BotCommand(command="new_day", description="Начать новый день"),
     BotCommand(command="statistics", description="Посмотреть статистику"),
+    BotCommand(command="leaderboard", description="Рейтинг группы за неделю"),
+    BotCommand(command="timezone", description="Часовой пояс чата"),
 ]
 
 
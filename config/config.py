@@ -8,7 +8,70 @@ load_dotenv()
 @dataclass
 class Config:
     bot_token: str
+    database_url: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_timeout: float
+    db_pool_recycle: int
+    db_pool_pre_ping: bool
+    db_statement_timeout: float
+    fsm_storage: str
+    redis_url: str | None
+    webhook_url: str | None
+    webhook_path: str
+    webhook_secret: str | None
+    webhook_max_concurrency: int
+    update_concurrency: int
+    webapp_host: str
+    webapp_port: int
+    toggle_flush_delay: float
+    tg_global_rate: float
+    tg_chat_rate: float
+    tg_group_rate: float
+    user_cache_size: int
+    user_cache_ttl: float
+    plan_render_cache_size: int
+    message_state_cache_size: int
+    metrics_port: int | None
+    default_timezone: str
+    rollover_interval: float
+    rollover_window: float
 
 
 def load_config() -> Config:
-    return Config(bot_token=os.getenv("BOT_TOKEN"))
+    return Config(
+        bot_token=os.getenv("BOT_TOKEN"),
+        database_url=os.getenv(
+            "DATABASE_URL",
+            "postgresql+asyncpg://plans_user:plans_password@db:5432/plans_db",
+        ),
+        db_pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+        db_max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        db_pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        db_pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        db_pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        db_statement_timeout=float(os.getenv("DB_STATEMENT_TIMEOUT", "30")),
+        fsm_storage=os.getenv("FSM_STORAGE", "sql"),
+        redis_url=os.getenv("REDIS_URL"),
+        webhook_url=os.getenv("WEBHOOK_URL"),
+        webhook_path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        webhook_secret=os.getenv("WEBHOOK_SECRET"),
+        webhook_max_concurrency=int(os.getenv("WEBHOOK_MAX_CONCURRENCY", "100")),
+        update_concurrency=int(os.getenv("UPDATE_CONCURRENCY", "100")),
+        webapp_host=os.getenv("WEBAPP_HOST", "0.0.0.0"),
+        webapp_port=int(os.getenv("WEBAPP_PORT", "8080")),
+        toggle_flush_delay=float(os.getenv("TOGGLE_FLUSH_DELAY", "0.5")),
+        tg_global_rate=float(os.getenv("TG_GLOBAL_RATE", "30")),
+        tg_chat_rate=float(os.getenv("TG_CHAT_RATE", "1")),
+        tg_group_rate=float(os.getenv("TG_GROUP_RATE_PER_MINUTE", "20")) / 60,
+        user_cache_size=int(os.getenv("USER_CACHE_SIZE", "10000")),
+        user_cache_ttl=float(os.getenv("USER_CACHE_TTL", "60")),
+        plan_render_cache_size=int(os.getenv("PLAN_RENDER_CACHE_SIZE", "2048")),
+        message_state_cache_size=int(os.getenv("MESSAGE_STATE_CACHE_SIZE", "10000")),
+        metrics_port=(
+            int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None
+        ),
+        default_timezone=os.getenv("DEFAULT_TIMEZONE", "UTC"),
+        rollover_interval=float(os.getenv("ROLLOVER_INTERVAL", "60")),
+        rollover_window=float(os.getenv("ROLLOVER_WINDOW", "900")),
+    )
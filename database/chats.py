@@ -0,0 +1,55 @@
+from datetime import date, datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import load_config
+from database.cache import TTLCache
+from database.database import transaction
+from database.models import ChatSettings
+
+config = load_config()
+
+timezone_cache = TTLCache(maxsize=config.user_cache_size, ttl=config.user_cache_ttl)
+
+
+def parse_timezone(name: str) -> ZoneInfo | None:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+async def get_chat_timezone(session: AsyncSession, chat_id: int) -> ZoneInfo:
+    """
+    Возвращает часовой пояс чата или часовой пояс по умолчанию
+    :param session: Сессия базы данных
+    :param chat_id: ID чата (для личных чатов совпадает с Telegram ID)
+    :return: ZoneInfo чата
+    """
+    name = timezone_cache.get(chat_id)
+    if name is None:
+        name = await session.scalar(
+            select(ChatSettings.timezone).filter(ChatSettings.chat_id == chat_id)
+        )
+        name = name or config.default_timezone
+        timezone_cache.set(chat_id, name)
+    return parse_timezone(name) or ZoneInfo("UTC")
+
+
+async def get_chat_today(session: AsyncSession, chat_id: int) -> date:
+    return datetime.now(await get_chat_timezone(session, chat_id)).date()
+
+
+async def set_chat_timezone(session: AsyncSession, chat_id: int, name: str) -> bool:
+    if parse_timezone(name) is None:
+        return False
+
+    async with transaction(session):
+        settings = await session.get(ChatSettings, chat_id)
+        if settings:
+            settings.timezone = name
+        else:
+            session.add(ChatSettings(chat_id=chat_id, timezone=name))
+    timezone_cache.invalidate(chat_id)
+    return True
@@ -1,40 +1,28 @@
-from contextlib import contextmanager
-from sqlalchemy.orm import Session
-from database.models import SessionLocal
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from sqlalchemy.ext.asyncio import AsyncSession
 import logging
 
 logger = logging.getLogger(__name__)
 
-
-class Database:
-    def __init__(self):
-        self._session = None
-
-    @property
-    def session(self) -> Session:
-        if self._session is None:
-            self._session = SessionLocal()
-        return self._session
-
-    def close(self):
-        if self._session:
-            self._session.close()
-            self._session = None
-
-    @contextmanager
-    def transaction(self):
-        try:
-            yield
-            self.session.commit()
-        except Exception as e:
-            logger.error(f"Database transaction error: {str(e)}")
-            self.session.rollback()
-            self.close()
-            raise
-
-    def refresh_session(self):
-        self.close()
-        return self.session
-
-
-db = Database()
+# Сессия обновления, которое обрабатывается в текущей задаче.
+# Ее открывает и фиксирует DbSessionMiddleware
+update_session: ContextVar[AsyncSession | None] = ContextVar(
+    "update_session", default=None
+)
+
+
+@asynccontextmanager
+async def transaction(session: AsyncSession):
+    """
+    Выполняет блок в точке сохранения внутри транзакции обновления.
+    При ошибке откатывается только этот блок: изменения, сделанные
+    раньше в том же обновлении, и загруженные объекты остаются, а
+    фиксирует транзакцию DbSessionMiddleware
+    """
+    try:
+        async with session.begin_nested():
+            yield session
+    except Exception as e:
+        logger.error(f"Database transaction error: {str(e)}")
+        raise
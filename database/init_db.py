@@ -1,8 +1,55 @@
-from database.models import init_db, Base, Plan, Task, engine
-from database.database import db
+import asyncio
+from pathlib import Path
+from alembic import command
+from alembic.config import Config as AlembicConfig
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, select
+from sqlalchemy.engine import Connection
+from database.models import Plan, SessionLocal, engine
+from database.plan import create_plans_bulk
+import logging
 
+logger = logging.getLogger(__name__)
 
-def create_default_plans():
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+INITIAL_REVISION = "0001"
+
+
+def get_alembic_config() -> AlembicConfig:
+    alembic_config = AlembicConfig(str(ALEMBIC_INI))
+    alembic_config.attributes["configure_logger"] = False
+    return alembic_config
+
+
+def run_upgrade(connection: Connection, alembic_config: AlembicConfig) -> bool:
+    head = ScriptDirectory.from_config(alembic_config).get_current_head()
+    current = MigrationContext.configure(connection).get_current_revision()
+    if current == head:
+        return False
+
+    logger.info(f"Upgrading database schema from {current} to {head}")
+    if connection.dialect.name == "postgresql":
+        # Построение индексов может идти дольше DB_STATEMENT_TIMEOUT
+        connection.exec_driver_sql("SET LOCAL statement_timeout = 0")
+    alembic_config.attributes["connection"] = connection
+    if current is None and inspect(connection).has_table("users"):
+        # Schema was created by the old create_all() bootstrap
+        command.stamp(alembic_config, INITIAL_REVISION)
+    command.upgrade(alembic_config, "head")
+    return True
+
+
+async def upgrade_db() -> bool:
+    """
+    Приводит схему базы данных к последней миграции
+    :return: True, если были применены миграции
+    """
+    async with engine.begin() as connection:
+        return await connection.run_sync(run_upgrade, get_alembic_config())
+
+
+async def create_default_plans():
     default_plans = [
         (
             "Стандартный день",
@@ -18,27 +65,38 @@ def create_default_plans():
         ),
     ]
 
-    with db.transaction():
-        existing_plans = db.session.query(Plan).filter(~Plan.users.any()).all()
-        if not existing_plans:
-            for name, tasks in default_plans:
-                plan = Plan(name=name)
-                db.session.add(plan)
-                db.session.flush()
+    async with SessionLocal.begin() as session:
+        existing_names = set(
+            await session.scalars(
+                select(Plan.name)
+                .filter(Plan.name.in_([name for name, _ in default_plans]))
+                .filter(~Plan.users.any())
+            )
+        )
+        await create_plans_bulk(
+            session,
+            [
+                (
+                    name,
+                    [
+                        task.strip("- ")
+                        for task in tasks.split("\n")
+                        if task.strip().startswith("-")
+                    ],
+                )
+                for name, tasks in default_plans
+                if name not in existing_names
+            ],
+        )
 
-                tasks_list = [
-                    task.strip("- ")
-                    for task in tasks.split("\n")
-                    if task.strip().startswith("-")
-                ]
-                for task_text in tasks_list:
-                    task = Task(plan_id=plan.id, body=task_text)
-                    db.session.add(task)
 
-
-if __name__ == "__main__":
-    print("Initializing database...")
-    init_db()
+async def main():
+    print("Applying migrations...")
+    await upgrade_db()
     print("Creating default plans...")
-    create_default_plans()
+    await create_default_plans()
     print("Database initialized successfully!")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
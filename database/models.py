@@ -1,8 +1,9 @@
 import uuid
 from sqlalchemy import (
+    DDL,
     BigInteger,
-    create_engine,
     Column,
+    Date,
     Integer,
     String,
     Text,
@@ -10,20 +11,43 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Float,
+    Index,
+    JSON,
     Table,
+    TypeDecorator,
+    event,
 )
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship, sessionmaker
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from config import load_config
 
 Base = declarative_base()
 
+
+class UUIDType(TypeDecorator):
+    """
+    UUID, который принимает и строковое представление: ID планов и задач
+    приходят из callback data и состояния FSM строками. PostgreSQL
+    приводит их сам, а SQLite ожидает объект uuid.UUID
+    """
+
+    impl = UUID
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if isinstance(value, str):
+            return uuid.UUID(value)
+        return value
+
+
 user_plans = Table(
     "user_plans",
     Base.metadata,
-    Column("user_id", UUID(as_uuid=True), ForeignKey("users.id")),
-    Column("plan_id", UUID(as_uuid=True), ForeignKey("plans.id")),
+    Column("user_id", UUIDType(as_uuid=True), ForeignKey("users.id"), primary_key=True),
+    Column("plan_id", UUIDType(as_uuid=True), ForeignKey("plans.id"), primary_key=True),
     Column("created_at", DateTime(timezone=True), server_default=func.now()),
     Column(
         "updated_at",
@@ -31,18 +55,22 @@ user_plans = Table(
         server_default=func.now(),
         onupdate=func.now(),
     ),
+    Index("ix_user_plans_plan_id", "plan_id"),
+    Index("ix_user_plans_user_created", "user_id", "created_at", "plan_id"),
 )
 
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDType(as_uuid=True), primary_key=True, default=uuid.uuid4)
     telegram_id = Column(BigInteger, unique=True, nullable=False)
     name = Column(String, nullable=False)
-    current_plan_id = Column(UUID(as_uuid=True), ForeignKey("plans.id"), nullable=True)
+    current_plan_id = Column(
+        UUIDType(as_uuid=True), ForeignKey("plans.id"), nullable=True
+    )
     published_plan_id = Column(
-        UUID(as_uuid=True), ForeignKey("plans.id"), nullable=True
+        UUIDType(as_uuid=True), ForeignKey("plans.id"), nullable=True
     )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
@@ -59,24 +87,35 @@ class User(Base):
 class Plan(Base):
     __tablename__ = "plans"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(UUIDType(as_uuid=True), primary_key=True, default=uuid.uuid4)
     name = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
     )
 
     users = relationship("User", secondary=user_plans, back_populates="plans")
-    tasks = relationship("Task", back_populates="plan")
+    tasks = relationship("Task", back_populates="plan", order_by="Task.position")
     statistics = relationship("Statistic", back_populates="plan")
 
 
+Index("ix_plans_created_at_id", Plan.created_at, Plan.id)
+Index(
+    "ix_plans_name_trgm",
+    Plan.name,
+    postgresql_using="gin",
+    postgresql_ops={"name": "gin_trgm_ops"},
+)
+
+
 class Task(Base):
     __tablename__ = "tasks"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    plan_id = Column(UUID(as_uuid=True), ForeignKey("plans.id"), nullable=False)
+    id = Column(UUIDType(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    plan_id = Column(UUIDType(as_uuid=True), ForeignKey("plans.id"), nullable=False)
     body = Column(Text, nullable=False)
+    position = Column(Integer, default=0, nullable=False)
     checked = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
@@ -87,12 +126,59 @@ class Task(Base):
     comments = relationship("Comment", back_populates="task")
 
 
+Index("ix_tasks_plan_id_position", Task.plan_id, Task.position)
+Index(
+    "ix_tasks_body_trgm",
+    Task.body,
+    postgresql_using="gin",
+    postgresql_ops={"body": "gin_trgm_ops"},
+)
+
+
+def sqlite_search_index(model, column: str) -> None:
+    """
+    Триграммный индекс FTS5 <таблица>_search для SQLite — замена GIN-индекса
+    pg_trgm. Текст индекс читает из самой таблицы по rowid, триггеры
+    обновляют его при изменении строк. VACUUM может перенумеровать rowid,
+    после него индекс пересобирается командой
+    INSERT INTO <таблица>_search(<таблица>_search) VALUES ('rebuild')
+    :param model: Модель с текстовой колонкой
+    :param column: Имя колонки
+    """
+    table = model.__tablename__
+    fts = f"{table}_search"
+    remove = f"INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.rowid, old.{column});"
+    add = f"INSERT INTO {fts}(rowid, {column}) VALUES (new.rowid, new.{column});"
+    for statement in (
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, content='{table}', "
+        "content_rowid='rowid', tokenize='trigram')",
+        f"CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN {add} END",
+        f"CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN {remove} END",
+        f"CREATE TRIGGER {fts}_update AFTER UPDATE OF {column} ON {table} "
+        f"BEGIN {remove} {add} END",
+    ):
+        event.listen(
+            model.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite")
+        )
+    event.listen(
+        model.__table__,
+        "before_drop",
+        DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect="sqlite"),
+    )
+
+
+sqlite_search_index(Plan, "name")
+sqlite_search_index(Task, "body")
+
+
 class Comment(Base):
     __tablename__ = "comments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    task_id = Column(UUID(as_uuid=True), ForeignKey("tasks.id"), nullable=False)
-    author_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    id = Column(UUIDType(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    task_id = Column(
+        UUIDType(as_uuid=True), ForeignKey("tasks.id"), nullable=False, index=True
+    )
+    author_id = Column(UUIDType(as_uuid=True), ForeignKey("users.id"), nullable=False)
     body = Column(Text, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
@@ -106,13 +192,16 @@ class Comment(Base):
 class Statistic(Base):
     __tablename__ = "statistics"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    plan_id = Column(UUID(as_uuid=True), ForeignKey("plans.id"), nullable=False)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
+    id = Column(UUIDType(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    plan_id = Column(
+        UUIDType(as_uuid=True), ForeignKey("plans.id"), nullable=False, index=True
+    )
+    user_id = Column(UUIDType(as_uuid=True), ForeignKey("users.id"), nullable=False)
     group_id = Column(BigInteger, nullable=True)
     total_tasks = Column(Integer, nullable=False)
     completed_tasks = Column(Integer, nullable=False)
     study_hours = Column(Float, nullable=False)
+    local_date = Column(Date, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(
         DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
@@ -122,20 +211,126 @@ class Statistic(Base):
     user = relationship("User", back_populates="statistics")
 
 
-DATABASE_URL = "postgresql://plans_user:plans_password@db:5432/plans_db"
+Index(
+    "ix_statistics_user_plan_created",
+    Statistic.user_id,
+    Statistic.plan_id,
+    Statistic.created_at.desc(),
+)
+Index(
+    "ix_statistics_group_local_date",
+    Statistic.group_id,
+    Statistic.local_date,
+    postgresql_include=["completed_tasks", "study_hours"],
+)
+
+
+class ChatSettings(Base):
+    __tablename__ = "chat_settings"
+
+    chat_id = Column(BigInteger, primary_key=True)
+    timezone = Column(String, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+class GroupDayMember(Base):
+    """
+    Участник текущего дня группы: пользователь опубликовал план в группе
+    и еще не завершил день. Записи удаляются при завершении дня вручную
+    или при смене дня по часовому поясу группы
+    """
+
+    __tablename__ = "group_day_members"
+
+    group_id = Column(BigInteger, primary_key=True)
+    user_id = Column(UUIDType(as_uuid=True), ForeignKey("users.id"), primary_key=True)
+    plan_id = Column(UUIDType(as_uuid=True), ForeignKey("plans.id"), nullable=False)
+    published_at = Column(DateTime(timezone=True), nullable=False)
+
+
+Index("ix_group_day_members_plan_id", GroupDayMember.plan_id)
+
+
+class DailyStatistic(Base):
+    __tablename__ = "statistics_daily"
+
+    scope = Column(String(8), primary_key=True)
+    owner_id = Column(BigInteger, primary_key=True)
+    day = Column(Date, primary_key=True)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    study_hours = Column(Float, default=0, nullable=False)
+
+
+class LifetimeStatistic(Base):
+    __tablename__ = "statistics_lifetime"
+
+    scope = Column(String(8), primary_key=True)
+    owner_id = Column(BigInteger, primary_key=True)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    study_hours = Column(Float, default=0, nullable=False)
+
+
+class GroupLeaderboard(Base):
+    __tablename__ = "group_leaderboard"
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    group_id = Column(BigInteger, primary_key=True)
+    week_start = Column(Date, primary_key=True)
+    telegram_id = Column(BigInteger, primary_key=True)
+    total_tasks = Column(Integer, default=0, nullable=False)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    study_hours = Column(Float, default=0, nullable=False)
 
 
-def init_db():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+Index(
+    "ix_group_leaderboard_rank",
+    GroupLeaderboard.group_id,
+    GroupLeaderboard.week_start,
+    GroupLeaderboard.completed_tasks.desc(),
+    GroupLeaderboard.study_hours.desc(),
+)
+
+
+class FsmRecord(Base):
+    __tablename__ = "fsm_storage"
+
+    key = Column(String, primary_key=True)
+    state = Column(String, nullable=True)
+    data = Column(JSON, default=dict, nullable=False)
+    updated_at = Column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now()
+    )
+
+
+def connect_args(config) -> dict:
+    """
+    Ограничивает время SQL-запроса на стороне PostgreSQL: медленный
+    запрос прерывается и возвращает соединение в пул, а не держит его,
+    пока обновления других чатов ждут свободного соединения
+    """
+    if not config.db_statement_timeout or not config.database_url.startswith(
+        "postgresql+asyncpg"
+    ):
+        return {}
+    timeout = str(int(config.db_statement_timeout * 1000))
+    return {"server_settings": {"statement_timeout": timeout}}
+
+
+config = load_config()
+
+engine = create_async_engine(
+    config.database_url,
+    pool_size=config.db_pool_size,
+    max_overflow=config.db_max_overflow,
+    pool_timeout=config.db_pool_timeout,
+    pool_recycle=config.db_pool_recycle,
+    pool_pre_ping=config.db_pool_pre_ping,
+    connect_args=connect_args(config),
+)
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
 
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
@@ -1,169 +1,401 @@
-from typing import List
-from database.models import Comment, Plan, User, Task, user_plans
-from database.database import db
+import uuid
+from dataclasses import dataclass
+from typing import Dict, List, Literal, Sequence, Tuple
+from sqlalchemy import Table, case, delete, func, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from database.models import Comment, GroupDayMember, Plan, User, Task, user_plans
+from database.database import transaction
+from database.user import forget_user, get_user_identity
 import logging
 
 logger = logging.getLogger(__name__)
 
+plan_content = (
+    selectinload(Plan.tasks).selectinload(Task.comments).selectinload(Comment.author)
+)
+
+PLANS_PAGE_SIZE = 10
+
+
+@dataclass(frozen=True)
+class PlanPage:
+    plans: List[Plan]
+    prev_cursor: str | None
+    next_cursor: str | None
+
+
+async def load_plan_for_render(session: AsyncSession, plan_id: str) -> Plan | None:
+    """
+    Загружает план вместе с задачами, комментариями и их авторами
+    за фиксированное число запросов, независимо от количества задач
+    :param session: Сессия базы данных
+    :param plan_id: ID плана
+    :return: План, готовый к отрисовке, или None
+    """
+    return await session.scalar(
+        select(Plan).filter(Plan.id == plan_id).options(plan_content)
+    )
+
+
+async def bump_plan_version(session: AsyncSession, *criteria) -> None:
+    """
+    Увеличивает версию планов после изменения названия, задач или
+    комментариев. Загруженным в эту сессию экземплярам ставится версия None:
+    их содержимое в памяти может отставать от базы, и такие планы
+    отрисовываются мимо кэша
+    :param session: Сессия базы данных
+    :param criteria: Условия выборки изменившихся планов
+    """
+    result = await session.execute(
+        update(Plan)
+        .filter(*criteria)
+        .values(version=Plan.version + 1)
+        .returning(Plan.id)
+        .execution_options(synchronize_session=False)
+    )
+    for plan_id in result.scalars():
+        plan = session.identity_map.get(identity_key(Plan, plan_id))
+        if plan is not None:
+            set_committed_value(plan, "version", None)
+
+
+async def get_accessible_plan(
+    session: AsyncSession,
+    plan_type: Literal["base", "user"],
+    telegram_id: int,
+    plan_id: str,
+) -> Plan | None:
+    """
+    Загружает план по первичному ключу, если он доступен пользователю:
+    базовый план — если у него нет владельцев, пользовательский — если
+    он принадлежит пользователю. Проверка входит в тот же запрос
+    :param session: Сессия базы данных
+    :param plan_type: base или user
+    :param telegram_id: Telegram ID пользователя
+    :param plan_id: ID плана из callback data
+    :return: План, готовый к отрисовке, или None
+    """
+    try:
+        plan_id = uuid.UUID(plan_id)
+    except ValueError:
+        return None
 
-def get_base_plans() -> List[Plan]:
-    return db.session.query(Plan).filter(~Plan.users.any()).all()
-
+    query = select(Plan).filter(Plan.id == plan_id).options(plan_content)
+    if plan_type == "base":
+        query = query.filter(~Plan.users.any())
+    else:
+        user = await get_user_identity(session, telegram_id)
+        if not user:
+            return None
+        query = query.join(user_plans, Plan.id == user_plans.c.plan_id).filter(
+            user_plans.c.user_id == user.id
+        )
+    return await session.scalar(query)
+
+
+async def get_plans_page(
+    session: AsyncSession,
+    plan_type: Literal["base", "user"],
+    telegram_id: int,
+    cursor: str | None = None,
+    before: bool = False,
+    limit: int = PLANS_PAGE_SIZE,
+) -> PlanPage:
+    """
+    Возвращает страницу базовых или пользовательских планов. Пагинация
+    по ключу (created_at, id): страница начинается сразу после плана-курсора
+    (или перед ним), поэтому дальние страницы стоят столько же, сколько первая
+    :param session: Сессия базы данных
+    :param plan_type: base или user
+    :param telegram_id: Telegram ID пользователя
+    :param cursor: ID плана, на котором закончилась (или началась) прошлая
+        страница, или None для первой страницы
+    :param before: Листать назад, к планам перед курсором
+    :param limit: Размер страницы
+    :return: Планы страницы и курсоры соседних страниц
+    """
+    empty = PlanPage([], None, None)
+    try:
+        cursor = uuid.UUID(cursor) if cursor else None
+    except ValueError:
+        cursor = None
 
-def get_user_plans(user_id: str) -> List[Plan]:
     try:
-        with db.transaction():
-            return (
-                db.session.query(Plan)
-                .filter(Plan.users.any(User.telegram_id == user_id))
-                .all()
+        # Точка сохранения: при ошибке откатывается только этот запрос,
+        # а не все, что обновление уже записало в свою транзакцию
+        async with transaction(session):
+            if plan_type == "base":
+                created_at, key = Plan.created_at, Plan.id
+                query = select(Plan).filter(~Plan.users.any())
+                cursor_created_at = select(Plan.created_at).filter(Plan.id == cursor)
+            else:
+                user = await get_user_identity(session, telegram_id)
+                if not user:
+                    return empty
+                created_at, key = user_plans.c.created_at, user_plans.c.plan_id
+                query = (
+                    select(Plan)
+                    .join(user_plans, Plan.id == user_plans.c.plan_id)
+                    .filter(user_plans.c.user_id == user.id)
+                )
+                cursor_created_at = select(user_plans.c.created_at).filter(
+                    user_plans.c.user_id == user.id, user_plans.c.plan_id == cursor
+                )
+
+            if cursor is None:
+                before = False
+            else:
+                position = tuple_(created_at, key)
+                anchor = tuple_(cursor_created_at.scalar_subquery(), cursor)
+                query = query.filter(position < anchor if before else position > anchor)
+
+            if before:
+                query = query.order_by(created_at.desc(), key.desc())
+            else:
+                query = query.order_by(created_at, key)
+
+            plans = list(await session.scalars(query.limit(limit + 1)))
+            has_more = len(plans) > limit
+            plans = plans[:limit]
+            if before:
+                plans.reverse()
+            if not plans:
+                if cursor is not None:
+                    return await get_plans_page(session, plan_type, telegram_id)
+                return empty
+
+            has_prev, has_next = (
+                (has_more, True) if before else (cursor is not None, has_more)
+            )
+            return PlanPage(
+                plans,
+                plans[0].id.hex if has_prev else None,
+                plans[-1].id.hex if has_next else None,
             )
     except Exception as e:
-        logger.error(f"Error getting user plans: {e}")
-        db.refresh_session()
-        return []
+        logger.error(f"Error getting plans page: {e}")
+        return empty
 
 
-def create_base_plan(name: str) -> Plan:
+async def create_base_plan(session: AsyncSession, name: str) -> Plan:
     plan = Plan(name=name)
-    with db.transaction():
-        db.session.add(plan)
-        db.session.refresh(plan)
+    async with transaction(session):
+        session.add(plan)
     return plan
 
 
-def create_user_plan(name: str, user_id: str, tasks_text: str = None) -> Plan:
-    try:
-        with db.transaction():
-            user = db.session.query(User).filter(User.telegram_id == user_id).first()
-            if not user:
-                raise ValueError("User not found")
+def split_tasks(tasks_text: str | None) -> List[str]:
+    if not tasks_text:
+        return []
+    return [task.strip() for task in tasks_text.split("\n") if task.strip()]
+
+
+async def insert_rows(session: AsyncSession, table: Table, rows: List[dict]) -> None:
+    if rows:
+        await session.execute(table.insert(), rows)
+
+
+async def create_plans_bulk(
+    session: AsyncSession,
+    plans: Sequence[Tuple[str, Sequence[str]]],
+    owner_id: uuid.UUID | None = None,
+) -> List[uuid.UUID]:
+    """
+    Создает планы вместе с задачами. ID генерируются на стороне клиента,
+    поэтому планы, связи с пользователем и задачи вставляются одним
+    пакетным INSERT на таблицу без промежуточных flush и RETURNING
+    :param session: Сессия базы данных
+    :param plans: Список пар (название плана, тексты задач)
+    :param owner_id: ID пользователя-владельца или None для базовых планов
+    :return: ID созданных планов в том же порядке
+    """
+    plan_rows, link_rows, task_rows = [], [], []
+    for name, tasks in plans:
+        plan_id = uuid.uuid4()
+        plan_rows.append({"id": plan_id, "name": name})
+        if owner_id is not None:
+            link_rows.append({"user_id": owner_id, "plan_id": plan_id})
+        task_rows.extend(
+            {
+                "id": uuid.uuid4(),
+                "plan_id": plan_id,
+                "body": body,
+                "position": position,
+                "checked": False,
+            }
+            for position, body in enumerate(tasks)
+        )
 
-            plan = Plan(name=name)
-            plan.users.append(user)
-            db.session.add(plan)
-            db.session.flush()
+    async with transaction(session):
+        await insert_rows(session, Plan.__table__, plan_rows)
+        await insert_rows(session, user_plans, link_rows)
+        await insert_rows(session, Task.__table__, task_rows)
 
-            if tasks_text:
-                tasks = [
-                    task.strip() for task in tasks_text.split("\n") if task.strip()
-                ]
-                for task_body in tasks:
-                    task = Task(plan_id=plan.id, body=task_body)
-                    db.session.add(task)
+    return [row["id"] for row in plan_rows]
 
-            db.session.commit()
-            return plan
 
-    except Exception as e:
-        logger.error(f"Database transaction error: {e}")
-        db.session.rollback()
-        raise
+async def create_user_plan(
+    session: AsyncSession, name: str, user_id: int, tasks_text: str = None
+) -> uuid.UUID:
+    user = await get_user_identity(session, user_id)
+    if not user:
+        raise ValueError("User not found")
+
+    plan_ids = await create_plans_bulk(
+        session, [(name, split_tasks(tasks_text))], owner_id=user.id
+    )
+    return plan_ids[0]
 
 
-def get_current_plan(telegram_id: int) -> Plan | None:
-    user = db.session.query(User).filter(User.telegram_id == telegram_id).first()
-    return user.current_plan if user else None
+async def get_current_plan(session: AsyncSession, telegram_id: int) -> Plan | None:
+    user = await get_user_identity(session, telegram_id)
+    if not user or not user.current_plan_id:
+        return None
+    return await load_plan_for_render(session, user.current_plan_id)
 
 
-def set_current_plan(telegram_id: int, plan_id: str) -> bool:
-    with db.transaction():
-        user = db.session.query(User).filter(User.telegram_id == telegram_id).first()
+async def set_current_plan(
+    session: AsyncSession, telegram_id: int, plan_id: str
+) -> bool:
+    async with transaction(session):
+        user = await session.scalar(
+            select(User).filter(User.telegram_id == telegram_id)
+        )
         if not user:
             return False
 
-        plan = db.session.query(Plan).filter(Plan.id == plan_id).first()
+        plan = await session.scalar(select(Plan).filter(Plan.id == plan_id))
         if not plan:
             return False
 
-        user.current_plan = plan
+        user.current_plan_id = plan.id
+        forget_user(session, telegram_id)
         return True
 
 
-def add_task_to_plan(plan_id: str, task_body: str) -> Task:
-    task = Task(plan_id=plan_id, body=task_body)
-    with db.transaction():
-        db.session.add(task)
-        db.session.refresh(task)
+async def add_task_to_plan(session: AsyncSession, plan_id: str, task_body: str) -> Task:
+    async with transaction(session):
+        position = await session.scalar(
+            select(func.coalesce(func.max(Task.position) + 1, 0)).filter(
+                Task.plan_id == plan_id
+            )
+        )
+        task = Task(plan_id=plan_id, body=task_body, position=position)
+        session.add(task)
+        await bump_plan_version(session, Plan.id == plan_id)
     return task
 
 
-def get_plan_tasks(plan_id: str) -> List[Task]:
-    return db.session.query(Task).filter(Task.plan_id == plan_id).all()
+async def get_plan_tasks(session: AsyncSession, plan_id: str) -> List[Task]:
+    result = await session.scalars(
+        select(Task).filter(Task.plan_id == plan_id).order_by(Task.position)
+    )
+    return list(result)
 
 
-def update_task(task_id: str, new_body: str) -> bool:
-    with db.transaction():
-        task = db.session.query(Task).filter(Task.id == task_id).first()
+async def update_task(session: AsyncSession, task_id: str, new_body: str) -> bool:
+    async with transaction(session):
+        task = await session.scalar(select(Task).filter(Task.id == task_id))
         if not task:
             return False
         task.body = new_body
+        await bump_plan_version(session, Plan.id == task.plan_id)
         return True
 
 
-def delete_task(task_id: str) -> bool:
-    with db.transaction():
-        task = db.session.query(Task).filter(Task.id == task_id).first()
+async def set_task_checked(session: AsyncSession, task_id: str, checked: bool) -> bool:
+    async with transaction(session):
+        task = await session.get(Task, task_id)
         if not task:
             return False
-        db.session.delete(task)
+        task.checked = checked
+        await bump_plan_version(session, Plan.id == task.plan_id)
         return True
 
 
-def add_comment_to_task(
-    task_id: str, author_telegram_id: int, comment_text: str
+async def set_tasks_checked(session: AsyncSession, checked: Dict[str, bool]) -> int:
+    """
+    Проставляет отметки нескольким задачам одним UPDATE ... CASE.
+    Задачи, уже загруженные в сессию, получают новые значения
+    :param session: Сессия базы данных
+    :param checked: Словарь ID задачи -> новое значение checked
+    :return: Количество обновленных задач
+    """
+    if not checked:
+        return 0
+    async with transaction(session):
+        result = await session.execute(
+            update(Task)
+            .filter(Task.id.in_(list(checked)))
+            .values(
+                checked=case(
+                    *((Task.id == task_id, value) for task_id, value in checked.items())
+                )
+            )
+            .execution_options(synchronize_session=False)
+        )
+        for task_id, value in checked.items():
+            task = session.identity_map.get(identity_key(Task, uuid.UUID(task_id)))
+            if task is not None:
+                set_committed_value(task, "checked", value)
+        await bump_plan_version(
+            session,
+            Plan.id.in_(select(Task.plan_id).filter(Task.id.in_(list(checked)))),
+        )
+        return result.rowcount
+
+
+async def delete_task(session: AsyncSession, task_id: str) -> bool:
+    async with transaction(session):
+        await bump_plan_version(
+            session, Plan.id.in_(select(Task.plan_id).filter(Task.id == task_id))
+        )
+        result = await session.execute(delete(Task).filter(Task.id == task_id))
+        return result.rowcount > 0
+
+
+async def add_comment_to_task(
+    session: AsyncSession, task_id: str, author_telegram_id: int, comment_text: str
 ) -> Comment:
     try:
-        with db.transaction():
-            task = db.session.query(Task).filter(Task.id == task_id).first()
+        async with transaction(session):
+            task = await session.scalar(select(Task).filter(Task.id == task_id))
             if not task:
                 raise ValueError("Task not found")
 
-            user = (
-                db.session.query(User)
-                .filter(User.telegram_id == author_telegram_id)
-                .first()
-            )
+            user = await get_user_identity(session, author_telegram_id)
             if not user:
                 raise ValueError("User not found")
 
             comment = Comment(task_id=task_id, author_id=user.id, body=comment_text)
 
-            db.session.add(comment)
-            db.session.flush()
-            db.session.refresh(comment)
+            session.add(comment)
+            await bump_plan_version(session, Plan.id == task.plan_id)
+            await session.flush()
 
-            return comment
+        return comment
 
     except Exception as e:
         logger.error(f"Error adding comment: {e}")
-        db.session.rollback()
         raise
 
 
-def publish_user_plan(telegram_id: int, plan_id: str) -> bool:
+async def publish_user_plan(
+    session: AsyncSession, telegram_id: int, plan_id: str
+) -> bool:
     try:
-        with db.transaction():
-            user = (
-                db.session.query(User).filter(User.telegram_id == telegram_id).first()
+        async with transaction(session):
+            user = await session.scalar(
+                select(User).filter(User.telegram_id == telegram_id)
             )
             if not user:
                 logger.error(f"User with telegram_id {telegram_id} not found")
                 return False
 
-            plan = db.session.query(Plan).filter(Plan.id == plan_id).first()
-
-            if plan:
-                user.published_plan = plan
-                db.session.commit()
-                return True
-
-            plan = (
-                db.session.query(Plan)
-                .filter(~Plan.users.any())
-                .filter(Plan.id == plan_id)
-                .all()
-            )
+            plan = await session.scalar(select(Plan).filter(Plan.id == plan_id))
 
             if not plan:
                 logger.error(
@@ -171,66 +403,71 @@ def publish_user_plan(telegram_id: int, plan_id: str) -> bool:
                 )
                 return False
 
+            user.published_plan_id = plan.id
+            forget_user(session, telegram_id)
+            return True
+
     except Exception as e:
         logger.error(f"Error publishing plan: {e}")
-        db.session.rollback()
         return False
 
 
-def get_published_plan(telegram_id: int) -> Plan | None:
+async def get_published_plan(session: AsyncSession, telegram_id: int) -> Plan | None:
     try:
-        user = db.session.query(User).filter(User.telegram_id == telegram_id).first()
-        return user.published_plan if user else None
+        user = await get_user_identity(session, telegram_id)
+        if not user or not user.published_plan_id:
+            return None
+        return await load_plan_for_render(session, user.published_plan_id)
     except Exception as e:
         logger.error(f"Error getting published plan: {e}")
         return None
 
 
-def unpublish_user_plan(telegram_id: int) -> bool:
+async def unpublish_user_plan(session: AsyncSession, telegram_id: int) -> bool:
     try:
-        with db.transaction():
-            user = (
-                db.session.query(User).filter(User.telegram_id == telegram_id).first()
+        async with transaction(session):
+            user = await session.scalar(
+                select(User).filter(User.telegram_id == telegram_id)
             )
             if not user or not user.published_plan_id:
                 return False
 
-            user.published_plan = None
+            user.published_plan_id = None
+            forget_user(session, telegram_id)
             return True
     except Exception as e:
         logger.error(f"Error unpublishing plan: {e}")
-        db.session.rollback()
         return False
 
 
-def get_user_published_plans() -> List[tuple[User, Plan]]:
+async def get_user_published_plans(session: AsyncSession) -> List[tuple[User, Plan]]:
     try:
-        return (
-            db.session.query(User, Plan)
-            .join(Plan, User.published_plan_id == Plan.id)
-            .all()
+        result = await session.execute(
+            select(User, Plan).join(Plan, User.published_plan_id == Plan.id)
         )
+        return [tuple(row) for row in result.all()]
     except Exception as e:
         logger.error(f"Error getting published plans: {e}")
         return []
 
 
-def delete_user_plan(telegram_id: int, plan_id: str) -> bool:
+async def delete_user_plan(
+    session: AsyncSession, telegram_id: int, plan_id: str
+) -> bool:
     try:
-        with db.transaction():
-            user = (
-                db.session.query(User).filter(User.telegram_id == telegram_id).first()
+        async with transaction(session):
+            user = await session.scalar(
+                select(User).filter(User.telegram_id == telegram_id)
             )
             if not user:
                 logger.error(f"User with telegram_id {telegram_id} not found")
                 return False
 
-            plan = (
-                db.session.query(Plan)
+            plan = await session.scalar(
+                select(Plan)
                 .join(user_plans, Plan.id == user_plans.c.plan_id)
                 .filter(Plan.id == plan_id)
                 .filter(user_plans.c.user_id == user.id)
-                .first()
             )
 
             if not plan:
@@ -240,48 +477,54 @@ def delete_user_plan(telegram_id: int, plan_id: str) -> bool:
                 return False
 
             if user.current_plan_id == plan.id:
-                user.current_plan = None
+                user.current_plan_id = None
             if user.published_plan_id == plan.id:
-                user.published_plan = None
+                user.published_plan_id = None
+            forget_user(session, telegram_id)
+            await session.flush()
 
-            db.session.query(Task).filter(Task.plan_id == plan.id).delete()
-            db.session.query(Comment).filter(
-                Comment.task_id.in_(
-                    db.session.query(Task.id).filter(Task.plan_id == plan.id)
+            await session.execute(
+                delete(Comment).filter(
+                    Comment.task_id.in_(select(Task.id).filter(Task.plan_id == plan.id))
                 )
-            ).delete()
-
-            db.session.execute(
+            )
+            await session.execute(delete(Task).filter(Task.plan_id == plan.id))
+            await session.execute(
                 user_plans.delete().where(user_plans.c.plan_id == plan.id)
             )
+            await session.execute(
+                delete(GroupDayMember).filter(GroupDayMember.plan_id == plan.id)
+            )
 
-            db.session.delete(plan)
-            db.session.commit()
+            await session.execute(delete(Plan).filter(Plan.id == plan.id))
             return True
 
     except Exception as e:
         logger.error(f"Error deleting plan: {e}")
-        db.session.rollback()
         return False
 
 
-def reset_plan(plan_id: str) -> bool:
+async def reset_plan(session: AsyncSession, plan_id: str) -> bool:
     try:
-        with db.transaction():
-            db.session.query(Task).filter(Task.plan_id == plan_id).update(
-                {Task.checked: False}, synchronize_session=False
+        async with transaction(session):
+            await session.execute(
+                update(Task)
+                .filter(Task.plan_id == plan_id)
+                .values(checked=False)
+                .execution_options(synchronize_session=False)
             )
 
-            db.session.query(Comment).filter(
-                Comment.task_id.in_(
-                    db.session.query(Task.id).filter(Task.plan_id == plan_id)
+            await session.execute(
+                delete(Comment)
+                .filter(
+                    Comment.task_id.in_(select(Task.id).filter(Task.plan_id == plan_id))
                 )
-            ).delete(synchronize_session=False)
+                .execution_options(synchronize_session=False)
+            )
+            await bump_plan_version(session, Plan.id == plan_id)
 
-            db.session.commit()
             return True
 
     except Exception as e:
         logger.error(f"Error resetting plan {plan_id}: {e}")
-        db.session.rollback()
         return False
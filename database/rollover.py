@@ -0,0 +1,257 @@
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from typing import Dict, List, Tuple
+
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.database import transaction
+from database.models import Comment, GroupDayMember, Plan, Statistic, Task, User
+from database.plan import bump_plan_version
+from database.rollups import add_group_day_to_rollups
+from database.user import get_user_identity
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class DigestEntry:
+    name: str
+    completed_tasks: int
+    total_tasks: int
+    study_hours: float
+
+
+async def join_group_day(
+    session: AsyncSession, group_id: int, telegram_id: int, plan_id: str
+) -> None:
+    """
+    Записывает пользователя в участники текущего дня группы. Повторная
+    публикация заменяет план участника
+    :param session: Сессия базы данных
+    :param group_id: ID группы
+    :param telegram_id: Telegram ID пользователя
+    :param plan_id: ID опубликованного плана
+    """
+    try:
+        async with transaction(session):
+            user = await get_user_identity(session, telegram_id)
+            if not user:
+                logger.error(f"User with telegram_id {telegram_id} not found")
+                return
+
+            values = {"plan_id": plan_id, "published_at": datetime.now(timezone.utc)}
+            dialect_insert = (
+                postgresql.insert
+                if session.bind.dialect.name == "postgresql"
+                else sqlite.insert
+            )
+            await session.execute(
+                dialect_insert(GroupDayMember)
+                .values(group_id=group_id, user_id=user.id, **values)
+                .on_conflict_do_update(
+                    index_elements=[GroupDayMember.group_id, GroupDayMember.user_id],
+                    set_=values,
+                )
+            )
+    except Exception as e:
+        logger.error(f"Error joining group day: {e}")
+
+
+async def leave_group_day(
+    session: AsyncSession, group_id: int, telegram_id: int
+) -> None:
+    """
+    Убирает пользователя из участников текущего дня группы, когда он
+    завершил день сам
+    """
+    try:
+        async with transaction(session):
+            user = await get_user_identity(session, telegram_id)
+            if not user:
+                return
+            await session.execute(
+                delete(GroupDayMember).filter(
+                    GroupDayMember.group_id == group_id,
+                    GroupDayMember.user_id == user.id,
+                )
+            )
+    except Exception as e:
+        logger.error(f"Error leaving group day: {e}")
+
+
+async def get_group_days(session: AsyncSession) -> List[Tuple[int, datetime]]:
+    """
+    Возвращает группы с незавершенным днем
+    :param session: Сессия базы данных
+    :return: ID группы и время самой ранней публикации плана в ней
+    """
+    result = await session.execute(
+        select(GroupDayMember.group_id, func.min(GroupDayMember.published_at)).group_by(
+            GroupDayMember.group_id
+        )
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def as_utc(moment: datetime) -> datetime:
+    # SQLite хранит время в UTC без часового пояса и сравнивает его как
+    # текст, поэтому границы приводятся к UTC, а прочитанное время
+    # получает часовой пояс UTC
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+async def get_group_day_plans(
+    session: AsyncSession, group_id: int, boundary: datetime
+) -> List[uuid.UUID]:
+    result = await session.scalars(
+        select(GroupDayMember.plan_id).filter(
+            GroupDayMember.group_id == group_id,
+            GroupDayMember.published_at < as_utc(boundary),
+        )
+    )
+    return list(result)
+
+
+async def roll_over_group(
+    session: AsyncSession, group_id: int, boundary: datetime
+) -> Dict[date, int]:
+    """
+    Завершает день группы: записывает статистику участников, которые
+    не завершили день сами, и сбрасывает отметки и комментарии их планов.
+    Статистика участника пишется на локальную дату его публикации, так что
+    дни, пропущенные, пока бот не работал, получают свои даты.
+    Число запросов не зависит от числа участников. Участники забираются
+    через DELETE ... RETURNING, поэтому два процесса не завершат один
+    день дважды
+    :param session: Сессия базы данных
+    :param group_id: ID группы
+    :param boundary: Начало нового дня с часовым поясом группы
+    :return: Количество участников по завершенным локальным датам
+    """
+    async with transaction(session):
+        members = (
+            await session.execute(
+                delete(GroupDayMember)
+                .filter(
+                    GroupDayMember.group_id == group_id,
+                    GroupDayMember.published_at < as_utc(boundary),
+                )
+                .returning(
+                    GroupDayMember.user_id,
+                    GroupDayMember.plan_id,
+                    GroupDayMember.published_at,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        ).all()
+        if not members:
+            return {}
+
+        members = [
+            (user_id, plan_id, as_utc(published_at).astimezone(boundary.tzinfo).date())
+            for user_id, plan_id, published_at in members
+        ]
+        user_ids = [user_id for user_id, _, _ in members]
+        plan_ids = {plan_id for _, plan_id, _ in members}
+        days = {day for _, _, day in members}
+        counts = {
+            row.plan_id: (row.total_tasks, row.completed_tasks)
+            for row in await session.execute(
+                select(
+                    Task.plan_id,
+                    func.count(Task.id).label("total_tasks"),
+                    func.sum(case((Task.checked, 1), else_=0)).label("completed_tasks"),
+                )
+                .filter(Task.plan_id.in_(plan_ids))
+                .group_by(Task.plan_id)
+            )
+        }
+        finished = set(
+            (
+                await session.execute(
+                    select(Statistic.user_id, Statistic.local_date).filter(
+                        Statistic.group_id == group_id,
+                        Statistic.local_date.in_(days),
+                        Statistic.user_id.in_(user_ids),
+                    )
+                )
+            ).all()
+        )
+        telegram_ids = dict(
+            (
+                await session.execute(
+                    select(User.id, User.telegram_id).filter(User.id.in_(user_ids))
+                )
+            ).all()
+        )
+
+        statistics = []
+        totals: Dict[date, List[Tuple[int, int, int]]] = {}
+        for user_id, plan_id, day in members:
+            if (user_id, day) in finished:
+                continue
+            total_tasks, completed_tasks = counts.get(plan_id, (0, 0))
+            statistics.append(
+                {
+                    "id": uuid.uuid4(),
+                    "plan_id": plan_id,
+                    "user_id": user_id,
+                    "group_id": group_id,
+                    "total_tasks": total_tasks,
+                    "completed_tasks": completed_tasks,
+                    "study_hours": 0,
+                    "local_date": day,
+                }
+            )
+            totals.setdefault(day, []).append(
+                (telegram_ids[user_id], completed_tasks, total_tasks)
+            )
+        if statistics:
+            await session.execute(insert(Statistic), statistics)
+        for day, day_totals in sorted(totals.items()):
+            await add_group_day_to_rollups(session, group_id, day, day_totals)
+
+        await session.execute(
+            update(Task)
+            .filter(Task.plan_id.in_(plan_ids))
+            .values(checked=False)
+            .execution_options(synchronize_session=False)
+        )
+        await session.execute(
+            delete(Comment)
+            .filter(
+                Comment.task_id.in_(select(Task.id).filter(Task.plan_id.in_(plan_ids)))
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await bump_plan_version(session, Plan.id.in_(plan_ids))
+        return dict(sorted(Counter(day for _, _, day in members).items()))
+
+
+async def get_day_digest(
+    session: AsyncSession, group_id: int, day: date
+) -> List[DigestEntry]:
+    """
+    Итоги участников группы за день: и завершивших день сами,
+    и завершенных по расписанию
+    """
+    result = await session.execute(
+        select(
+            User.name,
+            Statistic.completed_tasks,
+            Statistic.total_tasks,
+            Statistic.study_hours,
+        )
+        .join(User, Statistic.user_id == User.id)
+        .filter(Statistic.group_id == group_id, Statistic.local_date == day)
+        .order_by(
+            Statistic.completed_tasks.desc(), Statistic.study_hours.desc(), User.name
+        )
+    )
+    return [DigestEntry(*row) for row in result.all()]
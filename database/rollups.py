@@ -0,0 +1,405 @@
+import asyncio
+import sys
+from datetime import date, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import (
+    Date,
+    cast,
+    delete,
+    func,
+    literal,
+    select,
+    text,
+    type_coerce,
+    union_all,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import (
+    DailyStatistic,
+    GroupLeaderboard,
+    LifetimeStatistic,
+    SessionLocal,
+    Statistic,
+    User,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+USER_SCOPE = "user"
+GROUP_SCOPE = "group"
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def rollup_upsert(dialect_name: str, model, rows: List[dict]):
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    stmt = insert(model).values(rows)
+    key_columns = list(model.__table__.primary_key.columns)
+    return stmt.on_conflict_do_update(
+        index_elements=key_columns,
+        set_={
+            column.name: column + stmt.excluded[column.name]
+            for column in model.__table__.columns
+            if column not in key_columns
+        },
+    )
+
+
+async def add_to_rollups(
+    session: AsyncSession,
+    telegram_id: int,
+    group_id: int | None,
+    day: date,
+    completed_tasks: int,
+    study_hours: float,
+    total_tasks: int = 0,
+) -> None:
+    """
+    Прибавляет изменение статистики к дневным и общим итогам пользователя
+    и группы и к недельному рейтингу группы. Вызывается внутри
+    транзакции, которая меняет statistics
+    :param session: Сессия базы данных
+    :param telegram_id: Telegram ID пользователя
+    :param group_id: ID группы или None
+    :param day: Локальная дата записи статистики в часовом поясе чата
+    :param completed_tasks: Изменение числа выполненных задач
+    :param study_hours: Изменение часов обучения
+    :param total_tasks: Изменение общего числа задач
+    """
+    if not completed_tasks and not study_hours and not total_tasks:
+        return
+
+    owners = [(USER_SCOPE, telegram_id)]
+    if group_id is not None:
+        owners.append((GROUP_SCOPE, group_id))
+
+    values = {"completed_tasks": completed_tasks, "study_hours": study_hours}
+    dialect_name = session.bind.dialect.name
+    await session.execute(
+        rollup_upsert(
+            dialect_name,
+            DailyStatistic,
+            [
+                {"scope": scope, "owner_id": owner_id, "day": day, **values}
+                for scope, owner_id in owners
+            ],
+        )
+    )
+    await session.execute(
+        rollup_upsert(
+            dialect_name,
+            LifetimeStatistic,
+            [
+                {"scope": scope, "owner_id": owner_id, **values}
+                for scope, owner_id in owners
+            ],
+        )
+    )
+    if group_id is None:
+        return
+
+    await session.execute(
+        rollup_upsert(
+            dialect_name,
+            GroupLeaderboard,
+            [
+                {
+                    "group_id": group_id,
+                    "week_start": week_start(day),
+                    "telegram_id": telegram_id,
+                    "total_tasks": total_tasks,
+                    **values,
+                }
+            ],
+        )
+    )
+
+
+async def add_group_day_to_rollups(
+    session: AsyncSession,
+    group_id: int,
+    day: date,
+    totals: List[Tuple[int, int, int]],
+) -> None:
+    """
+    То же, что add_to_rollups для каждого участника группы, но тремя
+    запросами на всю группу
+    :param session: Сессия базы данных
+    :param group_id: ID группы
+    :param day: Локальная дата в часовом поясе группы
+    :param totals: Telegram ID, выполненные задачи и всего задач участника
+    """
+    totals = [row for row in totals if row[1] or row[2]]
+    if not totals:
+        return
+
+    group_completed = sum(completed for _, completed, _ in totals)
+    dialect_name = session.bind.dialect.name
+    daily_rows = [
+        {
+            "scope": USER_SCOPE,
+            "owner_id": telegram_id,
+            "day": day,
+            "completed_tasks": completed,
+            "study_hours": 0,
+        }
+        for telegram_id, completed, _ in totals
+    ]
+    daily_rows.append(
+        {
+            "scope": GROUP_SCOPE,
+            "owner_id": group_id,
+            "day": day,
+            "completed_tasks": group_completed,
+            "study_hours": 0,
+        }
+    )
+    await session.execute(rollup_upsert(dialect_name, DailyStatistic, daily_rows))
+    await session.execute(
+        rollup_upsert(
+            dialect_name,
+            LifetimeStatistic,
+            [{key: row[key] for key in row if key != "day"} for row in daily_rows],
+        )
+    )
+    await session.execute(
+        rollup_upsert(
+            dialect_name,
+            GroupLeaderboard,
+            [
+                {
+                    "group_id": group_id,
+                    "week_start": week_start(day),
+                    "telegram_id": telegram_id,
+                    "total_tasks": total,
+                    "completed_tasks": completed,
+                    "study_hours": 0,
+                }
+                for telegram_id, completed, total in totals
+            ],
+        )
+    )
+
+
+def raw_daily_totals():
+    day = Statistic.local_date.label("day")
+    completed = func.sum(Statistic.completed_tasks).label("completed_tasks")
+    hours = func.sum(Statistic.study_hours).label("study_hours")
+
+    by_user = (
+        select(
+            literal(USER_SCOPE).label("scope"),
+            User.telegram_id.label("owner_id"),
+            day,
+            completed,
+            hours,
+        )
+        .join(User, Statistic.user_id == User.id)
+        .group_by(User.telegram_id, day)
+    )
+    by_group = (
+        select(
+            literal(GROUP_SCOPE).label("scope"),
+            Statistic.group_id.label("owner_id"),
+            day,
+            completed,
+            hours,
+        )
+        .filter(Statistic.group_id.is_not(None))
+        .group_by(Statistic.group_id, day)
+    )
+    return union_all(by_user, by_group).subquery()
+
+
+def week_start_sql(dialect_name: str, day):
+    """
+    SQL-выражение для понедельника недели, как week_start()
+    :param dialect_name: Имя диалекта базы данных
+    :param day: Выражение с датой
+    """
+    if dialect_name == "postgresql":
+        return cast(func.date_trunc("week", day), Date)
+    # SQLite: ближайшее воскресенье не раньше даты минус шесть дней
+    return type_coerce(func.date(day, "weekday 0", "-6 days"), Date)
+
+
+def raw_leaderboard_totals(dialect_name: str):
+    week = week_start_sql(dialect_name, Statistic.local_date).label("week_start")
+    return (
+        select(
+            Statistic.group_id.label("group_id"),
+            week,
+            User.telegram_id.label("telegram_id"),
+            func.sum(Statistic.total_tasks).label("total_tasks"),
+            func.sum(Statistic.completed_tasks).label("completed_tasks"),
+            func.sum(Statistic.study_hours).label("study_hours"),
+        )
+        .join(User, Statistic.user_id == User.id)
+        .filter(Statistic.group_id.is_not(None))
+        .group_by(Statistic.group_id, week, User.telegram_id)
+        .subquery()
+    )
+
+
+async def rebuild_rollups(session: AsyncSession) -> None:
+    """
+    Пересчитывает дневные и общие итоги и недельные рейтинги групп
+    по сырым записям statistics
+    :param session: Сессия базы данных
+    """
+    if session.bind.dialect.name == "postgresql":
+        await session.execute(text("LOCK TABLE statistics IN SHARE MODE"))
+
+    totals = raw_daily_totals()
+    await session.execute(delete(DailyStatistic))
+    await session.execute(delete(LifetimeStatistic))
+    await session.execute(
+        DailyStatistic.__table__.insert().from_select(
+            ["scope", "owner_id", "day", "completed_tasks", "study_hours"],
+            select(
+                totals.c.scope,
+                totals.c.owner_id,
+                totals.c.day,
+                totals.c.completed_tasks,
+                totals.c.study_hours,
+            ),
+        )
+    )
+    await session.execute(
+        LifetimeStatistic.__table__.insert().from_select(
+            ["scope", "owner_id", "completed_tasks", "study_hours"],
+            select(
+                DailyStatistic.scope,
+                DailyStatistic.owner_id,
+                func.sum(DailyStatistic.completed_tasks),
+                func.sum(DailyStatistic.study_hours),
+            ).group_by(DailyStatistic.scope, DailyStatistic.owner_id),
+        )
+    )
+
+    leaderboard = raw_leaderboard_totals(session.bind.dialect.name)
+    await session.execute(delete(GroupLeaderboard))
+    await session.execute(
+        GroupLeaderboard.__table__.insert().from_select(
+            [
+                "group_id",
+                "week_start",
+                "telegram_id",
+                "total_tasks",
+                "completed_tasks",
+                "study_hours",
+            ],
+            select(leaderboard),
+        )
+    )
+
+
+async def check_rollups(session: AsyncSession) -> List[str]:
+    """
+    Сравнивает дневные и общие итоги и рейтинги с суммами по сырым записям
+    :param session: Сессия базы данных
+    :return: Список расхождений, пустой если итоги согласованы
+    """
+    totals = raw_daily_totals()
+    expected_daily = {
+        (row.scope, row.owner_id, row.day): (row.completed_tasks, row.study_hours)
+        for row in await session.execute(select(totals))
+    }
+    actual_daily = {
+        (row.scope, row.owner_id, row.day): (row.completed_tasks, row.study_hours)
+        for row in await session.execute(
+            select(
+                DailyStatistic.scope,
+                DailyStatistic.owner_id,
+                DailyStatistic.day,
+                DailyStatistic.completed_tasks,
+                DailyStatistic.study_hours,
+            )
+        )
+    }
+
+    expected_lifetime = {}
+    for (scope, owner_id, _), (completed, hours) in expected_daily.items():
+        total = expected_lifetime.get((scope, owner_id), (0, 0.0))
+        expected_lifetime[(scope, owner_id)] = (total[0] + completed, total[1] + hours)
+    actual_lifetime = {
+        (row.scope, row.owner_id): (row.completed_tasks, row.study_hours)
+        for row in await session.execute(
+            select(
+                LifetimeStatistic.scope,
+                LifetimeStatistic.owner_id,
+                LifetimeStatistic.completed_tasks,
+                LifetimeStatistic.study_hours,
+            )
+        )
+    }
+
+    expected_leaderboard = {
+        (row.group_id, row.week_start, row.telegram_id): (
+            row.total_tasks,
+            row.completed_tasks,
+            row.study_hours,
+        )
+        for row in await session.execute(
+            select(raw_leaderboard_totals(session.bind.dialect.name))
+        )
+    }
+    actual_leaderboard = {
+        (row.group_id, row.week_start, row.telegram_id): (
+            row.total_tasks,
+            row.completed_tasks,
+            row.study_hours,
+        )
+        for row in await session.execute(
+            select(
+                GroupLeaderboard.group_id,
+                GroupLeaderboard.week_start,
+                GroupLeaderboard.telegram_id,
+                GroupLeaderboard.total_tasks,
+                GroupLeaderboard.completed_tasks,
+                GroupLeaderboard.study_hours,
+            )
+        )
+    }
+
+    problems = []
+    for name, expected, actual, empty in (
+        ("daily", expected_daily, actual_daily, (0, 0.0)),
+        ("lifetime", expected_lifetime, actual_lifetime, (0, 0.0)),
+        ("leaderboard", expected_leaderboard, actual_leaderboard, (0, 0, 0.0)),
+    ):
+        for key in expected.keys() | actual.keys():
+            want = expected.get(key, empty)
+            have = actual.get(key, empty)
+            if want[:-1] != have[:-1] or abs(want[-1] - have[-1]) > 1e-6:
+                problems.append(f"{name} {key}: expected {want}, found {have}")
+    return problems
+
+
+async def main(command: str):
+    async with SessionLocal.begin() as session:
+        if session.bind.dialect.name == "postgresql":
+            # Пересчет по всей истории может идти дольше DB_STATEMENT_TIMEOUT
+            await session.execute(text("SET LOCAL statement_timeout = 0"))
+        if command == "rebuild":
+            await rebuild_rollups(session)
+            print("Statistics rollups rebuilt")
+            return 0
+
+        problems = await check_rollups(session)
+        for problem in problems:
+            print(problem)
+        print(f"Found {len(problems)} mismatches")
+        return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or sys.argv[1] not in ("rebuild", "check"):
+        print("Usage: python -m database.rollups rebuild|check")
+        sys.exit(2)
+    sys.exit(asyncio.run(main(sys.argv[1])))
@@ -0,0 +1,219 @@
+import re
+from dataclasses import dataclass
+from typing import List, Literal
+
+from sqlalchemy import (
+    case,
+    column,
+    func,
+    literal,
+    literal_column,
+    or_,
+    select,
+    table,
+    union,
+    union_all,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database.models import Plan, Task, user_plans
+from database.user import get_user_identity
+import logging
+
+logger = logging.getLogger(__name__)
+
+MIN_QUERY_LENGTH = 3
+SEARCH_LIMIT = 20
+SIMILARITY_THRESHOLD = 0.3
+# Сколько лучших по bm25 совпадений FTS5 ранжируется по триграммам в Python
+CANDIDATE_LIMIT = 200
+
+
+@dataclass(frozen=True)
+class PlanSearchResult:
+    plan: Plan
+    plan_type: Literal["base", "user"]
+    score: float
+
+
+def trigrams(text: str) -> set:
+    """
+    Разбивает текст на триграммы так же, как pg_trgm: по словам
+    в нижнем регистре, с двумя пробелами в начале и одним в конце слова
+    """
+    result = set()
+    for word in re.findall(r"\w+", text.lower()):
+        padded = f"  {word} "
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def trigram_similarity(left: str, right: str) -> float:
+    left, right = trigrams(left), trigrams(right)
+    if not left or not right:
+        return 0.0
+    return len(left & right) / len(left | right)
+
+
+def text_score(text: str, query: str) -> float:
+    score = trigram_similarity(text, query)
+    if query.lower() in text.lower():
+        return score + 1
+    return score if score >= SIMILARITY_THRESHOLD else 0.0
+
+
+def accessible_plan_ids(user_id):
+    base = select(Plan.id.label("plan_id")).filter(~Plan.users.any())
+    if user_id is None:
+        return base
+    return union(
+        base, select(user_plans.c.plan_id).filter(user_plans.c.user_id == user_id)
+    )
+
+
+async def search_plans_postgresql(
+    session: AsyncSession, user_id, query: str, limit: int
+) -> List[tuple]:
+    accessible = accessible_plan_ids(user_id).subquery()
+
+    def matches(column, plan_id):
+        contains = column.icontains(query, autoescape=True)
+        return (
+            select(
+                plan_id.label("plan_id"),
+                (
+                    func.similarity(column, query)
+                    + case((contains, literal(1.0)), else_=literal(0.0))
+                ).label("score"),
+            )
+            .filter(or_(column.op("%")(query), contains))
+            .filter(plan_id.in_(select(accessible.c.plan_id)))
+        )
+
+    found = union_all(
+        matches(Plan.name, Plan.id), matches(Task.body, Task.plan_id)
+    ).subquery()
+    ranked = (
+        select(found.c.plan_id, func.max(found.c.score).label("score"))
+        .group_by(found.c.plan_id)
+        .subquery()
+    )
+    result = await session.execute(
+        select(Plan, ranked.c.score)
+        .join(ranked, Plan.id == ranked.c.plan_id)
+        .order_by(ranked.c.score.desc(), Plan.name)
+        .limit(limit)
+        .options(selectinload(Plan.tasks), selectinload(Plan.users))
+    )
+    return [tuple(row) for row in result.all()]
+
+
+def rank_plans(candidates: List[tuple], query: str, limit: int) -> List[tuple]:
+    """
+    Ранжирует планы по триграммам
+    :param candidates: Пары (план, [название, тексты задач...])
+    :param query: Поисковый запрос
+    :param limit: Максимальное количество результатов
+    :return: Пары (план, релевантность) по убыванию релевантности
+    """
+    ranked = []
+    for plan, texts in candidates:
+        score = max(text_score(text, query) for text in texts)
+        if score > 0:
+            ranked.append((plan, score, texts[0]))
+    ranked.sort(key=lambda item: (-item[1], item[2]))
+    return [(plan, score) for plan, score, _ in ranked[:limit]]
+
+
+def fts_query(query: str) -> str:
+    """
+    Запрос FTS5 для SQLite: любая триграмма слов запроса. Если в словах
+    нет ни одной триграммы, ищется подстрока всего запроса
+    """
+    grams = sorted(
+        {
+            word[i : i + 3]
+            for word in re.findall(r"\w+", query.lower())
+            for i in range(len(word) - 2)
+        }
+    )
+    if not grams:
+        return '"' + query.replace('"', '""') + '"'
+    return " OR ".join(f'"{gram}"' for gram in grams)
+
+
+def fts_matches(model, plan_id, accessible, match: str):
+    name = model.__tablename__
+    fts = table(f"{name}_search", column("rowid"), column("rank"))
+    return (
+        select(plan_id.label("plan_id"), fts.c.rank.label("rank"))
+        .join_from(fts, model, fts.c.rowid == literal_column(f"{name}.rowid"))
+        .filter(literal_column(fts.name).op("MATCH")(match))
+        .filter(plan_id.in_(select(accessible.c.plan_id)))
+    )
+
+
+async def search_plans_sqlite(
+    session: AsyncSession, user_id, query: str, limit: int
+) -> List[tuple]:
+    accessible = accessible_plan_ids(user_id).subquery()
+    match = fts_query(query)
+    found = union_all(
+        fts_matches(Plan, Plan.id, accessible, match),
+        fts_matches(Task, Task.plan_id, accessible, match),
+    ).subquery()
+    candidates = (
+        select(found.c.plan_id)
+        .group_by(found.c.plan_id)
+        .order_by(func.min(found.c.rank))
+        .limit(CANDIDATE_LIMIT)
+    )
+    plans = await session.scalars(
+        select(Plan)
+        .filter(Plan.id.in_(candidates))
+        .options(selectinload(Plan.tasks), selectinload(Plan.users))
+    )
+
+    return rank_plans(
+        [(plan, [plan.name] + [task.body for task in plan.tasks]) for plan in plans],
+        query,
+        limit,
+    )
+
+
+async def search_plans(
+    session: AsyncSession,
+    telegram_id: int,
+    query: str,
+    limit: int = SEARCH_LIMIT,
+) -> List[PlanSearchResult]:
+    """
+    Ищет базовые планы и планы пользователя по названию и тексту задач.
+    В PostgreSQL поиск идет по триграммным GIN-индексам pg_trgm, в SQLite
+    индекс FTS5 отбирает планы с общими триграммами, а сходство по тем же
+    правилам, что у pg_trgm, считается в Python только для них
+    :param session: Сессия базы данных
+    :param telegram_id: Telegram ID пользователя
+    :param query: Поисковый запрос
+    :param limit: Максимальное количество результатов
+    :return: Найденные планы по убыванию релевантности
+    """
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        return []
+
+    try:
+        user = await get_user_identity(session, telegram_id)
+        user_id = user.id if user else None
+        if session.bind.dialect.name == "postgresql":
+            found = await search_plans_postgresql(session, user_id, query, limit)
+        else:
+            found = await search_plans_sqlite(session, user_id, query, limit)
+
+        return [
+            PlanSearchResult(plan, "user" if plan.users else "base", score)
+            for plan, score in found
+        ]
+    except Exception as e:
+        logger.error(f"Error searching plans: {e}")
+        return []
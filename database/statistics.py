@@ -1,15 +1,28 @@
+from datetime import date
 from typing import List
 
-from sqlalchemy import func
-from database.models import Statistic, Task, User
-from database.database import db
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.models import (
+    DailyStatistic,
+    GroupLeaderboard,
+    LifetimeStatistic,
+    Statistic,
+    Task,
+    User,
+)
+from database.database import transaction
+from database.chats import get_chat_today
+from database.rollups import GROUP_SCOPE, USER_SCOPE, add_to_rollups, week_start
+from database.user import get_user_identity
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def create_statistic(
-    user_id: str,
+async def create_statistic(
+    session: AsyncSession,
+    user_id: int,
     plan_id: str,
     total_tasks: int,
     completed_tasks: int,
@@ -17,9 +30,9 @@ def create_statistic(
     group_id: int | None = None,
 ) -> Statistic:
     try:
-        with db.transaction():
+        async with transaction(session):
 
-            user = db.session.query(User).filter(User.telegram_id == user_id).first()
+            user = await get_user_identity(session, user_id)
             if not user:
                 raise ValueError("User not found")
 
@@ -30,30 +43,62 @@ def create_statistic(
                 completed_tasks=completed_tasks,
                 study_hours=study_hours,
                 group_id=group_id,
+                local_date=await get_chat_today(session, group_id or user_id),
             )
-            db.session.add(statistic)
-            db.session.commit()
-            return statistic
+            session.add(statistic)
+            await add_to_rollups(
+                session,
+                user_id,
+                group_id,
+                statistic.local_date,
+                completed_tasks,
+                study_hours,
+                total_tasks=total_tasks,
+            )
+        return statistic
     except Exception as e:
         logger.error(f"Error creating statistic: {e}")
-        db.session.rollback()
         raise
 
 
-def update_statistic(
+async def add_statistic_delta(
+    session: AsyncSession,
+    statistic: Statistic,
+    completed_tasks: int,
+    study_hours: float,
+    total_tasks: int = 0,
+) -> None:
+    telegram_id = await session.scalar(
+        select(User.telegram_id).filter(User.id == statistic.user_id)
+    )
+    await add_to_rollups(
+        session,
+        telegram_id,
+        statistic.group_id,
+        statistic.local_date,
+        completed_tasks,
+        study_hours,
+        total_tasks=total_tasks,
+    )
+
+
+async def update_statistic(
+    session: AsyncSession,
     statistic_id: str,
     total_tasks: int = None,
     completed_tasks: int = None,
     study_hours: float | None = None,
 ) -> bool:
     try:
-        with db.transaction():
-            statistic = (
-                db.session.query(Statistic).filter(Statistic.id == statistic_id).first()
+        async with transaction(session):
+            statistic = await session.scalar(
+                select(Statistic).filter(Statistic.id == statistic_id)
             )
             if not statistic:
                 return False
 
+            old_total = statistic.total_tasks
+            old_completed, old_hours = statistic.completed_tasks, statistic.study_hours
             if total_tasks is not None:
                 statistic.total_tasks = total_tasks
             if completed_tasks is not None:
@@ -61,73 +106,91 @@ def update_statistic(
             if study_hours is not None:
                 statistic.study_hours = study_hours
 
-            db.session.commit()
+            await add_statistic_delta(
+                session,
+                statistic,
+                statistic.completed_tasks - old_completed,
+                statistic.study_hours - old_hours,
+                total_tasks=statistic.total_tasks - old_total,
+            )
             return True
     except Exception as e:
         logger.error(f"Error updating statistic: {e}")
-        db.session.rollback()
         return False
 
 
-def get_user_statistics(telegram_id: int) -> List[Statistic]:
+async def get_user_statistics(
+    session: AsyncSession, telegram_id: int
+) -> List[Statistic]:
     try:
-        user = db.session.query(User).filter(User.telegram_id == telegram_id).first()
+        user = await get_user_identity(session, telegram_id)
         if not user:
             return []
 
-        return (
-            db.session.query(Statistic)
+        result = await session.scalars(
+            select(Statistic)
             .filter(Statistic.user_id == user.id)
             .order_by(Statistic.created_at.desc())
-            .all()
         )
+        return list(result)
     except Exception as e:
         logger.error(f"Error getting user statistics: {e}")
         return []
 
 
-def get_plan_statistics(plan_id: str) -> List[Statistic]:
+async def get_plan_statistics(session: AsyncSession, plan_id: str) -> List[Statistic]:
     try:
-        return (
-            db.session.query(Statistic)
+        result = await session.scalars(
+            select(Statistic)
             .filter(Statistic.plan_id == plan_id)
             .order_by(Statistic.created_at.desc())
-            .all()
         )
+        return list(result)
     except Exception as e:
         logger.error(f"Error getting plan statistics: {e}")
         return []
 
 
-def get_statistic_by_id(statistic_id: str) -> Statistic | None:
+async def get_statistic_by_id(
+    session: AsyncSession, statistic_id: str
+) -> Statistic | None:
     try:
-        return db.session.query(Statistic).filter(Statistic.id == statistic_id).first()
+        return await session.scalar(
+            select(Statistic).filter(Statistic.id == statistic_id)
+        )
     except Exception as e:
         logger.error(f"Error getting statistic by id: {e}")
         return None
 
 
-def delete_statistic(statistic_id: str) -> bool:
+async def delete_statistic(session: AsyncSession, statistic_id: str) -> bool:
     try:
-        with db.transaction():
-            statistic = (
-                db.session.query(Statistic).filter(Statistic.id == statistic_id).first()
+        async with transaction(session):
+            statistic = await session.scalar(
+                select(Statistic).filter(Statistic.id == statistic_id)
             )
             if not statistic:
                 return False
 
-            db.session.delete(statistic)
-            db.session.commit()
+            await add_statistic_delta(
+                session,
+                statistic,
+                -statistic.completed_tasks,
+                -statistic.study_hours,
+                total_tasks=-statistic.total_tasks,
+            )
+            await session.delete(statistic)
             return True
     except Exception as e:
         logger.error(f"Error deleting statistic: {e}")
-        db.session.rollback()
         return False
 
 
-def calculate_plan_progress(plan_id: str) -> dict:
+async def calculate_plan_progress(session: AsyncSession, plan_id: str) -> dict:
     try:
-        tasks = db.session.query(Task).filter(Task.plan_id == plan_id).all()
+        tasks = list(
+            await session.scalars(select(Task).filter(Task.plan_id == plan_id))
+        )
         if not tasks:
             return {"total": 0, "completed": 0, "percentage": 0}
 
@@ -145,31 +208,37 @@ def calculate_plan_progress(plan_id: str) -> dict:
         return {"total": 0, "completed": 0, "percentage": 0}
 
 
-def update_plan_statistics(
-    telegram_id: int, plan_id: str, study_hours: float = 0
+async def update_plan_statistics(
+    session: AsyncSession, telegram_id: int, plan_id: str, study_hours: float = 0
 ) -> bool:
     try:
-        with db.transaction():
-            user = (
-                db.session.query(User).filter(User.telegram_id == telegram_id).first()
-            )
+        async with transaction(session):
+            user = await get_user_identity(session, telegram_id)
             if not user:
                 return False
 
-            progress = calculate_plan_progress(plan_id)
+            progress = await calculate_plan_progress(session, plan_id)
 
-            statistic = (
-                db.session.query(Statistic)
+            statistic = await session.scalar(
+                select(Statistic)
                 .filter(Statistic.user_id == user.id)
                 .filter(Statistic.plan_id == plan_id)
                 .order_by(Statistic.created_at.desc())
-                .first()
             )
 
             if statistic:
+                completed_delta = progress["completed"] - statistic.completed_tasks
+                total_delta = progress["total"] - statistic.total_tasks
                 statistic.total_tasks = progress["total"]
                 statistic.completed_tasks = progress["completed"]
                 statistic.study_hours += study_hours
+                await add_statistic_delta(
+                    session,
+                    statistic,
+                    completed_delta,
+                    study_hours,
+                    total_tasks=total_delta,
+                )
             else:
                 statistic = Statistic(
                     user_id=user.id,
@@ -177,62 +246,67 @@ def update_plan_statistics(
                     total_tasks=progress["total"],
                     completed_tasks=progress["completed"],
                     study_hours=study_hours,
+                    local_date=await get_chat_today(session, telegram_id),
+                )
+                session.add(statistic)
+                await add_to_rollups(
+                    session,
+                    telegram_id,
+                    None,
+                    statistic.local_date,
+                    progress["completed"],
+                    study_hours,
                 )
-                db.session.add(statistic)
 
-            db.session.commit()
             return True
     except Exception as e:
         logger.error(f"Error updating plan statistics: {e}")
-        db.session.rollback()
         return False
 
 
-def get_user_lifetime_statistics(telegram_id: int) -> dict:
+async def get_user_lifetime_statistics(session: AsyncSession, telegram_id: int) -> dict:
     """
     Получает общую статистику пользователя за все время
+    :param session: Сессия базы данных
     :param telegram_id: Telegram ID пользователя
     :return: Словарь с общей статистикой
     """
     try:
-        user = db.session.query(User).filter(User.telegram_id == telegram_id).first()
-        if not user:
+        totals = await session.get(LifetimeStatistic, (USER_SCOPE, telegram_id))
+        if not totals:
             return {"total_completed": 0, "total_study_hours": 0.0}
 
-        result = (
-            db.session.query(
-                func.sum(Statistic.completed_tasks).label("total_completed"),
-                func.sum(Statistic.study_hours).label("total_study_hours"),
-            )
-            .filter(Statistic.user_id == user.id)
-            .first()
-        )
-
         return {
-            "total_completed": result.total_completed or 0,
-            "total_study_hours": round(result.total_study_hours or 0.0, 2),
+            "total_completed": totals.completed_tasks,
+            "total_study_hours": round(totals.study_hours, 2),
         }
     except Exception as e:
         logger.error(f"Error getting user lifetime statistics: {e}")
         return {"total_completed": 0, "total_study_hours": 0.0}
 
 
-def get_group_lifetime_statistics(telegram_ids: List[int]) -> dict:
+async def get_group_lifetime_statistics(
+    session: AsyncSession, telegram_ids: List[int]
+) -> dict:
     """
     Получает общую статистику группы пользователей за все время
+    :param session: Сессия базы данных
     :param telegram_ids: Список Telegram ID пользователей
     :return: Словарь с общей статистикой группы
     """
     try:
         result = (
-            db.session.query(
-                func.sum(Statistic.completed_tasks).label("total_completed"),
-                func.sum(Statistic.study_hours).label("total_study_hours"),
+            await session.execute(
+                select(
+                    func.sum(LifetimeStatistic.completed_tasks).label(
+                        "total_completed"
+                    ),
+                    func.sum(LifetimeStatistic.study_hours).label("total_study_hours"),
+                )
+                .filter(LifetimeStatistic.scope == USER_SCOPE)
+                .filter(LifetimeStatistic.owner_id.in_(telegram_ids))
             )
-            .join(User, Statistic.user_id == User.id)
-            .filter(User.telegram_id.in_(telegram_ids))
-            .first()
-        )
+        ).first()
 
         return {
             "total_completed": result.total_completed or 0,
@@ -244,21 +318,94 @@ def get_group_lifetime_statistics(telegram_ids: List[int]) -> dict:
         return {"total_completed": 0, "total_study_hours": 0.0, "user_count": 0}
 
 
-def get_group_statistics_by_chat_id(group_id: int) -> dict:
+async def get_group_statistics_by_chat_id(session: AsyncSession, group_id: int) -> dict:
+    try:
+        totals = await session.get(LifetimeStatistic, (GROUP_SCOPE, group_id))
+        if not totals:
+            return {"total_completed": 0, "total_study_hours": 0.0}
+
+        return {
+            "total_completed": totals.completed_tasks,
+            "total_study_hours": round(totals.study_hours, 2),
+        }
+    except Exception as e:
+        logger.error(f"Error getting group statistics: {e}")
+        return {"total_completed": 0, "total_study_hours": 0.0}
+
+
+async def get_period_statistics(
+    session: AsyncSession, scope: str, owner_id: int, start: date, end: date
+) -> dict:
+    """
+    Суммирует дневные итоги за период. Читает не больше одной строки
+    на день периода, независимо от объема истории
+    :param session: Сессия базы данных
+    :param scope: USER_SCOPE или GROUP_SCOPE
+    :param owner_id: Telegram ID пользователя или ID группы
+    :param start: Первый день периода
+    :param end: Последний день периода
+    :return: Словарь со статистикой за период
+    """
     try:
         result = (
-            db.session.query(
-                func.sum(Statistic.completed_tasks).label("total_completed"),
-                func.sum(Statistic.study_hours).label("total_study_hours"),
+            await session.execute(
+                select(
+                    func.sum(DailyStatistic.completed_tasks).label("total_completed"),
+                    func.sum(DailyStatistic.study_hours).label("total_study_hours"),
+                )
+                .filter(DailyStatistic.scope == scope)
+                .filter(DailyStatistic.owner_id == owner_id)
+                .filter(DailyStatistic.day.between(start, end))
             )
-            .filter(Statistic.group_id == group_id)
-            .first()
-        )
+        ).first()
 
         return {
             "total_completed": result.total_completed or 0,
             "total_study_hours": round(result.total_study_hours or 0.0, 2),
         }
     except Exception as e:
-        logger.error(f"Error getting group statistics: {e}")
+        logger.error(f"Error getting period statistics: {e}")
         return {"total_completed": 0, "total_study_hours": 0.0}
+
+
+async def get_group_leaderboard(
+    session: AsyncSession, group_id: int, day: date, limit: int = 10
+) -> List[dict]:
+    """
+    Возвращает рейтинг участников группы за неделю, в которую входит day.
+    Рейтинг поддерживается при записи статистики, поэтому чтение —
+    это проход по индексу с LIMIT без агрегации
+    :param session: Сессия базы данных
+    :param group_id: ID группы
+    :param day: Любой день нужной недели в часовом поясе группы
+    :param limit: Сколько участников вернуть
+    :return: Список словарей со статистикой участников по убыванию места
+    """
+    try:
+        result = await session.execute(
+            select(GroupLeaderboard, User.name)
+            .join(User, User.telegram_id == GroupLeaderboard.telegram_id)
+            .filter(GroupLeaderboard.group_id == group_id)
+            .filter(GroupLeaderboard.week_start == week_start(day))
+            .order_by(
+                GroupLeaderboard.completed_tasks.desc(),
+                GroupLeaderboard.study_hours.desc(),
+            )
+            .limit(limit)
+        )
+        return [
+            {
+                "name": name,
+                "completed_tasks": row.completed_tasks,
+                "completion_rate": (
+                    round(row.completed_tasks / row.total_tasks * 100)
+                    if row.total_tasks
+                    else 0
+                ),
+                "study_hours": round(row.study_hours, 2),
+            }
+            for row, name in result.all()
+        ]
+    except Exception as e:
+        logger.error(f"Error getting group leaderboard: {e}")
+        return []
@@ -1,28 +1,96 @@
+import uuid
+from dataclasses import dataclass
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config import load_config
+from database.cache import TTLCache
 from database.models import User
-from database.database import db
+from database.database import transaction
+
+config = load_config()
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    id: uuid.UUID
+    current_plan_id: uuid.UUID | None
+    published_plan_id: uuid.UUID | None
+
+
+identity_cache = TTLCache(maxsize=config.user_cache_size, ttl=config.user_cache_ttl)
+
+
+def forget_user(session: AsyncSession, telegram_id: int) -> None:
+    """
+    Сбрасывает кэш пользователя сейчас и еще раз после завершения
+    транзакции, чтобы в кэш не попали незафиксированные значения
+    :param session: Сессия базы данных
+    :param telegram_id: Telegram ID пользователя
+    """
+    identity_cache.invalidate(telegram_id)
+    session.sync_session.info.setdefault("forget_users", set()).add(telegram_id)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_soft_rollback")
+def forget_users_after_transaction(session: Session, *args) -> None:
+    for telegram_id in session.info.pop("forget_users", ()):
+        identity_cache.invalidate(telegram_id)
+
+
+async def get_user_identity(
+    session: AsyncSession, telegram_id: int
+) -> UserIdentity | None:
+    """
+    Возвращает ID пользователя и его текущий и опубликованный планы,
+    обращаясь к базе данных только при промахе кэша
+    :param session: Сессия базы данных
+    :param telegram_id: Telegram ID пользователя
+    :return: UserIdentity или None, если пользователь не найден
+    """
+    identity = identity_cache.get(telegram_id)
+    if identity is not None:
+        return identity
+
+    row = (
+        await session.execute(
+            select(User.id, User.current_plan_id, User.published_plan_id).filter(
+                User.telegram_id == telegram_id
+            )
+        )
+    ).first()
+    if row is None:
+        return None
+
+    identity = UserIdentity(*row)
+    if not session.sync_session.info.get("forget_users"):
+        identity_cache.set(telegram_id, identity)
+    return identity
 
 
-def create_user(telegram_id: int, name: str) -> User:
+async def create_user(session: AsyncSession, telegram_id: int, name: str) -> User:
     user = User(telegram_id=telegram_id, name=name)
-    with db.transaction():
-        db.session.add(user)
-        db.session.commit()
-        db.session.refresh(user)
+    async with transaction(session):
+        session.add(user)
+    forget_user(session, telegram_id)
     return user
 
 
-def get_user_by_telegram_id(telegram_id: int) -> User | None:
-    return db.session.query(User).filter(User.telegram_id == telegram_id).first()
+async def get_user_by_telegram_id(
+    session: AsyncSession, telegram_id: int
+) -> User | None:
+    return await session.scalar(select(User).filter(User.telegram_id == telegram_id))
 
 
-def save_user(telegram_id: int, name: str) -> User:
-    user = get_user_by_telegram_id(telegram_id)
+async def save_user(session: AsyncSession, telegram_id: int, name: str) -> User:
+    user = await get_user_by_telegram_id(session, telegram_id)
 
     if user:
-        with db.transaction():
+        async with transaction(session):
             user.name = name
-            db.session.commit()
-            db.session.refresh(user)
+        forget_user(session, telegram_id)
         return user
 
-    return create_user(telegram_id, name)
+    return await create_user(session, telegram_id, name)
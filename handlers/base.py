@@ -2,6 +2,7 @@ from aiogram import Router, types
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 from database.user import get_user_by_telegram_id, save_user
 from keyboards.inline import kb_plans
 from utils import logger, send_welcome_message
@@ -12,7 +13,9 @@ router = Router()
 
 
 @router.message(CommandStart())
-async def start_command(message: types.Message, state: FSMContext):
+async def start_command(
+    message: types.Message, state: FSMContext, session: AsyncSession
+):
     args = message.text.split()[1:]
     logger.info("/start args: " + str(args))
     if len(args) > 0:
@@ -20,16 +23,16 @@ async def start_command(message: types.Message, state: FSMContext):
         logger.info(f"Setting group_id: {group_id}")
         await state.update_data(group_id=group_id)
         await state.set_state(UserState.choosing_plan_type)
-        await show_plan_creation_options(message, state)
+        await show_plan_creation_options(message, state, session)
     else:
         user_id = message.from_user.id
         logger.info(f"Processing start command for user {user_id}")
-        user = get_user_by_telegram_id(user_id)
+        user = await get_user_by_telegram_id(session, user_id)
         logger.info(f"Found user: {user}")
 
         if user is None:
             logger.info("User not found, creating user")
-        user = save_user(user_id, message.from_user.full_name)
+        user = await save_user(session, user_id, message.from_user.full_name)
         logger.info(f"User exists: {user.name}")
         await send_welcome_message(message, message.from_user.full_name)
 
@@ -43,14 +46,19 @@ async def help_command(message: types.Message):
             "/help - Показать это сообщение\n"
             "/info - О планировании\n"
             "/create_plan - Создать новый план\n"
-            "/view_plans - Посмотреть планы"
+            "/view_plans - Посмотреть планы\n"
+            "/find - Найти план по названию или задаче"
         )
 
         await send_message_with_keyboard(message, help_text, reply_markup=kb_plans())
     else:
         await send_message_with_keyboard(
             message,
-            "Групповые команды:\n" "/new_day - Начать день\n" "/static - Статистика",
+            "Групповые команды:\n"
+            "/new_day - Начать день\n"
+            "/static - Статистика (week, month или YYYY-MM)\n"
+            "/leaderboard - Рейтинг недели\n"
+            "/timezone - Часовой пояс группы",
         )
 
 
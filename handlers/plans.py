@@ -4,21 +4,25 @@ from aiogram import Router, F, types, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message, CallbackQuery
-from config.callback_data import PlanAction, PlansView
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.callback_data import PlanAction, PlansPage, PlansView
 from database.plan import (
     add_comment_to_task,
+    create_plans_bulk,
     create_user_plan,
     delete_user_plan,
-    get_base_plans,
+    get_accessible_plan,
     get_current_plan,
-    get_published_plan,
-    get_user_plans,
+    get_plan_tasks,
+    get_plans_page,
     publish_user_plan,
     reset_plan,
     set_current_plan,
+    update_task,
 )
+from database.rollover import join_group_day, leave_group_day
 from database.statistics import create_statistic, update_statistic
-from database.user import get_user_by_telegram_id
+from database.user import get_user_identity
 from keyboards.inline import (
     back_keyboard,
     current_plan_keyboard,
@@ -41,15 +45,16 @@ from keyboards.inline import (
     user_plans_keyboard,
     select_plan_keyboard,
 )
-from database.models import Plan, Statistic, Task
+from database.models import Statistic, Task
+from services import TaskToggleBuffer
 from states.plans import PlanCreation, PlanManagement, PlanView
 from states.user import UserState
 from utils import (
     get_full_current_plan,
     get_full_plan,
     get_plan_body,
-    get_plan_by_type_user_id_plan_id,
     get_plan_published_message,
+    get_state_plan,
     send_message_with_keyboard,
     logger,
     show_existing_plans,
@@ -93,12 +98,14 @@ async def process_plan_tasks(message: types.Message, state: FSMContext):
 @router.message(
     PlanCreation.waiting_for_confirmation, F.text.lower().in_(["да", "нет"])
 )
-async def confirm_plan(message: Message, state: FSMContext):
+async def confirm_plan(message: Message, state: FSMContext, session: AsyncSession):
     if message.text.lower() == "да":
         data = await state.get_data()
         user_id = message.from_user.id
 
-        create_user_plan(user_id=user_id, name=data["title"], tasks_text=data["tasks"])
+        await create_user_plan(
+            session, user_id=user_id, name=data["title"], tasks_text=data["tasks"]
+        )
 
         await send_message_with_keyboard(
             message,
@@ -131,15 +138,19 @@ async def select_task_position(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "finish_plan")
-async def finish_plan_editing(callback: CallbackQuery, state: FSMContext):
+async def finish_plan_editing(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     data = await state.get_data()
-    plan: Plan = data.get("plan")
+    plan = await get_state_plan(state, session)
     group_id = data.get("group_id")
 
     reply_markup = kb_main_menu()
     if group_id:
         reply_markup = plan_confirmation_keyboard()
-    elif get_user_by_telegram_id(callback.from_user.id).published_plan_id == plan.id:
+    elif (
+        await get_user_identity(session, callback.from_user.id)
+    ).published_plan_id == plan.id:
         reply_markup = management_keyboard()
     await callback.message.edit_text(
         get_full_plan(plan) + "\n\nХотите опубликовать этот план в группу?",
@@ -151,12 +162,16 @@ async def finish_plan_editing(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(UserState.publishing_plan, F.data == "publish_plan")
-async def publish_plan(callback: CallbackQuery, state: FSMContext, bot: Bot):
+async def publish_plan(
+    callback: CallbackQuery, state: FSMContext, bot: Bot, session: AsyncSession
+):
     user_id = callback.from_user.id
     data = await state.get_data()
-    plan: Plan = data.get("plan")
+    plan = await get_state_plan(state, session)
 
-    publish_user_plan(user_id, plan.id)
+    await publish_user_plan(session, user_id, plan.id)
+    if data.get("group_id"):
+        await join_group_day(session, data["group_id"], user_id, plan.id)
 
     await bot.send_message(
         chat_id=data.get("group_id"),
@@ -164,7 +179,6 @@ async def publish_plan(callback: CallbackQuery, state: FSMContext, bot: Bot):
         parse_mode="HTML",
         reply_markup=plan_management_keyboard(user_id),
     )
-    await state.update_data(plan=plan)
     await callback.message.edit_text(
         f"План <b><u>{plan.name}</u></b> опубликован 🥳",
         parse_mode="HTML",
@@ -174,12 +188,14 @@ async def publish_plan(callback: CallbackQuery, state: FSMContext, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("manage_plan:"))
-async def manage_plan_handler(callback: CallbackQuery, state: FSMContext):
+async def manage_plan_handler(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     try:
-        user_id = callback.data.split(":")[1]
-        plan = get_current_plan(user_id)
+        user_id = int(callback.data.split(":")[1])
+        plan = await get_current_plan(session, user_id)
         await state.update_data(
-            plan=plan,
+            plan_id=str(plan.id) if plan else None,
             message_id=callback.message.message_id,
             chat_id=callback.message.chat.id,
         )
@@ -194,29 +210,25 @@ async def manage_plan_handler(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(PlanManagement.marking_tasks, F.data.startswith("task_action:"))
-async def toggle_task_mark(callback: CallbackQuery, state: FSMContext):
+async def toggle_task_mark(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    toggle_buffer: TaskToggleBuffer,
+):
     try:
         task_index = int(callback.data.split(":")[1])
         data = await state.get_data()
-        plan: Plan = data.get("plan")
-        tasks: List[Task] = plan.tasks
+        plan_id = data.get("plan_id")
+        tasks: List[Task] = await get_plan_tasks(session, plan_id)
         task = tasks[task_index]
 
         if not task:
             await callback.answer("Ошибка при обработки задачи 😔", show_alert=True)
             return
 
-        tasks[task_index].checked = not tasks[task_index].checked
-        plan.tasks = tasks
-        await state.update_data(plan=plan)
-
-        try:
-            await callback.message.edit_reply_markup(
-                reply_markup=task_marking_keyboard(tasks)
-            )
-            await callback.answer()
-        except:
-            await callback.answer()
+        toggle_buffer.toggle(plan_id, task, callback.message)
+        await callback.answer()
 
     except Exception as e:
         logger.error(f"Ошибка в toggle_task_mark: {e}")
@@ -253,36 +265,36 @@ async def handle_cancel_plan_creation(
 
 
 @router.callback_query(F.data == "view_base_plans")
-async def handle_show_base_plans(callback: CallbackQuery):
-    base_plans = get_base_plans()
+async def handle_show_base_plans(callback: CallbackQuery, session: AsyncSession):
+    page = await get_plans_page(session, "base", callback.from_user.id)
     callback_message = "Выберите базовый план:"
 
-    if not base_plans:
+    if not page.plans:
         callback_message = "Базовые планы не найдены."
 
     await callback.message.edit_text(
         callback_message,
-        reply_markup=plans_keyboard(base_plans, "base"),
+        reply_markup=plans_keyboard(page, "base"),
         parse_mode="HTML",
     )
     await callback.answer()
 
 
 @router.callback_query(F.data.startswith("plan_action:"))
-async def handle_plan_action(callback: CallbackQuery, state: FSMContext):
+async def handle_plan_action(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     current_state = await state.get_state()
     _, plan_type, plan_id = callback.data.split(":")
 
-    plan = get_plan_by_type_user_id_plan_id(
-        plan_type, plan_id=plan_id, user_id=callback.from_user.id
-    )
+    plan = await get_accessible_plan(session, plan_type, callback.from_user.id, plan_id)
 
     if not plan:
         await callback.answer("План не найден!")
         return
 
     if current_state == "UserState:selecting_existing_plan":
-        await state.update_data(plan=plan)
+        await state.update_data(plan_id=str(plan.id))
         await callback.message.edit_text(
             get_full_plan(plan), reply_markup=plan_edit_keyboard(), parse_mode="HTML"
         )
@@ -298,30 +310,34 @@ async def handle_plan_action(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(
     UserState.selecting_existing_plan, F.data.startswith("select_user_")
 )
-async def select_user_plan_for_new_day(callback: CallbackQuery, state: FSMContext):
-    await plans_view_handler(callback, state)
+async def select_user_plan_for_new_day(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
+    await plans_view_handler(callback, state, session)
 
 
 @router.callback_query(
     UserState.selecting_existing_plan,
     F.data.in_(["select_base_plans", "select_user_plans", "cancel_plan_creation"]),
 )
-async def handle_existing_plan_choice(callback: CallbackQuery, state: FSMContext):
+async def handle_existing_plan_choice(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     if callback.data == "select_base_plans":
-        plans = get_base_plans()
+        page = await get_plans_page(session, "base", callback.from_user.id)
         await callback.message.edit_text(
-            "Выберите базовый план:", reply_markup=plans_keyboard(plans, "base")
+            "Выберите базовый план:", reply_markup=plans_keyboard(page, "base")
         )
     elif callback.data == "select_user_plans":
-        plans = get_user_plans(callback.from_user.id)
-        logger.info(len(plans))
+        page = await get_plans_page(session, "user", callback.from_user.id)
+        logger.info(len(page.plans))
 
-        if not plans:
+        if not page.plans:
             await callback.message.edit_text("У вас пока нет сохраненных планов.")
             return
 
         await callback.message.edit_text(
-            "Выберите ваш план:", reply_markup=plans_keyboard(plans, "user")
+            "Выберите ваш план:", reply_markup=plans_keyboard(page, "user")
         )
     elif callback.data == "cancel_plan_creation":
         await handle_cancel_plan_creation(callback, state)
@@ -362,9 +378,11 @@ async def process_new_day_plan_tasks(message: Message, state: FSMContext):
 
 
 @router.callback_query(F.data == "current_plan")
-async def show_current_plan(callback: CallbackQuery, state: FSMContext):
+async def show_current_plan(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     user_id = callback.from_user.id
-    plan = get_current_plan(user_id)
+    plan = await get_current_plan(session, user_id)
 
     if not plan:
         await callback.message.edit_text(
@@ -373,7 +391,7 @@ async def show_current_plan(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
 
-    await state.update_data(plan=plan)
+    await state.update_data(plan_id=str(plan.id))
     await callback.message.edit_text(
         get_full_current_plan(plan),
         reply_markup=current_plan_keyboard(),
@@ -399,39 +417,65 @@ async def view_plans_command(message: types.Message, state: FSMContext):
 
 
 @router.callback_query(PlansView.filter(), PlanView.viewing_plans)
-async def plans_view_handler(callback: types.CallbackQuery, callback_data: PlansView):
+async def plans_view_handler(
+    callback: types.CallbackQuery, callback_data: PlansView, session: AsyncSession
+):
     plan_type = callback_data.plan_type
     if plan_type == "user":
-        user_plans = get_user_plans(callback.from_user.id)
-        if not user_plans:
+        page = await get_plans_page(session, "user", callback.from_user.id)
+        if not page.plans:
             await callback.message.answer("У вас пока нет сохраненных планов.")
             await callback.answer()
             return
 
         await callback.message.edit_text(
-            "📁 Ваши сохраненные планы:", reply_markup=user_plans_keyboard(user_plans)
+            "📁 Ваши сохраненные планы:", reply_markup=user_plans_keyboard(page)
         )
     if plan_type == "base":
-        base_plans = get_base_plans()
+        page = await get_plans_page(session, "base", callback.from_user.id)
 
-        if not base_plans:
+        if not page.plans:
             await callback.message.edit_text("Базовые планы не найдены.")
             return
 
         await callback.message.edit_text(
             "📚 Доступные базовые планы:",
-            reply_markup=base_plans_keyboard(base_plans),
+            reply_markup=base_plans_keyboard(page),
             parse_mode="HTML",
         )
     await callback.answer()
 
 
+@router.callback_query(PlansPage.filter())
+async def show_plans_page(
+    callback: CallbackQuery, callback_data: PlansPage, session: AsyncSession
+):
+    page = await get_plans_page(
+        session,
+        callback_data.plan_type,
+        callback.from_user.id,
+        cursor=callback_data.cursor,
+        before=callback_data.before,
+    )
+
+    if not callback_data.from_types:
+        keyboard = plans_keyboard(page, callback_data.plan_type)
+    elif callback_data.plan_type == "user":
+        keyboard = user_plans_keyboard(page)
+    else:
+        keyboard = base_plans_keyboard(page)
+
+    await callback.message.edit_reply_markup(reply_markup=keyboard)
+    await callback.answer()
+
+
 @router.callback_query(PlanAction.filter())
 async def plan_action_handler(
     callback: CallbackQuery,
     callback_data: PlanAction,
     message: Message,
     state: FSMContext,
+    session: AsyncSession,
 ):
     action = callback_data.action
     plan_type = callback_data.plan_type
@@ -445,7 +489,7 @@ async def plan_action_handler(
         await state.set_state(PlanCreation.waiting_for_title)
     if action == "current":
         user_id = callback.from_user.id
-        plan = get_current_plan(user_id)
+        plan = await get_current_plan(session, user_id)
 
         if not plan:
             await callback.message.edit_text(
@@ -454,7 +498,7 @@ async def plan_action_handler(
             await callback.answer()
             return
 
-        await state.update_data(plan=plan)
+        await state.update_data(plan_id=str(plan.id))
         await callback.message.edit_text(
             get_full_current_plan(plan),
             reply_markup=current_plan_keyboard(),
@@ -472,15 +516,12 @@ async def back_to_plan_types(callback: types.CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("select_plan:"))
-async def select_plan(callback: types.CallbackQuery):
+async def select_plan(callback: types.CallbackQuery, session: AsyncSession):
     _, plan_type, plan_id = callback.data.split(":")
 
-    if plan_type == "base":
-        plans = get_base_plans()
-    else:
-        plans = get_user_plans(callback.from_user.id)
-
-    selected_plan = next((p for p in plans if str(p.id) == plan_id), None)
+    selected_plan = await get_accessible_plan(
+        session, plan_type, callback.from_user.id, plan_id
+    )
 
     if not selected_plan:
         await callback.answer("План не найден!")
@@ -498,21 +539,18 @@ async def select_plan(callback: types.CallbackQuery):
 
 
 @router.callback_query(F.data.startswith("use_plan:"))
-async def use_plan(callback: types.CallbackQuery):
+async def use_plan(callback: types.CallbackQuery, session: AsyncSession):
     _, plan_type, plan_id = callback.data.split(":")
 
-    if plan_type == "base":
-        plans = get_base_plans()
-    else:
-        plans = get_user_plans(callback.from_user.id)
-
-    selected_plan = next((p for p in plans if str(p.id) == plan_id), None)
+    selected_plan = await get_accessible_plan(
+        session, plan_type, callback.from_user.id, plan_id
+    )
 
     if not selected_plan:
         await callback.answer("План не найден!")
         return
 
-    set_current_plan(callback.from_user.id, selected_plan.id)
+    await set_current_plan(session, callback.from_user.id, selected_plan.id)
     plan_text = get_plan_body(selected_plan)
 
     await callback.message.edit_text(
@@ -552,7 +590,9 @@ async def cancel_new_day(callback: CallbackQuery):
 
 
 @router.callback_query(UserState.choosing_plan_type)
-async def handle_plan_type_choice(callback: CallbackQuery, state: FSMContext):
+async def handle_plan_type_choice(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     data = await state.get_data()
 
     if callback.data == "use_existing_plan":
@@ -566,14 +606,14 @@ async def handle_plan_type_choice(callback: CallbackQuery, state: FSMContext):
         await state.set_state(UserState.creating_new_plan)
     elif callback.data == "use_current_plan":
         user_id = callback.from_user.id
-        plan = get_current_plan(user_id)
+        plan = await get_current_plan(session, user_id)
 
         if not plan:
             await callback.message.edit_text("Ошибка: текущий план не найден.")
             await callback.answer()
             return
 
-        data.update(plan=plan)
+        data.update(plan_id=str(plan.id))
         await state.set_data(data)
 
         await callback.message.edit_text(
@@ -587,9 +627,10 @@ async def handle_plan_type_choice(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "edit_tasks")
-async def start_task_editing(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    plan: Plan = data.get("plan")
+async def start_task_editing(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
+    plan = await get_state_plan(state, session)
     logger.info(plan)
     await state.update_data(
         message_id=callback.message.message_id, chat_id=callback.message.chat.id
@@ -604,9 +645,10 @@ async def start_task_editing(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "add_new_task")
-async def add_new_task(callback: CallbackQuery, state: FSMContext):
-    data = await state.get_data()
-    plan: Plan = data.get("plan")
+async def add_new_task(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
+    plan = await get_state_plan(state, session)
 
     await callback.message.edit_text(
         "Выберите, куда добавить новый пункт:",
@@ -616,14 +658,11 @@ async def add_new_task(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(PlanManagement.managing_plan, F.data == "mark_tasks")
-async def start_marking_tasks(callback: CallbackQuery, state: FSMContext):
+async def start_marking_tasks(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     try:
-        data = await state.get_data()
-        plan: Plan | None = data.get("plan")
-        logger.info(plan)
-        if not plan:
-            plan = get_published_plan(callback.from_user.id)
-            await state.update_data(plan=plan)
+        plan = await get_state_plan(state, session, callback.from_user.id)
         logger.info(plan)
 
         await callback.message.edit_text(
@@ -639,14 +678,11 @@ async def start_marking_tasks(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(PlanManagement.managing_plan, F.data == "task_comments")
-async def task_comments_handler(callback: CallbackQuery, state: FSMContext):
+async def task_comments_handler(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     try:
-        data = await state.get_data()
-        plan: Plan | None = data.get("plan")
-        logger.info(plan)
-        if not plan:
-            plan = get_published_plan(callback.from_user.id)
-            await state.update_data(plan=plan)
+        plan = await get_state_plan(state, session, callback.from_user.id)
         logger.info(plan)
 
         await callback.message.edit_text(
@@ -661,10 +697,17 @@ async def task_comments_handler(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "back_to_manage")
-async def back_to_management(callback: CallbackQuery, state: FSMContext):
+async def back_to_management(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    toggle_buffer: TaskToggleBuffer,
+):
     try:
         data = await state.get_data()
-        plan: Plan = data.get("plan")
+        if data.get("plan_id"):
+            await toggle_buffer.flush(data["plan_id"], render=False, session=session)
+        plan = await get_state_plan(state, session)
 
         await callback.message.edit_text(
             get_full_plan(plan), reply_markup=management_keyboard(), parse_mode="HTML"
@@ -706,7 +749,7 @@ async def select_task_for_comment(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(PlanManagement.adding_comment, F.text)
-async def process_comment(message: Message, state: FSMContext):
+async def process_comment(message: Message, state: FSMContext, session: AsyncSession):
     try:
         if message.text.startswith("/"):
             await message.answer("Действие отменено")
@@ -715,16 +758,14 @@ async def process_comment(message: Message, state: FSMContext):
             return
         comment_text = message.text
         data = await state.get_data()
-        plan: Plan = data.get("plan")
+        plan = await get_state_plan(state, session)
         tasks: List[Task] = plan.tasks
         task_index: int = data["commenting_task"]
-        comment = add_comment_to_task(
-            tasks[task_index].id, message.from_user.id, comment_text
+        comment = await add_comment_to_task(
+            session, tasks[task_index].id, message.from_user.id, comment_text
         )
         tasks[task_index].comments.append(comment)
-        plan.tasks = tasks
 
-        await state.update_data(tasks=tasks)
         await message.bot.edit_message_text(
             chat_id=data["chat_id"],
             message_id=data["message_id"],
@@ -741,14 +782,11 @@ async def process_comment(message: Message, state: FSMContext):
 
 
 @router.callback_query(PlanManagement.managing_plan, F.data == "edit_plan")
-async def start_editing_plan(callback: CallbackQuery, state: FSMContext):
+async def start_editing_plan(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     try:
-        data = await state.get_data()
-        plan: Plan | None = data.get("plan")
-        logger.info(plan)
-        if not plan:
-            plan = get_published_plan(callback.from_user.id)
-            await state.update_data(plan=plan)
+        plan = await get_state_plan(state, session, callback.from_user.id)
         logger.info(plan)
 
         tasks = plan.tasks
@@ -767,12 +805,14 @@ async def start_editing_plan(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data.startswith("edit_task_"))
-async def select_task_to_edit(callback: CallbackQuery, state: FSMContext):
+async def select_task_to_edit(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     try:
         task_index = int(callback.data.split("_")[2])
-        data = await state.get_data()
-        plan: Plan = data.get("plan")
-        tasks: List[Task] = plan.tasks
+        tasks: List[Task] = await get_plan_tasks(
+            session, (await state.get_data()).get("plan_id")
+        )
 
         task = tasks[task_index]
 
@@ -794,16 +834,12 @@ async def select_task_to_edit(callback: CallbackQuery, state: FSMContext):
 
 
 @router.message(PlanManagement.editing_task)
-async def process_task_edit(message: Message, state: FSMContext):
+async def process_task_edit(message: Message, state: FSMContext, session: AsyncSession):
     try:
         data = await state.get_data()
-        plan: Plan = data.get("plan")
-        tasks: List[Task] = plan.tasks
+        plan = await get_state_plan(state, session)
         index_to_update: int = data["editing_task_index"]
-        tasks[index_to_update].body = message.text
-        plan.tasks = tasks
-
-        await state.update_data(tasks=tasks)
+        await update_task(session, plan.tasks[index_to_update].id, message.text)
 
         await message.answer(
             text=get_full_plan(plan),
@@ -864,9 +900,11 @@ async def back_to_main_menu(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "edit_current_plan")
-async def edit_current_plan(callback: CallbackQuery, state: FSMContext):
+async def edit_current_plan(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     user_id = callback.from_user.id
-    plan = get_current_plan(user_id)
+    plan = await get_current_plan(session, user_id)
 
     if not plan:
         await callback.message.edit_text(
@@ -875,17 +913,17 @@ async def edit_current_plan(callback: CallbackQuery, state: FSMContext):
         await callback.answer()
         return
 
-    plan_body = get_plan_body(plan)
-
     current_date = datetime.now().strftime("%d.%m.%Y")
-    tasks = plan_body.split("\n")
 
     await state.update_data(
-        plan=plan, tasks=tasks, plan_name=plan.name, current_date=current_date
+        plan_id=str(plan.id),
+        tasks=[task.body for task in plan.tasks],
+        plan_name=plan.name,
+        current_date=current_date,
     )
 
     plan_body = f"📅 {current_date}\n📋 {plan.name}\n\n" + "\n".join(
-        f"• {task}" for task in tasks
+        f"• {task}" for task in get_plan_body(plan).split("\n")
     )
     await callback.message.edit_text(plan_body, reply_markup=plan_editor_keyboard())
     await state.set_state(UserState.editing_plan)
@@ -893,15 +931,15 @@ async def edit_current_plan(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "save_current_plan")
-async def save_current_plan(callback: CallbackQuery, state: FSMContext):
+async def save_current_plan(
+    callback: CallbackQuery, state: FSMContext, session: AsyncSession
+):
     data = await state.get_data()
-    tasks = data.get("tasks", [])
-    plan_name = data.get("plan_name")
-    plan_text = "\n".join(tasks)
+    user = await get_user_identity(session, callback.from_user.id)
 
-    create_user_plan(
-        user_id=callback.from_user.id, name=plan_name, tasks_text=plan_text
-    )
+    tasks = [task.strip() for task in data.get("tasks", []) if task.strip()]
+
+    await create_plans_bulk(session, [(data.get("plan_name"), tasks)], owner_id=user.id)
 
     await callback.message.edit_text(
         "✅ План успешно сохранен!", reply_markup=back_keyboard()
@@ -911,19 +949,23 @@ async def save_current_plan(callback: CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(F.data == "finish_day")
-async def finish_day(callback: CallbackQuery, state: FSMContext):
+async def finish_day(
+    callback: CallbackQuery,
+    state: FSMContext,
+    session: AsyncSession,
+    toggle_buffer: TaskToggleBuffer,
+):
     data = await state.get_data()
-    plan: Plan = data.get("plan")
-
-    if not plan:
-        plan = get_published_plan(callback.from_user.id)
-        state.update_data(plan=plan)
+    if data.get("plan_id"):
+        await toggle_buffer.flush(data["plan_id"], render=False, session=session)
+    plan = await get_state_plan(state, session, callback.from_user.id)
 
     tasks: List[Task] = plan.tasks
 
     completed_tasks_count = sum(1 for task in tasks if task.checked)
 
-    statistic: Statistic = create_statistic(
+    statistic: Statistic = await create_statistic(
+        session,
         user_id=callback.from_user.id,
         plan_id=plan.id,
         total_tasks=len(plan.tasks),
@@ -931,19 +973,24 @@ async def finish_day(callback: CallbackQuery, state: FSMContext):
         study_hours=0,
         group_id=callback.message.chat.id,
     )
-    reset_plan(plan.id)
+    await reset_plan(session, plan.id)
+    await leave_group_day(session, callback.message.chat.id, callback.from_user.id)
 
     await callback.message.edit_text(
         "📚 Сколько часов вы сегодня учились?\n\n"
         "Введите количество часов (например: 2.5)"
     )
     await state.set_state(PlanManagement.waiting_for_study_time)
-    await state.update_data(statistic=statistic)
+    await state.update_data(
+        statistic_id=str(statistic.id), completed_tasks=statistic.completed_tasks
+    )
     await callback.answer()
 
 
 @router.message(PlanManagement.waiting_for_study_time)
-async def process_study_time(message: Message, state: FSMContext, bot: Bot):
+async def process_study_time(
+    message: Message, state: FSMContext, bot: Bot, session: AsyncSession
+):
     try:
         logger.info(message.text)
         study_hours = float(message.text.replace(",", "."))
@@ -959,13 +1006,14 @@ async def process_study_time(message: Message, state: FSMContext, bot: Bot):
             return
 
         data = await state.get_data()
-        statistic: Statistic = data.get("statistic")
-        update_statistic(statistic_id=statistic.id, study_hours=study_hours)
+        await update_statistic(
+            session, statistic_id=data.get("statistic_id"), study_hours=study_hours
+        )
 
         await bot.send_message(
             chat_id=data.get("group_id"),
             text=f"🌙 {message.from_user.mention_html()} завершил день!\n"
-            f"✅ Выполнено задач: {str(statistic.completed_tasks)}\n"
+            f"✅ Выполнено задач: {str(data.get('completed_tasks'))}\n"
             f"📚 Время обучения: {study_hours:.1f} ч.",
             parse_mode="HTML",
         )
@@ -978,17 +1026,17 @@ async def process_study_time(message: Message, state: FSMContext, bot: Bot):
 
 
 @router.callback_query(F.data.startswith("delete_plan:"))
-async def handle_delete_plan(callback: CallbackQuery):
+async def handle_delete_plan(callback: CallbackQuery, session: AsyncSession):
     _, plan_type, plan_id = callback.data.split(":")
 
     if plan_type != "user":
         await callback.answer("Можно удалять только пользовательские планы")
         return
 
-    if delete_user_plan(callback.from_user.id, plan_id):
-        plans = get_user_plans(callback.from_user.id)
+    if await delete_user_plan(session, callback.from_user.id, plan_id):
+        page = await get_plans_page(session, "user", callback.from_user.id)
         await callback.message.edit_text(
-            "✅ План успешно удален", reply_markup=user_plans_keyboard(plans)
+            "✅ План успешно удален", reply_markup=user_plans_keyboard(page)
         )
     else:
         await callback.answer("Ошибка при удалении плана", show_alert=True)
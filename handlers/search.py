@@ -0,0 +1,57 @@
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import (
+    InlineQuery,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Message,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.search import MIN_QUERY_LENGTH, search_plans
+from keyboards.inline import search_results_keyboard
+from utils import get_plan_preview
+
+router = Router()
+
+FIND_USAGE = (
+    f"🔎 Введите запрос не короче {MIN_QUERY_LENGTH} символов:\n" "/find английский"
+)
+
+
+@router.inline_query()
+async def inline_plan_search(inline_query: InlineQuery, session: AsyncSession):
+    results = await search_plans(session, inline_query.from_user.id, inline_query.query)
+    await inline_query.answer(
+        [
+            InlineQueryResultArticle(
+                id=str(result.plan.id),
+                title=result.plan.name,
+                description=", ".join(task.body for task in result.plan.tasks[:5]),
+                input_message_content=InputTextMessageContent(
+                    message_text=get_plan_preview(result.plan), parse_mode="HTML"
+                ),
+            )
+            for result in results
+        ],
+        cache_time=30,
+        is_personal=True,
+    )
+
+
+@router.message(Command("find"))
+async def find_plans(message: Message, command: CommandObject, session: AsyncSession):
+    query = (command.args or "").strip()
+    if len(query) < MIN_QUERY_LENGTH:
+        await message.answer(FIND_USAGE)
+        return
+
+    results = await search_plans(session, message.from_user.id, query)
+    if not results:
+        await message.answer(f"🔎 По запросу «{query}» ничего не найдено")
+        return
+
+    await message.answer(
+        f"🔎 Найдено планов: {len(results)}",
+        reply_markup=search_results_keyboard(results, query),
+    )
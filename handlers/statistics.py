@@ -1,23 +1,91 @@
-from datetime import datetime
+import calendar
+from datetime import date, timedelta
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from database.chats import get_chat_today, get_chat_timezone, set_chat_timezone
+from database.rollups import GROUP_SCOPE, USER_SCOPE, week_start
 from database.statistics import (
+    get_group_leaderboard,
     get_group_statistics_by_chat_id,
+    get_period_statistics,
     get_user_lifetime_statistics,
 )
 
-
 router = Router()
 
+STATISTICS_USAGE = (
+    "Использование:\n"
+    "/static — статистика за все время\n"
+    "/static week — за текущую неделю\n"
+    "/static month — за текущий месяц\n"
+    "/static 2026-09 — за указанный месяц"
+)
+
+
+def parse_period(argument: str, today: date) -> tuple[date, date, str] | None:
+    """
+    Разбирает период из аргумента команды /static
+    :param argument: week, month или месяц в формате YYYY-MM
+    :param today: Текущая дата в часовом поясе чата
+    :return: Первый и последний день периода и его название или None
+    """
+    if argument == "week":
+        return today - timedelta(days=today.weekday()), today, "за неделю"
+    if argument == "month":
+        return today.replace(day=1), today, "за месяц"
+
+    try:
+        year, month = (int(part) for part in argument.split("-"))
+        start = date(year, month, 1)
+    except ValueError:
+        return None
+    end = start.replace(day=calendar.monthrange(year, month)[1])
+    return start, end, f"за {month:02d}.{year}"
+
 
 @router.message(Command("static"))
-async def show_statistics(message: Message):
-    current_date = datetime.now().strftime("%d.%m.%Y")
+async def show_statistics(
+    message: Message, command: CommandObject, session: AsyncSession
+):
+    is_group = message.chat.type in ["group", "supergroup"]
+    today = await get_chat_today(session, message.chat.id)
+    current_date = today.strftime("%d.%m.%Y")
+    argument = (command.args or "").strip().lower()
 
-    if message.chat.type in ["group", "supergroup"]:
-        completed_stats = get_group_statistics_by_chat_id(message.chat.id)
+    if argument:
+        period = parse_period(argument, today)
+        if period is None:
+            await message.answer(STATISTICS_USAGE)
+            return
+
+        start, end, title = period
+        if is_group:
+            scope, owner_id = GROUP_SCOPE, message.chat.id
+            header = "Статистика группы"
+        else:
+            scope, owner_id = USER_SCOPE, message.from_user.id
+            header = "Ваша статистика"
+        statistics = await get_period_statistics(session, scope, owner_id, start, end)
+
+        if statistics["total_completed"] == 0 and statistics["total_study_hours"] == 0:
+            await message.answer(f"📊 Статистики {title} пока нет!")
+            return
+
+        await message.answer(
+            f"📊 {header} {title} "
+            f"({start.strftime('%d.%m')}–{end.strftime('%d.%m.%Y')}):\n\n"
+            f"✅ Выполнено задач: {statistics['total_completed']}\n"
+            f"📚 Время обучения: {statistics['total_study_hours']:.1f} ч."
+        )
+        return
+
+    if is_group:
+        completed_stats = await get_group_statistics_by_chat_id(
+            session, message.chat.id
+        )
 
         if (
             completed_stats["total_completed"] == 0
@@ -32,7 +100,7 @@ async def show_statistics(message: Message):
             f"📚 Общее время обучения: {completed_stats['total_study_hours']:.1f} ч."
         )
     else:
-        statistics = get_user_lifetime_statistics(message.from_user.id)
+        statistics = await get_user_lifetime_statistics(session, message.from_user.id)
 
         if statistics["total_completed"] == 0 and statistics["total_study_hours"] == 0:
             await message.answer("📊 У вас пока нет статистики!")
@@ -43,3 +111,50 @@ async def show_statistics(message: Message):
             f"✅ Всего выполнено задач: {statistics['total_completed']}\n"
             f"📚 Общее время обучения: {statistics['total_study_hours']:.1f} ч."
         )
+
+
+@router.message(Command("leaderboard"))
+async def show_leaderboard(message: Message, session: AsyncSession):
+    if message.chat.type not in ["group", "supergroup"]:
+        await message.answer("Рейтинг доступен только в группах")
+        return
+
+    today = await get_chat_today(session, message.chat.id)
+    leaderboard = await get_group_leaderboard(session, message.chat.id, today)
+    if not leaderboard:
+        await message.answer("🏆 На этой неделе еще никто не завершил день!")
+        return
+
+    lines = [
+        f"{place}. {member['name']} — ✅ {member['completed_tasks']} "
+        f"({member['completion_rate']}%), 📚 {member['study_hours']:.1f} ч."
+        for place, member in enumerate(leaderboard, start=1)
+    ]
+    await message.answer(
+        f"🏆 Рейтинг недели с {week_start(today).strftime('%d.%m.%Y')}:\n\n"
+        + "\n".join(lines)
+    )
+
+
+@router.message(Command("timezone"))
+async def set_timezone(message: Message, command: CommandObject, session: AsyncSession):
+    name = (command.args or "").strip()
+    if not name:
+        timezone = await get_chat_timezone(session, message.chat.id)
+        await message.answer(
+            f"🕒 Часовой пояс чата: {timezone.key}\n"
+            "Чтобы изменить, отправьте /timezone Europe/Moscow"
+        )
+        return
+
+    if message.chat.type in ["group", "supergroup"]:
+        member = await message.chat.get_member(message.from_user.id)
+        if member.status not in ("creator", "administrator"):
+            await message.answer("Менять часовой пояс группы могут только админы")
+            return
+
+    if not await set_chat_timezone(session, message.chat.id, name):
+        await message.answer("❌ Неизвестный часовой пояс. Пример: Europe/Moscow")
+        return
+
+    await message.answer(f"✅ Часовой пояс чата: {name}")
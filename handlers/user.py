@@ -1,23 +1,21 @@
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
-from database.plan import get_user_plans
+from sqlalchemy.ext.asyncio import AsyncSession
+from database.plan import get_plans_page
 from keyboards.inline import create_plan_keyboard, plans_keyboard
 from states.plans import PlanCreation
 from utils import logger
-from database.database import db
 
 router = Router()
 
 
 @router.callback_query(F.data == "view_user_plans")
-async def handle_show_user_plans(callback: CallbackQuery):
+async def handle_show_user_plans(callback: CallbackQuery, session: AsyncSession):
     try:
-        db.refresh_session()
+        page = await get_plans_page(session, "user", callback.from_user.id)
 
-        user_plans = get_user_plans(callback.from_user.id)
-
-        if not user_plans:
+        if not page.plans:
             await callback.message.edit_text(
                 "У вас пока нет сохранённых планов.",
                 reply_markup=create_plan_keyboard(),
@@ -25,7 +23,7 @@ async def handle_show_user_plans(callback: CallbackQuery):
             return
 
         await callback.message.edit_text(
-            "📁 Ваши планы:", reply_markup=plans_keyboard(user_plans, "user")
+            "📁 Ваши планы:", reply_markup=plans_keyboard(page, "user")
         )
     except Exception as e:
         logger.error(f"Ошибка при показе планов: {e}")
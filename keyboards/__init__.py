@@ -23,6 +23,7 @@ from .inline import (
     plan_tasks_edit_keyboard,
     user_plans_keyboard,
     select_plan_keyboard,
+    search_results_keyboard,
 )
 
 from .reply import group_keyboard, personal_keyboard
@@ -52,6 +53,7 @@ __all__ = [
     "plan_tasks_edit_keyboard",
     "user_plans_keyboard",
     "select_plan_keyboard",
+    "search_results_keyboard",
     "group_keyboard",
     "personal_keyboard",
 ]
@@ -1,18 +1,26 @@
-from typing import Dict, List, Literal
+from functools import lru_cache
+from typing import Dict, List, Literal, Tuple
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from config.callback_data import PlanAction, PlansView
-from database.models import Plan, Task
+from config.callback_data import PlanAction, PlansPage, PlansView
+from database.models import Task
+from database.plan import PlanPage
+from database.search import PlanSearchResult
 
+KEYBOARD_CACHE_SIZE = 1024
 
+
+@lru_cache(maxsize=None)
 def btn_back(callback_data="back_to_main"):
     return InlineKeyboardButton(text="◀️ Назад", callback_data=callback_data)
 
 
+@lru_cache(maxsize=None)
 def kb_cancel_plan_creation() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[[btn_back()]])
 
 
+@lru_cache(maxsize=None)
 def kb_main_menu() -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -40,6 +48,7 @@ def kb_main_menu() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def kb_plans() -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -52,8 +61,38 @@ def kb_plans() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def page_buttons(
+    page: PlanPage, plan_type: Literal["base", "user"], from_types: bool = False
+) -> List[InlineKeyboardButton]:
+    buttons = []
+    if page.prev_cursor:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️",
+                callback_data=PlansPage(
+                    plan_type=plan_type,
+                    cursor=page.prev_cursor,
+                    before=True,
+                    from_types=from_types,
+                ).pack(),
+            )
+        )
+    if page.next_cursor:
+        buttons.append(
+            InlineKeyboardButton(
+                text="➡️",
+                callback_data=PlansPage(
+                    plan_type=plan_type,
+                    cursor=page.next_cursor,
+                    from_types=from_types,
+                ).pack(),
+            )
+        )
+    return buttons
+
+
 def plans_keyboard(
-    plans: List[Plan], type: Literal["base", "user"]
+    page: PlanPage, type: Literal["base", "user"]
 ) -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -61,12 +100,36 @@ def plans_keyboard(
                 text=plan.name, callback_data=f"plan_action:{type}:{plan.id}"
             )
         ]
-        for plan in plans
-    ] + [[btn_back()]]
+        for plan in page.plans
+    ]
+    navigation = page_buttons(page, type)
+    if navigation:
+        buttons.append(navigation)
+    buttons.append([btn_back()])
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+def search_results_keyboard(
+    results: List[PlanSearchResult], query: str
+) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+
+    for result in results:
+        builder.row(
+            InlineKeyboardButton(
+                text=result.plan.name,
+                callback_data=f"plan_action:{result.plan_type}:{result.plan.id}",
+            )
+        )
+    builder.row(
+        InlineKeyboardButton(text="📤 Поделиться в чат", switch_inline_query=query)
+    )
+
+    return builder.as_markup()
+
+
+@lru_cache(maxsize=None)
 def create_plan_keyboard() -> InlineKeyboardMarkup:
     buttons = [[btn_back()]]
 
@@ -84,12 +147,14 @@ def new_day_keyboard(bot_username, chat_id) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def back_keyboard() -> InlineKeyboardMarkup:
     buttons = [[btn_back()]]
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def management_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -136,6 +201,7 @@ def plan_creation_options_keyboard(
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def plan_edit_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -178,13 +244,18 @@ def plan_actions_keyboard(
 
 
 def task_edit_keyboard(tasks: List[Dict]) -> InlineKeyboardMarkup:
+    return task_edit_keyboard_for(len(tasks))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def task_edit_keyboard_for(count: int) -> InlineKeyboardMarkup:
     buttons = [
         [
             InlineKeyboardButton(
                 text=f"✏️ Изменить задачу {i+1}", callback_data=f"edit_task_{i}"
             )
         ]
-        for i in range(len(tasks))
+        for i in range(count)
     ] + [
         [InlineKeyboardButton(text="➕ Добавить пункт", callback_data="add_new_task")],
         [btn_back()],
@@ -194,13 +265,18 @@ def task_edit_keyboard(tasks: List[Dict]) -> InlineKeyboardMarkup:
 
 
 def task_position_keyboard(tasks: List[Dict]) -> InlineKeyboardMarkup:
+    return task_position_keyboard_for(len(tasks))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def task_position_keyboard_for(count: int) -> InlineKeyboardMarkup:
     buttons = [
         [
             InlineKeyboardButton(
                 text=f"Добавить после пункта {i+1}", callback_data=f"add_at_{i+1}"
             )
         ]
-        for i in range(len(tasks))
+        for i in range(count)
     ] + [
         [InlineKeyboardButton(text="Добавить в начало", callback_data="add_at_0")],
         [InlineKeyboardButton(text="◀️ Назад", callback_data="edit_tasks")],
@@ -210,13 +286,27 @@ def task_position_keyboard(tasks: List[Dict]) -> InlineKeyboardMarkup:
 
 
 def task_marking_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
+    """
+    Клавиатура отметки задач. Собранные клавиатуры кэшируются по текстам
+    задач и их отметкам, поэтому повторные переключения не пересобирают
+    разметку. Возвращаемый объект общий — его нельзя изменять
+    """
+    return task_marking_keyboard_for(
+        tuple((task.body, bool(task.checked)) for task in tasks)
+    )
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def task_marking_keyboard_for(
+    tasks: Tuple[Tuple[str, bool], ...],
+) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardBuilder()
 
-    for i, task in enumerate(tasks):
-        prefix = "✅" if task.checked else f"🟩"
+    for i, (body, checked) in enumerate(tasks):
+        prefix = "✅" if checked else f"🟩"
         keyboard.add(
             InlineKeyboardButton(
-                text=f"{prefix} {task.body}", callback_data=f"task_action:{i}"
+                text=f"{prefix} {body}", callback_data=f"task_action:{i}"
             )
         )
 
@@ -227,12 +317,17 @@ def task_marking_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
 
 
 def task_comments_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
+    return task_comments_keyboard_for(tuple(task.body[:20] for task in tasks))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def task_comments_keyboard_for(bodies: Tuple[str, ...]) -> InlineKeyboardMarkup:
     keyboard = InlineKeyboardBuilder()
 
-    for i, task in enumerate(tasks):
+    for i, body in enumerate(bodies):
         keyboard.add(
             InlineKeyboardButton(
-                text=f"{i+1}. {task.body[:20]}...", callback_data=f"comment_task_{i}"
+                text=f"{i+1}. {body}...", callback_data=f"comment_task_{i}"
             )
         )
 
@@ -242,6 +337,7 @@ def task_comments_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
     return keyboard.as_markup()
 
 
+@lru_cache(maxsize=None)
 def current_plan_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="✏️ Редактировать", callback_data="edit_tasks")],
@@ -251,6 +347,7 @@ def current_plan_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def plan_editor_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [
@@ -265,6 +362,7 @@ def plan_editor_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def plan_confirmation_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="✅ Опубликовать", callback_data="publish_plan")],
@@ -274,6 +372,7 @@ def plan_confirmation_keyboard() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
+@lru_cache(maxsize=None)
 def existing_plans_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="Базовые планы", callback_data="view_base_plans")],
@@ -296,13 +395,16 @@ def plan_management_keyboard(user_id: int) -> InlineKeyboardMarkup:
 
 
 def plan_tasks_edit_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
+    return plan_tasks_edit_keyboard_for(tuple(task.body for task in tasks))
+
+
+@lru_cache(maxsize=KEYBOARD_CACHE_SIZE)
+def plan_tasks_edit_keyboard_for(bodies: Tuple[str, ...]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    for i, task in enumerate(tasks):
+    for i, body in enumerate(bodies):
         builder.row(
-            InlineKeyboardButton(
-                text=f"{i+1}. {task.body}", callback_data=f"edit_task_{i}"
-            )
+            InlineKeyboardButton(text=f"{i+1}. {body}", callback_data=f"edit_task_{i}")
         )
     builder.row(
         InlineKeyboardButton(text="➕ Добавить пункт", callback_data="add_new_task")
@@ -312,37 +414,41 @@ def plan_tasks_edit_keyboard(tasks: List[Task]) -> InlineKeyboardMarkup:
     return builder.as_markup()
 
 
-def base_plans_keyboard(plans: List[Plan]) -> InlineKeyboardMarkup:
+def base_plans_keyboard(page: PlanPage) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    for plan in plans:
-        builder.add(
+    for plan in page.plans:
+        builder.row(
             InlineKeyboardButton(text=plan.name, callback_data=f"select_base_{plan.id}")
         )
 
-    builder.add(
+    navigation = page_buttons(page, "base", from_types=True)
+    if navigation:
+        builder.row(*navigation)
+    builder.row(
         InlineKeyboardButton(text="← Назад", callback_data="back_to_plan_types")
     )
 
-    builder.adjust(1)
     return builder.as_markup()
 
 
-def user_plans_keyboard(plans: List[Plan]) -> InlineKeyboardMarkup:
+def user_plans_keyboard(page: PlanPage) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
 
-    for plan in plans:
-        builder.add(
+    for plan in page.plans:
+        builder.row(
             InlineKeyboardButton(
                 text=plan.name, callback_data=f"plan_action:user:{plan.id}"
             )
         )
 
-    builder.add(
+    navigation = page_buttons(page, "user", from_types=True)
+    if navigation:
+        builder.row(*navigation)
+    builder.row(
         InlineKeyboardButton(text="← Назад", callback_data="back_to_plan_types")
     )
 
-    builder.adjust(1)
     return builder.as_markup()
 
 
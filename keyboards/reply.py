@@ -1,6 +1,8 @@
+from functools import lru_cache
 from aiogram.types import ReplyKeyboardMarkup, KeyboardButton
 
 
+@lru_cache(maxsize=None)
 def personal_keyboard() -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text="/start"), KeyboardButton(text="/help")],
@@ -13,6 +15,7 @@ def personal_keyboard() -> ReplyKeyboardMarkup:
     )
 
 
+@lru_cache(maxsize=None)
 def group_keyboard() -> ReplyKeyboardMarkup:
     buttons = [
         [KeyboardButton(text="/new_day"), KeyboardButton(text="/static")],
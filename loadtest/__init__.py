@@ -0,0 +1,4 @@
+from .scenario import load_fixture, plan_day, synthetic_updates
+from .session import StubSession
+
+__all__ = ["StubSession", "load_fixture", "plan_day", "synthetic_updates"]
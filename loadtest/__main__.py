@@ -0,0 +1,83 @@
+import argparse
+import asyncio
+import logging
+import os
+from pathlib import Path
+
+from loadtest.scenario import dump_fixture, load_fixture, synthetic_updates
+
+RESULTS = Path(__file__).resolve().parent / "results.jsonl"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest",
+        description="Нагрузочный тест бота без обращений к Telegram. "
+        "База данных пересоздается перед прогоном",
+    )
+    parser.add_argument("--users", type=int, default=20, help="пользователей")
+    parser.add_argument("--group-size", type=int, default=5, help="человек в группе")
+    parser.add_argument("--tasks", type=int, default=5, help="задач в плане")
+    parser.add_argument("--fixture", type=Path, help="JSONL с обновлениями")
+    parser.add_argument("--dump-fixture", type=Path, help="сохранить сценарий и выйти")
+    parser.add_argument(
+        "--database-url",
+        default="sqlite+aiosqlite:///loadtest.db",
+        help="база данных для прогона, например postgresql+asyncpg://...",
+    )
+    parser.add_argument(
+        "--api-latency", type=float, default=0, help="задержка Bot API, мс"
+    )
+    parser.add_argument(
+        "--think-time", type=float, default=0, help="пауза между действиями, мс"
+    )
+    parser.add_argument("--results", type=Path, default=RESULTS)
+    parser.add_argument("--no-save", action="store_true", help="не сохранять итог")
+    return parser.parse_args()
+
+
+async def main(args: argparse.Namespace) -> int:
+    # Движок создается при импорте моделей, поэтому настройки нужны раньше
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+    if args.database_url.startswith("sqlite"):
+        # SQLite держит одну блокировку записи на всю базу, поэтому запросы
+        # идут через одно соединение. FSM хранится в памяти: его начальное
+        # состояние читается до сессии обновления, а с одним соединением
+        # такие запросы стоят в очереди за всеми обработчиками
+        os.environ.update(DB_POOL_SIZE="1", DB_MAX_OVERFLOW="0", FSM_STORAGE="memory")
+    from loadtest.runner import (
+        find_baseline,
+        format_report,
+        load_results,
+        run,
+        save_result,
+    )
+
+    if args.fixture:
+        scenario, updates = args.fixture.name, load_fixture(args.fixture)
+    else:
+        scenario = f"plan_day:{args.group_size}:{args.tasks}"
+        updates = synthetic_updates(args.users, args.group_size, args.tasks)
+
+    result = {
+        "scenario": scenario,
+        **await run(updates, args.api_latency / 1000, args.think_time / 1000),
+    }
+    baseline = find_baseline(load_results(args.results), result)
+    print(format_report(result, baseline))
+    if not args.no_save:
+        save_result(args.results, result)
+    return 1 if result["errors"] else 0
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    if arguments.dump_fixture:
+        dump_fixture(
+            arguments.dump_fixture,
+            synthetic_updates(arguments.users, arguments.group_size, arguments.tasks),
+        )
+    else:
+        raise SystemExit(asyncio.run(main(arguments)))
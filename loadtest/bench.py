@@ -0,0 +1,64 @@
+import argparse
+import os
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+
+def parser(prog: str, description: str) -> argparse.ArgumentParser:
+    """
+    Общие аргументы микробенчмарков: база данных и число повторов
+    :param prog: Имя модуля для python -m
+    :param description: Что измеряет бенчмарк
+    """
+    result = argparse.ArgumentParser(prog=prog, description=description)
+    result.add_argument(
+        "--database-url",
+        default="sqlite+aiosqlite:///bench.db",
+        help="база данных, пересоздается перед прогоном",
+    )
+    result.add_argument("--repeat", type=int, default=50, help="повторов замера")
+    return result
+
+
+def configure(database_url: str) -> None:
+    """
+    Задает окружение до импорта моделей: движок создается при импорте
+    :param database_url: База данных для прогона
+    """
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("BOT_TOKEN", "123456:loadtest")
+
+
+async def measure(call: Callable[[], Awaitable], repeat: int) -> dict:
+    """
+    Выполняет call repeat раз и возвращает перцентили времени в мс
+    :param call: Замеряемая корутина
+    :param repeat: Число повторов
+    """
+    await call()
+    timings: List[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await call()
+        timings.append(time.perf_counter() - started)
+    return {
+        "p50_ms": round(statistics.median(timings) * 1000, 3),
+        "p90_ms": round(statistics.quantiles(timings, n=10)[-1] * 1000, 3),
+    }
+
+
+def format_table(rows: List[dict]) -> str:
+    """
+    Таблица замеров: по строке на вариант
+    :param rows: Словари с ключом name и значениями замеров
+    """
+    columns = [key for key in rows[0] if key != "name"]
+    width = max(len(row["name"]) for row in rows) + 2
+    lines = [f"{'':<{width}}" + "".join(f"{column:>12}" for column in columns)]
+    for row in rows:
+        lines.append(
+            f"{row['name']:<{width}}"
+            + "".join(f"{str(row[column]):>12}" for column in columns)
+        )
+    return "\n".join(lines)
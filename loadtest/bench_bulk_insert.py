@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+import uuid
+
+from loadtest.bench import configure, format_table, parser
+
+# Строк в одном INSERT ... VALUES: SQLite принимает до 32766 параметров
+VALUES_CHUNK = 1000
+
+
+def parse_args():
+    result = parser(
+        "python -m loadtest.bench_bulk_insert",
+        "Создание планов с задачами: ORM с flush на каждый план, "
+        "многострочный INSERT ... VALUES и create_plans_bulk",
+    )
+    result.set_defaults(repeat=1)
+    result.add_argument("--plans", type=int, default=2000, help="планов")
+    result.add_argument("--tasks", type=int, default=20, help="задач в плане")
+    return result.parse_args()
+
+
+async def orm_per_plan(session, owner_id, plans) -> None:
+    """Путь до create_plans_bulk: flush за ID плана и session.add на задачу"""
+    from database.models import Plan, Task, user_plans
+
+    for name, bodies in plans:
+        plan = Plan(name=name)
+        session.add(plan)
+        await session.flush()
+        await session.execute(
+            user_plans.insert().values(user_id=owner_id, plan_id=plan.id)
+        )
+        for position, body in enumerate(bodies):
+            session.add(Task(plan_id=plan.id, body=body, position=position))
+    await session.flush()
+
+
+async def multi_row_values(session, owner_id, plans) -> None:
+    """Те же строки, что у create_plans_bulk, но через insert().values([...])"""
+    from database.models import Plan, Task, user_plans
+
+    plan_rows, link_rows, task_rows = [], [], []
+    for name, bodies in plans:
+        plan_id = uuid.uuid4()
+        plan_rows.append({"id": plan_id, "name": name})
+        link_rows.append({"user_id": owner_id, "plan_id": plan_id})
+        task_rows.extend(
+            {
+                "id": uuid.uuid4(),
+                "plan_id": plan_id,
+                "body": body,
+                "position": position,
+                "checked": False,
+            }
+            for position, body in enumerate(bodies)
+        )
+    for table, rows in (
+        (Plan.__table__, plan_rows),
+        (user_plans, link_rows),
+        (Task.__table__, task_rows),
+    ):
+        for start in range(0, len(rows), VALUES_CHUNK):
+            await session.execute(
+                table.insert().values(rows[start : start + VALUES_CHUNK])
+            )
+
+
+async def bulk(session, owner_id, plans) -> None:
+    from database.plan import create_plans_bulk
+
+    await create_plans_bulk(session, plans, owner_id=owner_id)
+
+
+async def measure_variant(create, plans) -> float:
+    from database.models import SessionLocal, User
+    from loadtest.runner import reset_database
+
+    await reset_database()
+    async with SessionLocal() as session:
+        owner = User(telegram_id=1, name="Владелец")
+        session.add(owner)
+        await session.commit()
+        started_at = time.perf_counter()
+        await create(session, owner.id, plans)
+        await session.commit()
+        return time.perf_counter() - started_at
+
+
+async def main(args) -> None:
+    configure(args.database_url)
+    plans = [
+        (f"План {i}", [f"Задача {j} плана {i}" for j in range(args.tasks)])
+        for i in range(args.plans)
+    ]
+    rows = []
+    for _ in range(args.repeat):
+        for name, create in (
+            ("orm flush per plan", orm_per_plan),
+            (f"VALUES x{VALUES_CHUNK}", multi_row_values),
+            ("create_plans_bulk", bulk),
+        ):
+            seconds = await measure_variant(create, plans)
+            rows.append(
+                {
+                    "name": name,
+                    "seconds": round(seconds, 3),
+                    "tasks/s": round(args.plans * args.tasks / seconds),
+                }
+            )
+    print(f"{args.plans} plans x {args.tasks} tasks")
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,69 @@
+import argparse
+import timeit
+from types import SimpleNamespace
+
+from loadtest.bench import configure, format_table
+
+
+def parse_args():
+    result = argparse.ArgumentParser(
+        prog="python -m loadtest.bench_keyboards",
+        description="Сборка клавиатур без кэша и повторный вызов с кэшем",
+    )
+    result.add_argument("--tasks", type=int, default=15, help="задач в плане")
+    result.add_argument("--number", type=int, default=2000, help="вызовов на замер")
+    return result.parse_args()
+
+
+def microseconds(call, number: int) -> float:
+    return round(min(timeit.repeat(call, number=number, repeat=5)) / number * 1e6, 2)
+
+
+def main(args) -> None:
+    # Модули бота создают движок при импорте; база в замере не используется
+    configure("sqlite+aiosqlite:///bench.db")
+    from keyboards import inline
+
+    tasks = [
+        SimpleNamespace(body=f"Задача номер {i}", checked=i % 3 == 0)
+        for i in range(args.tasks)
+    ]
+    marking = tuple((task.body, task.checked) for task in tasks)
+    comments = tuple(task.body[:20] for task in tasks)
+    variants = [
+        (
+            "management_keyboard",
+            inline.management_keyboard.__wrapped__,
+            inline.management_keyboard,
+        ),
+        (
+            "kb_main_menu",
+            inline.kb_main_menu.__wrapped__,
+            inline.kb_main_menu,
+        ),
+        (
+            f"task_marking x{args.tasks}",
+            lambda: inline.task_marking_keyboard_for.__wrapped__(marking),
+            lambda: inline.task_marking_keyboard(tasks),
+        ),
+        (
+            f"task_comments x{args.tasks}",
+            lambda: inline.task_comments_keyboard_for.__wrapped__(comments),
+            lambda: inline.task_comments_keyboard(tasks),
+        ),
+    ]
+    rows = []
+    for name, build, cached in variants:
+        cached()
+        rows.append(
+            {
+                "name": name,
+                "build_us": microseconds(build, args.number),
+                "cached_us": microseconds(cached, args.number),
+            }
+        )
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -0,0 +1,119 @@
+import argparse
+import asyncio
+import time
+from types import SimpleNamespace
+
+from loadtest.bench import configure, format_table
+
+
+def parse_args():
+    result = argparse.ArgumentParser(
+        prog="python -m loadtest.bench_metrics",
+        description="Накладные расходы метрик Prometheus: middleware "
+        "обновлений, обработчиков и Bot API и подсчет SQL-запросов",
+    )
+    result.add_argument(
+        "--database-url",
+        default="sqlite+aiosqlite:///bench.db",
+        help="база данных для замера SQL-запросов",
+    )
+    result.add_argument("--number", type=int, default=5000, help="вызовов на замер")
+    return result.parse_args()
+
+
+async def per_call(call, number: int) -> float:
+    """
+    Лучшее из пяти время одного вызова в микросекундах
+    """
+    best = float("inf")
+    for _ in range(5):
+        started_at = time.perf_counter()
+        for _ in range(number):
+            await call()
+        best = min(best, time.perf_counter() - started_at)
+    return round(best / number * 1e6, 2)
+
+
+async def main(args) -> None:
+    configure(args.database_url)
+    from aiogram.methods import AnswerCallbackQuery
+    from aiogram.types import Update
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from middlewares.metrics import (
+        HandlerMetricsMiddleware,
+        TelegramMetricsMiddleware,
+        UpdateMetricsMiddleware,
+        instrument_engine,
+    )
+
+    async def handler(event, data):
+        return True
+
+    async def make_request(bot, method):
+        return True
+
+    update = Update.model_validate(
+        {
+            "update_id": 1,
+            "message": {
+                "message_id": 1,
+                "date": 0,
+                "chat": {"id": 1, "type": "private"},
+                "text": "/start",
+            },
+        }
+    )
+    data = {"handler": SimpleNamespace(callback=handler)}
+    method = AnswerCallbackQuery(callback_query_id="1")
+    update_metrics = UpdateMetricsMiddleware()
+    handler_metrics = HandlerMetricsMiddleware()
+    telegram_metrics = TelegramMetricsMiddleware()
+
+    rows = [
+        {
+            "name": "update middleware",
+            "plain_us": await per_call(lambda: handler(update, data), args.number),
+            "metrics_us": await per_call(
+                lambda: update_metrics(handler, update, data), args.number
+            ),
+        },
+        {
+            "name": "handler middleware",
+            "plain_us": await per_call(lambda: handler(update, data), args.number),
+            "metrics_us": await per_call(
+                lambda: handler_metrics(handler, update, data), args.number
+            ),
+        },
+        {
+            "name": "Bot API middleware",
+            "plain_us": await per_call(lambda: make_request(None, method), args.number),
+            "metrics_us": await per_call(
+                lambda: telegram_metrics(make_request, None, method), args.number
+            ),
+        },
+    ]
+
+    # Отдельные движки: подписку на события с движка не снять
+    plain = create_async_engine(args.database_url)
+    instrumented = create_async_engine(args.database_url)
+    instrument_engine(instrumented)
+    timings = {}
+    for name, engine in (("plain_us", plain), ("metrics_us", instrumented)):
+        async with engine.connect() as connection:
+
+            async def select_one():
+                await connection.execute(text("SELECT 1"))
+
+            timings[name] = await per_call(select_one, args.number)
+        await engine.dispose()
+    rows.append({"name": "SQL statement", **timings})
+
+    for row in rows:
+        row["overhead_us"] = round(row["metrics_us"] - row["plain_us"], 2)
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import uuid
+from datetime import date, timedelta
+
+from loadtest.bench import configure, format_table, measure, parser
+
+
+def parse_args():
+    result = parser(
+        "python -m loadtest.bench_statistics",
+        "Окно /static за месяц: сумма по сырым записям statistics "
+        "против дневных итогов statistics_daily",
+    )
+    result.add_argument("--members", type=int, default=20, help="участников группы")
+    result.add_argument("--days", type=int, default=730, help="дней истории")
+    return result.parse_args()
+
+
+async def fill(members: int, days: int, group_id: int, end: date) -> int:
+    """
+    Пишет по записи на участника в день и пересобирает итоги
+    :return: Telegram ID первого участника
+    """
+    from sqlalchemy import insert
+
+    from database.models import Plan, SessionLocal, Statistic, User
+    from database.rollups import rebuild_rollups
+
+    async with SessionLocal.begin() as session:
+        users = [
+            User(telegram_id=1000 + i, name=f"Участник {i}") for i in range(members)
+        ]
+        plan = Plan(name="План")
+        session.add_all([*users, plan])
+        await session.flush()
+        for offset in range(days):
+            day = end - timedelta(days=offset)
+            await session.execute(
+                insert(Statistic),
+                [
+                    {
+                        "id": uuid.uuid4(),
+                        "plan_id": plan.id,
+                        "user_id": user.id,
+                        "group_id": group_id,
+                        "total_tasks": 5,
+                        "completed_tasks": offset % 6,
+                        "study_hours": 1.5,
+                        "local_date": day,
+                    }
+                    for user in users
+                ],
+            )
+        await rebuild_rollups(session)
+        return users[0].telegram_id
+
+
+async def main(args) -> None:
+    configure(args.database_url)
+    from sqlalchemy import func, select
+
+    from database.models import SessionLocal, Statistic, User
+    from database.rollups import GROUP_SCOPE, USER_SCOPE
+    from database.statistics import get_period_statistics
+    from loadtest.runner import reset_database
+
+    group_id, end = -100, date(2026, 10, 18)
+    start = end.replace(day=1)
+    await reset_database()
+    telegram_id = await fill(args.members, args.days, group_id, end)
+
+    def raw(*filters):
+        async def call():
+            async with SessionLocal() as session:
+                await session.execute(
+                    select(
+                        func.sum(Statistic.completed_tasks),
+                        func.sum(Statistic.study_hours),
+                    )
+                    .join(User, Statistic.user_id == User.id)
+                    .filter(Statistic.local_date.between(start, end), *filters)
+                )
+
+        return call
+
+    def rollup(scope: str, owner_id: int):
+        async def call():
+            async with SessionLocal() as session:
+                await get_period_statistics(session, scope, owner_id, start, end)
+
+        return call
+
+    variants = [
+        ("group raw", raw(Statistic.group_id == group_id)),
+        ("group daily", rollup(GROUP_SCOPE, group_id)),
+        ("user raw", raw(User.telegram_id == telegram_id)),
+        ("user daily", rollup(USER_SCOPE, telegram_id)),
+    ]
+    rows = [
+        {"name": name, **await measure(call, args.repeat)} for name, call in variants
+    ]
+    print(f"statistics rows: {args.members * args.days}, window: {start} — {end}")
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
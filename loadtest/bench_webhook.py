@@ -0,0 +1,163 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import replace
+from typing import Awaitable, Callable, List
+
+from loadtest.bench import configure, format_table, parser
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args():
+    result = parser(
+        "python -m loadtest.bench_webhook",
+        "Сценарий нагрузочного теста через long polling (feed_raw_update) "
+        "и через HTTP-сервер вебхука с ограничением одновременных обновлений",
+    )
+    result.set_defaults(repeat=3)
+    result.add_argument("--users", type=int, default=50, help="пользователей")
+    result.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=10,
+        help="WEBHOOK_MAX_CONCURRENCY для прогона вебхука",
+    )
+    return result.parse_args()
+
+
+async def set_current_user(handler, event, data):
+    """
+    Обработчик вебхука выполняется в задаче сервера, а заглушке Bot API
+    нужен пользователь обновления, чтобы запомнить его клавиатуру.
+    При long polling значение совпадает с заданным в play
+    """
+    from loadtest.session import current_user
+
+    user = data.get("event_from_user")
+    if user is not None:
+        current_user.set(user.id)
+    return await handler(event, data)
+
+
+async def play(
+    updates: List[dict], feed: Callable[[dict], Awaitable[None]], session
+) -> dict:
+    from loadtest.runner import resolve, summarize
+    from loadtest.scenario import split_by_user
+    from loadtest.session import current_user
+
+    update_ids = iter(range(1, len(updates) + 1))
+    latencies: List[float] = []
+    errors = 0
+
+    async def user_stream(user_id: int, stream: List[dict]) -> None:
+        nonlocal errors
+        current_user.set(user_id)
+        for update in stream:
+            update = resolve(update, session, next(update_ids))
+            started_at = time.perf_counter()
+            try:
+                await feed(update)
+            except Exception as e:
+                errors += 1
+                logger.error(f"Error feeding update: {e}")
+            latencies.append(time.perf_counter() - started_at)
+
+    streams = split_by_user(updates)
+    started_at = time.perf_counter()
+    await asyncio.gather(*(user_stream(*item) for item in streams.items()))
+    elapsed = time.perf_counter() - started_at
+    total = summarize(latencies)
+    return {
+        "updates/s": round(len(updates) / elapsed, 1),
+        "p50_ms": total["p50_ms"],
+        "p90_ms": total["p90_ms"],
+        "p99_ms": total["p99_ms"],
+        "errors": errors,
+    }
+
+
+async def run_transport(
+    bot, dp, session, updates: List[dict], max_concurrency: int | None
+) -> dict:
+    """
+    Прогоняет сценарий на чистой базе
+    :param bot: Бот с заглушкой Bot API
+    :param dp: Диспетчер бота
+    :param session: Заглушка Bot API, StubSession
+    :param updates: Обновления сценария
+    :param max_concurrency: Лимит вебхука или None для long polling
+    """
+    from aiohttp.test_utils import TestClient, TestServer
+
+    import webhook
+    from config import load_config
+    from database.chats import timezone_cache
+    from database.user import identity_cache
+    from loadtest.runner import reset_database
+    from utils import plan_body_cache
+
+    await reset_database()
+    for cache in (identity_cache, timezone_cache, plan_body_cache):
+        cache.clear()
+
+    if max_concurrency is None:
+
+        async def feed(update: dict) -> None:
+            await dp.feed_raw_update(bot, update)
+
+        try:
+            return await play(updates, feed, session)
+        finally:
+            await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+
+    config = replace(load_config(), webhook_max_concurrency=max_concurrency)
+    client = TestClient(TestServer(webhook.create_app(dp, bot, config)))
+    await client.start_server()
+
+    async def feed(update: dict) -> None:
+        response = await client.post(config.webhook_path, json=update)
+        response.raise_for_status()
+        await response.read()
+
+    try:
+        return await play(updates, feed, session)
+    finally:
+        await client.close()
+
+
+async def main(args) -> None:
+    configure(args.database_url)
+    if args.database_url.startswith("sqlite"):
+        # Как в python -m loadtest: один писатель и FSM в памяти
+        os.environ.update(DB_POOL_SIZE="1", DB_MAX_OVERFLOW="0", FSM_STORAGE="memory")
+    # Перенос дня по расписанию не должен вмешиваться в замер
+    os.environ["ROLLOVER_INTERVAL"] = "0"
+    from bot import create_app
+    from config import load_config
+    from loadtest.scenario import synthetic_updates
+    from loadtest.session import StubSession
+
+    # Роутеры подключаются к диспетчеру один раз, поэтому оба транспорта
+    # используют один диспетчер, а база и кэши очищаются перед прогоном
+    session = StubSession()
+    bot, dp = create_app(load_config(), session=session, rate_limit=False)
+    dp.update.outer_middleware(set_current_user)
+    updates = synthetic_updates(args.users, 5, 5)
+    rows = []
+    for _ in range(args.repeat):
+        for name, limit in (
+            ("polling", None),
+            (f"webhook x{args.max_concurrency}", args.max_concurrency),
+        ):
+            result = await run_transport(bot, dp, session, updates, limit)
+            rows.append({"name": name, **result})
+    print(f"{args.users} users, {len(updates)} updates per run")
+    print(format_table(rows))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(main(parse_args()))
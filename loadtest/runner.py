@@ -0,0 +1,266 @@
+import asyncio
+import json
+import subprocess
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List
+
+from aiogram.dispatcher.event.bases import UNHANDLED
+from sqlalchemy import text
+
+from bot import create_app
+from config import load_config
+from database.init_db import create_default_plans, upgrade_db
+from database.models import Base, engine
+from loadtest.scenario import split_by_user, step_name
+from middlewares.metrics import SQL_STATEMENTS
+from loadtest.session import StubSession, current_user
+import logging
+
+logger = logging.getLogger(__name__)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(latencies: List[float]) -> dict:
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.9) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0) * 1000, 2),
+    }
+
+
+def sql_statements() -> Dict[str, List[float]]:
+    """
+    Читает метрику bot_sql_statements_per_update, которую ведет
+    UpdateMetricsMiddleware бота
+    :return: Сумма SQL-запросов и число обновлений по типам обновлений
+    """
+    totals: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0])
+    for metric in SQL_STATEMENTS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_sum"):
+                totals[sample.labels["type"]][0] = sample.value
+            elif sample.name.endswith("_count"):
+                totals[sample.labels["type"]][1] = sample.value
+    return totals
+
+
+def sql_per_update(before: Dict[str, List[float]], after: Dict[str, List[float]]):
+    """
+    SQL-запросы за прогон по разнице показаний метрики
+    :return: Всего запросов, в среднем на обновление и по типам обновлений
+    """
+    by_type, statements, updates = {}, 0.0, 0.0
+    for update_type, (type_statements, type_updates) in sorted(after.items()):
+        previous = before.get(update_type, [0.0, 0.0])
+        type_statements -= previous[0]
+        type_updates -= previous[1]
+        statements += type_statements
+        updates += type_updates
+        if type_updates:
+            by_type[update_type] = round(type_statements / type_updates, 2)
+    average = round(statements / updates, 2) if updates else 0
+    return int(statements), average, by_type
+
+
+def git_revision() -> dict:
+    def git(*args) -> str:
+        return subprocess.run(
+            ["git", *args], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        return {
+            "commit": git("rev-parse", "--short", "HEAD"),
+            "dirty": bool(git("status", "--porcelain", "--untracked-files=no")),
+        }
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+async def reset_database() -> None:
+    """
+    Пересоздает схему с нуля, чтобы прогоны на разных коммитах
+    начинались с одинаковых данных. В PostgreSQL схема строится
+    миграциями, в SQLite — по моделям
+    """
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+        await connection.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        if engine.dialect.name != "postgresql":
+            await connection.run_sync(Base.metadata.create_all)
+    if engine.dialect.name == "postgresql":
+        await upgrade_db()
+    await create_default_plans()
+
+
+def resolve(update: dict, session: StubSession, update_id: int) -> dict:
+    update = json.loads(json.dumps(update))
+    update["update_id"] = update_id
+    callback = update.get("callback_query")
+    if not callback:
+        return update
+
+    callback["id"] = str(update_id)
+    message = callback.get("message") or {}
+    keyboard = session.last_keyboard(message["chat"]["id"], callback["from"]["id"])
+    if keyboard is None:
+        return update
+    message_id, buttons = keyboard
+    if not message.get("message_id"):
+        message["message_id"] = message_id
+    data = callback.get("data") or ""
+    if data.endswith("*"):
+        callback["data"] = next(
+            (button for button in buttons if button.startswith(data[:-1])), data
+        )
+    return update
+
+
+async def run(
+    updates: List[dict], api_latency: float = 0.0, think_time: float = 0.0
+) -> dict:
+    """
+    Прогоняет обновления через диспетчер со всеми роутерами бота.
+    Запросы к Bot API уходят в StubSession, ограничитель частоты
+    не подключается: измеряется только работа самого бота
+    :param updates: Обновления в формате Bot API
+    :param api_latency: Задержка ответа Bot API в секундах
+    :param think_time: Пауза пользователя между обновлениями в секундах
+    :return: Результаты прогона
+    """
+    await reset_database()
+    session = StubSession(latency=api_latency)
+    config = load_config()
+    bot, dp = create_app(config, session=session, rate_limit=False)
+    update_ids = iter(range(1, len(updates) + 1))
+    steps: Dict[str, list] = defaultdict(list)
+    totals = {"errors": 0, "unhandled": 0}
+
+    async def play(user_id: int, stream: List[dict]) -> None:
+        current_user.set(user_id)
+        for update in stream:
+            update = resolve(update, session, next(update_ids))
+            started_at = time.perf_counter()
+            try:
+                result = await dp.feed_raw_update(bot, update)
+                if result is UNHANDLED:
+                    totals["unhandled"] += 1
+            except Exception as e:
+                totals["errors"] += 1
+                logger.error(f"Error processing {step_name(update)}: {e}")
+            steps[step_name(update)].append(time.perf_counter() - started_at)
+            if think_time:
+                await asyncio.sleep(think_time)
+
+    streams = split_by_user(updates)
+    sql_before = sql_statements()
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(play(user_id, stream) for user_id, stream in streams.items())
+    )
+    elapsed = time.perf_counter() - started_at
+    await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+
+    total_queries, queries, queries_by_type = sql_per_update(
+        sql_before, sql_statements()
+    )
+    latencies = [value for step in steps.values() for value in step]
+    return {
+        **git_revision(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "database": engine.dialect.name,
+        "fsm_storage": config.fsm_storage,
+        "users": len(streams),
+        "updates": len(updates),
+        "api_latency_ms": api_latency * 1000,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(updates) / elapsed, 1) if elapsed else 0,
+        **totals,
+        "total": {**summarize(latencies), "queries": queries},
+        "total_queries": total_queries,
+        "queries_by_type": queries_by_type,
+        "steps": {name: summarize(values) for name, values in sorted(steps.items())},
+        "api_calls": dict(sorted(session.calls.items())),
+    }
+
+
+def load_results(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def save_result(path: Path, result: dict) -> None:
+    with open(path, "a", encoding="utf-8") as file:
+        file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+def find_baseline(results: List[dict], result: dict) -> dict | None:
+    """
+    Последний сохраненный прогон с тем же сценарием, базой и задержкой
+    Bot API, с которым имеет смысл сравнивать
+    """
+    keys = (
+        "scenario",
+        "database",
+        "fsm_storage",
+        "users",
+        "updates",
+        "api_latency_ms",
+    )
+    for previous in reversed(results):
+        if all(previous.get(key) == result.get(key) for key in keys):
+            return previous
+    return None
+
+
+def format_report(result: dict, baseline: dict | None = None) -> str:
+    def change(key: str, value: float, base: dict | None) -> str:
+        if not base or not base.get(key):
+            return ""
+        return f" ({(value - base[key]) / base[key] * 100:+.1f}%)"
+
+    total = result["total"]
+    base_total = baseline["total"] if baseline else None
+    lines = [
+        f"Commit {result['commit']}{' (dirty)' if result['dirty'] else ''}, "
+        f"{result['database']}, {result['fsm_storage']} FSM, {result['users']} users, "
+        f"{result['updates']} updates, {result['seconds']} s",
+        f"Errors: {result['errors']}, unhandled: {result['unhandled']}",
+        f"Throughput: {result['throughput']} updates/s"
+        + change("throughput", result["throughput"], baseline),
+        "Latency: "
+        + ", ".join(
+            f"{key[:-3]} {total[key]} ms" + change(key, total[key], base_total)
+            for key in ("p50_ms", "p90_ms", "p99_ms", "max_ms")
+        ),
+        f"SQL per update: {total['queries']}"
+        + change("queries", total["queries"], base_total)
+        + "".join(
+            f", {update_type} {queries}"
+            for update_type, queries in result.get("queries_by_type", {}).items()
+        ),
+        "",
+        f"{'step':<20}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}",
+    ]
+    for name, step in result["steps"].items():
+        lines.append(
+            f"{name:<20}{step['count']:>7}{step['p50_ms']:>10}{step['p99_ms']:>10}"
+        )
+    if baseline:
+        lines += ["", f"Compared with {baseline['commit']} ({baseline['started_at']})"]
+    return "\n".join(lines)
@@ -0,0 +1,150 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+TASKS = ["Зарядка", "Завтрак", "Работа над проектом", "Чтение", "Прогулка"]
+
+
+def chat(chat_id: int) -> dict:
+    return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}
+
+
+def sender(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": f"User {user_id}"}
+
+
+def message_update(chat_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": 0,
+        "message": {
+            "message_id": 0,
+            "date": 0,
+            "chat": chat(chat_id),
+            "from": sender(user_id),
+            "text": text,
+        },
+    }
+
+
+def callback_update(chat_id: int, user_id: int, data: str) -> dict:
+    """
+    Нажатие inline-кнопки. message_id 0 означает последнее сообщение
+    с клавиатурой, отправленное в этот чат по обновлению этого же
+    пользователя, а data с "*" на конце — первую кнопку этой клавиатуры
+    с таким префиксом: так сценарий ссылается на ID, известные только
+    после отправки
+    """
+    return {
+        "update_id": 0,
+        "callback_query": {
+            "id": "0",
+            "chat_instance": str(chat_id),
+            "from": sender(user_id),
+            "data": data,
+            "message": {
+                "message_id": 0,
+                "date": 0,
+                "chat": chat(chat_id),
+                "from": {"id": 1, "is_bot": True, "first_name": "Load test"},
+                "text": "-",
+            },
+        },
+    }
+
+
+def plan_day(user_id: int, group_id: int, tasks: int = 5) -> List[dict]:
+    """
+    Обновления одного пользователя за день: создание плана, публикация
+    в группе, отметка задач и завершение дня
+    :param user_id: Telegram ID пользователя
+    :param group_id: ID группы, в которой публикуется план
+    :param tasks: Количество задач в плане
+    :return: Обновления в формате Bot API
+    """
+    bodies = [TASKS[i % len(TASKS)] + f" {i + 1}" for i in range(tasks)]
+    updates = [
+        message_update(user_id, user_id, "/start"),
+        callback_update(user_id, user_id, "create_plan"),
+        message_update(user_id, user_id, f"План {user_id}"),
+        message_update(user_id, user_id, "\n".join(bodies)),
+        message_update(user_id, user_id, "да"),
+        message_update(group_id, user_id, "/new_day"),
+        message_update(user_id, user_id, f"/start newday_{group_id}"),
+        callback_update(user_id, user_id, "use_existing_plan"),
+        callback_update(user_id, user_id, "view_user_plans"),
+        callback_update(user_id, user_id, "plan_action:user:*"),
+        callback_update(user_id, user_id, "finish_plan"),
+        callback_update(user_id, user_id, "publish_plan"),
+        callback_update(group_id, user_id, f"manage_plan:{user_id}"),
+        callback_update(group_id, user_id, "mark_tasks"),
+    ]
+    updates += [
+        callback_update(group_id, user_id, f"task_action:{i}")
+        for i in range(0, tasks, 2)
+    ]
+    updates += [
+        callback_update(group_id, user_id, "back_to_manage"),
+        callback_update(group_id, user_id, "finish_day"),
+        message_update(group_id, user_id, "2"),
+    ]
+    return updates
+
+
+def synthetic_updates(
+    users: int, group_size: int = 5, tasks: int = 5, first_user_id: int = 100000
+) -> List[dict]:
+    """
+    Сценарий plan_day для нескольких пользователей. Пользователи
+    публикуют планы в общие группы по group_size человек
+    """
+    updates = []
+    for i in range(users):
+        user_id = first_user_id + i
+        updates += plan_day(user_id, -(first_user_id + i // group_size), tasks)
+    return updates
+
+
+def load_fixture(path: Path) -> List[dict]:
+    """
+    Читает обновления из JSONL-файла: по одному JSON обновления Bot API
+    на строку, например как их присылает вебхук
+    """
+    with open(path, encoding="utf-8") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def dump_fixture(path: Path, updates: Iterable[dict]) -> None:
+    with open(path, "w", encoding="utf-8") as file:
+        for update in updates:
+            file.write(json.dumps(update, ensure_ascii=False) + "\n")
+
+
+def event_of(update: dict) -> dict:
+    return next(value for key, value in update.items() if key != "update_id")
+
+
+def split_by_user(updates: Iterable[dict]) -> Dict[int, List[dict]]:
+    """
+    Раскладывает обновления по отправителям. Пользователи обрабатываются
+    параллельно, обновления одного пользователя — по порядку
+    """
+    streams: Dict[int, List[dict]] = {}
+    for update in updates:
+        user_id = event_of(update).get("from", {}).get("id", 0)
+        streams.setdefault(user_id, []).append(update)
+    return streams
+
+
+def step_name(update: dict) -> str:
+    """
+    Имя шага для отчета: команда, "text" для ответа текстом
+    или callback data без ID
+    """
+    if "callback_query" in update:
+        data = update["callback_query"].get("data") or ""
+        return re.sub(r"[_\d]+$", "", data.split(":")[0])
+    if "message" in update:
+        text = update["message"].get("text") or ""
+        return text.split()[0] if text.startswith("/") else "text"
+    return next(key for key in update if key != "update_id")
@@ -0,0 +1,97 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import (
+    EditMessageReplyMarkup,
+    EditMessageText,
+    GetMe,
+    SendMessage,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup
+
+current_user: ContextVar[int | None] = ContextVar("current_user", default=None)
+
+
+class StubSession(BaseSession):
+    """
+    Сессия бота без сети: отвечает на запросы к Bot API так, как ответил
+    бы Telegram, и разбирает ответы тем же check_response, что и aiohttp.
+    Последняя inline-клавиатура запоминается по чату и пользователю,
+    от чьего обновления она отправлена
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.message_ids = itertools.count(1)
+        self.keyboards: Dict[Tuple[int, int | None], Tuple[int, List[str]]] = {}
+        self.calls: Counter = Counter()
+
+    def last_keyboard(
+        self, chat_id: int, user_id: int | None
+    ) -> Tuple[int, List[str]] | None:
+        return self.keyboards.get((chat_id, user_id))
+
+    def remember(self, chat_id: int, message_id: int, markup) -> None:
+        if isinstance(markup, InlineKeyboardMarkup):
+            self.keyboards[(chat_id, current_user.get())] = (
+                message_id,
+                [
+                    button.callback_data
+                    for row in markup.inline_keyboard
+                    for button in row
+                    if button.callback_data
+                ],
+            )
+
+    def fake_result(self, bot: Bot, method: TelegramMethod[TelegramType]):
+        if isinstance(method, GetMe):
+            return {
+                "id": bot.id,
+                "is_bot": True,
+                "first_name": "Load test",
+                "username": "loadtest_bot",
+            }
+        if not isinstance(
+            method, (SendMessage, EditMessageText, EditMessageReplyMarkup)
+        ):
+            return True
+        if getattr(method, "inline_message_id", None):
+            return True
+
+        chat_id = int(method.chat_id)
+        message_id = getattr(method, "message_id", None) or next(self.message_ids)
+        self.remember(chat_id, message_id, method.reply_markup)
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "text": getattr(method, "text", None) or "-",
+        }
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod[TelegramType], timeout: int | None = None
+    ) -> TelegramType:
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        content = json.dumps({"ok": True, "result": self.fake_result(bot, method)})
+        response = self.check_response(bot, method, status_code=200, content=content)
+        return response.result
+
+    async def stream_content(
+        self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True
+    ):
+        yield b""
+
+    async def close(self) -> None:
+        pass
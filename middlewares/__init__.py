@@ -0,0 +1,13 @@
+from .database import DbSessionMiddleware
+from .edit_dedup import EditDedupMiddleware
+from .metrics import MetricsStorage, register_cache, setup_metrics
+from .rate_limit import RateLimitMiddleware
+
+__all__ = [
+    "DbSessionMiddleware",
+    "EditDedupMiddleware",
+    "MetricsStorage",
+    "RateLimitMiddleware",
+    "register_cache",
+    "setup_metrics",
+]
@@ -0,0 +1,142 @@
+from typing import Hashable
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    DeleteMessage,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    SendMessage,
+    TelegramMethod,
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import InlineKeyboardMarkup, Message
+from database.cache import TTLCache
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(method: SendMessage | EditMessageText) -> int:
+    return hash(
+        repr(
+            (
+                method.text,
+                method.parse_mode,
+                method.entities,
+                method.link_preview_options,
+            )
+        )
+    )
+
+
+def markup_hash(markup) -> int | None:
+    if not isinstance(markup, InlineKeyboardMarkup):
+        return None
+    return hash(markup.model_dump_json())
+
+
+def message_key(chat_id, message_id, inline_message_id) -> Hashable | None:
+    if inline_message_id:
+        return inline_message_id
+    if chat_id is None or message_id is None:
+        return None
+    return chat_id, message_id
+
+
+class EditDedupMiddleware(BaseRequestMiddleware):
+    """
+    Запоминает хэши текста и inline-клавиатуры последнего отправленного
+    состояния каждого сообщения и не отправляет правки, которые ничего
+    не меняют: Telegram ответил бы на них "message is not modified".
+    Вместо ответа Telegram пропущенная правка возвращает то, что
+    вернул бы Bot API: последний Message, полученный для этого сообщения,
+    или True для inline-сообщений. Состояние хранится в памяти процесса,
+    поэтому правки сообщений должны идти из одного процесса бота
+    """
+
+    def __init__(self, maxsize: int = 10000):
+        self.states = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        self.saved = 0
+
+    def stats(self) -> dict:
+        return {"tracked": len(self.states.items), "saved_calls": self.saved}
+
+    async def report(self) -> None:
+        logger.info(f"Skipped {self.saved} unchanged message edits")
+
+    def remember(
+        self,
+        key: Hashable,
+        text: int | None,
+        markup: int | None,
+        result: Message | bool | None = None,
+    ) -> None:
+        if text is None:
+            state = self.states.get(key)
+            if state is None:
+                return
+            text = state[0]
+        if isinstance(key, str):
+            result = True
+        elif not isinstance(result, Message):
+            result = None
+        self.states.set(key, (text, markup, result))
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        if isinstance(method, SendMessage):
+            result = await make_request(bot, method)
+            if isinstance(result, Message):
+                self.remember(
+                    (result.chat.id, result.message_id),
+                    text_hash(method),
+                    markup_hash(method.reply_markup),
+                    result,
+                )
+            return result
+
+        if isinstance(method, DeleteMessage):
+            self.states.invalidate((method.chat_id, method.message_id))
+            return await make_request(bot, method)
+
+        if not isinstance(method, (EditMessageText, EditMessageReplyMarkup)):
+            return await make_request(bot, method)
+
+        key = message_key(
+            getattr(method, "chat_id", None),
+            getattr(method, "message_id", None),
+            getattr(method, "inline_message_id", None),
+        )
+        if key is None:
+            return await make_request(bot, method)
+
+        text = text_hash(method) if isinstance(method, EditMessageText) else None
+        markup = markup_hash(method.reply_markup)
+        state = self.states.get(key)
+        if (
+            state is not None
+            and state[2] is not None
+            and (text is None or state[0] == text)
+            and state[1] == markup
+        ):
+            self.saved += 1
+            logger.debug(f"Skipped unchanged {type(method).__name__} for {key}")
+            return state[2]
+
+        try:
+            result = await make_request(bot, method)
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                self.remember(key, text, markup)
+            raise
+        self.remember(key, text, markup, result)
+        return result
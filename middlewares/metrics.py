@@ -0,0 +1,229 @@
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Mapping
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.dispatcher.event.bases import UNHANDLED
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject, Update
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+UPDATES = Counter("bot_updates_total", "Обработанные обновления", ["type", "handled"])
+UPDATE_SECONDS = Histogram(
+    "bot_update_seconds", "Время обработки обновления целиком", ["type"]
+)
+HANDLER_SECONDS = Histogram(
+    "bot_handler_seconds", "Время работы обработчика", ["router", "handler"]
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Исключения в обработчиках", ["router", "handler"]
+)
+FSM_TRANSITIONS = Counter(
+    "bot_fsm_transitions_total", "Переходы FSM в состояние", ["state"]
+)
+SQL_STATEMENTS = Histogram(
+    "bot_sql_statements_per_update",
+    "Количество SQL-запросов на обновление",
+    ["type"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+SQL_SECONDS = Histogram(
+    "bot_sql_seconds_per_update", "Время SQL-запросов на обновление", ["type"]
+)
+TELEGRAM_SECONDS = Histogram(
+    "bot_telegram_request_seconds", "Время запроса к Bot API", ["method"]
+)
+TELEGRAM_ERRORS = Counter(
+    "bot_telegram_errors_total", "Ошибки запросов к Bot API", ["method", "error"]
+)
+
+
+class CacheStatsCollector:
+    """
+    Отдает в /metrics попадания, промахи, размер кэшей в памяти процесса
+    и, если кэш его считает, объем значений в байтах. Счетчики читаются
+    из stats() кэша в момент сбора метрик
+    """
+
+    def __init__(self):
+        self.caches: Dict[str, Callable[[], dict]] = {}
+
+    def collect(self):
+        hits = CounterMetricFamily(
+            "bot_cache_hits", "Попадания в кэш", labels=["cache"]
+        )
+        misses = CounterMetricFamily(
+            "bot_cache_misses", "Промахи кэша", labels=["cache"]
+        )
+        size = GaugeMetricFamily("bot_cache_size", "Записей в кэше", labels=["cache"])
+        size_bytes = GaugeMetricFamily(
+            "bot_cache_bytes", "Объем значений в кэше, байт", labels=["cache"]
+        )
+        for name, stats in self.caches.items():
+            values = stats()
+            hits.add_metric([name], values["hits"])
+            misses.add_metric([name], values["misses"])
+            size.add_metric([name], values["size"])
+            if "bytes" in values:
+                size_bytes.add_metric([name], values["bytes"])
+        return [hits, misses, size, size_bytes]
+
+
+CACHE_STATS = CacheStatsCollector()
+REGISTRY.register(CACHE_STATS)
+
+
+def register_cache(name: str, stats: Callable[[], dict]) -> None:
+    """
+    Добавляет кэш в метрики bot_cache_*
+    :param name: Значение метки cache
+    :param stats: Функция, возвращающая hits, misses, size и, если есть, bytes
+    """
+    CACHE_STATS.caches[name] = stats
+
+
+sql_usage: ContextVar[List[float] | None] = ContextVar("sql_usage", default=None)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """
+    Подписывается на события движка и считает количество и время
+    SQL-запросов, выполненных в рамках текущего обновления
+    :param engine: Асинхронный движок SQLAlchemy
+    """
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        context.metrics_started_at = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        usage = sql_usage.get()
+        if usage is not None:
+            usage[0] += 1
+            usage[1] += time.perf_counter() - context.metrics_started_at
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: считает обновления по типам, общее
+    время обработки и SQL-запросы, выполненные за обновление
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        update_type = event.event_type
+        usage = [0, 0.0]
+        token = sql_usage.set(usage)
+        started_at = time.perf_counter()
+        result = UNHANDLED
+        try:
+            result = await handler(event, data)
+            return result
+        finally:
+            UPDATE_SECONDS.labels(update_type).observe(time.perf_counter() - started_at)
+            UPDATES.labels(update_type, str(result is not UNHANDLED).lower()).inc()
+            SQL_STATEMENTS.labels(update_type).observe(usage[0])
+            SQL_SECONDS.labels(update_type).observe(usage[1])
+            sql_usage.reset(token)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Внутренний middleware событий: измеряет время работы конкретного
+    обработчика. Метка router — модуль, в котором объявлен обработчик
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        labels = (callback.__module__, callback.__name__)
+        started_at = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.labels(*labels).inc()
+            raise
+        finally:
+            HANDLER_SECONDS.labels(*labels).observe(time.perf_counter() - started_at)
+
+
+class TelegramMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> TelegramType:
+        name = type(method).__name__
+        started_at = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_ERRORS.labels(name, type(e).__name__).inc()
+            raise
+        finally:
+            TELEGRAM_SECONDS.labels(name).observe(time.perf_counter() - started_at)
+
+
+class MetricsStorage(BaseStorage):
+    """
+    Обертка над хранилищем FSM, которая считает переходы в состояния
+    """
+
+    def __init__(self, storage: BaseStorage):
+        self.storage = storage
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        name = state.state if isinstance(state, State) else state
+        FSM_TRANSITIONS.labels(name or "none").inc()
+        await self.storage.set_state(key, state)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return await self.storage.get_state(key)
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        await self.storage.set_data(key, data)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        return await self.storage.get_data(key)
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+
+def setup_metrics(dp: Dispatcher, bot: Bot, engine: AsyncEngine) -> None:
+    """
+    Подключает сбор метрик к диспетчеру, сессии бота и движку базы данных.
+    Вызывается после остальных middleware сессии, чтобы время запросов
+    к Bot API не включало ожидание в ограничителе частоты. Хранилище FSM
+    оборачивается в MetricsStorage при создании диспетчера
+    :param dp: Диспетчер
+    :param bot: Экземпляр бота
+    :param engine: Асинхронный движок SQLAlchemy
+    """
+    instrument_engine(engine)
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    handler_metrics = HandlerMetricsMiddleware()
+    for name, observer in dp.observers.items():
+        if name not in ("update", "error"):
+            observer.middleware(handler_metrics)
+    bot.session.middleware(TelegramMetricsMiddleware())
@@ -0,0 +1,189 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import suppress
+from typing import Dict, List, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, AnswerInlineQuery, TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+import logging
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE_METHODS = (AnswerCallbackQuery, AnswerInlineQuery)
+
+# Очередность в общем лимите: ответы на нажатия, правки, остальное
+INTERACTIVE, EDIT, BROADCAST = 0, 1, 2
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def take(self, reserve: float = 0) -> float:
+        """
+        Забирает токен, если он есть сверх резерва
+        :param reserve: Сколько токенов оставить для более важных запросов
+        :return: 0, если токен получен, иначе сколько секунд подождать
+        """
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self.refill(now)
+        if self.tokens >= 1 + reserve:
+            self.tokens -= 1
+            return 0
+        return (1 + reserve - self.tokens) / self.rate
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+    def is_idle(self) -> bool:
+        self.refill(time.monotonic())
+        return self.tokens >= self.capacity and time.monotonic() >= self.blocked_until
+
+
+class PriorityBucket(TokenBucket):
+    """
+    Общий лимит бота с очередью. Пока есть ожидающие, токены выдает одна
+    задача: сначала запросам с меньшим priority, внутри приоритета — по
+    порядку прихода. Запросам BROADCAST нужно еще reserve токенов сверх
+    своего, чтобы ответы на нажатия и правки не ждали пополнения
+    """
+
+    def __init__(self, rate: float, capacity: float, reserve: float = 0):
+        super().__init__(rate, capacity)
+        self.reserve = reserve
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.order = itertools.count()
+        self.wakeup = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def reserve_for(self, priority: int) -> float:
+        return self.reserve if priority == BROADCAST else 0
+
+    async def acquire(self, priority: int) -> None:
+        if not self.waiters and self.take(self.reserve_for(priority)) == 0:
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.order), future))
+        self.wakeup.set()
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self.dispatch())
+        await future
+
+    async def dispatch(self) -> None:
+        while self.waiters:
+            priority, _, future = self.waiters[0]
+            if future.done():
+                # Вызывающий перестал ждать, токен ему не нужен
+                heapq.heappop(self.waiters)
+                continue
+            delay = self.take(self.reserve_for(priority))
+            if delay == 0:
+                heapq.heappop(self.waiters)
+                future.set_result(None)
+                continue
+            # Запрос с более высоким приоритетом будит очередь раньше
+            self.wakeup.clear()
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(self.wakeup.wait(), delay)
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Планировщик исходящих запросов к Telegram. Держит общий лимит бота
+    и лимиты на каждый чат. В общем лимите ответы на нажатия кнопок идут
+    первыми в очереди, за ними правки сообщений, за ними остальные
+    запросы; лимит чата ответы на нажатия не занимают. При 429 ждет
+    retry_after и повторяет запрос
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30,
+        chat_rate: float = 1,
+        group_rate: float = 20 / 60,
+        group_burst: float = 5,
+        broadcast_reserve: float = 5,
+        max_retries: int = 3,
+    ):
+        self.global_bucket = PriorityBucket(
+            global_rate, global_rate, reserve=broadcast_reserve
+        )
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+        self.chat_buckets: Dict[int | str, TokenBucket] = {}
+
+    def chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) > 10000:
+                self.chat_buckets = {
+                    key: value
+                    for key, value in self.chat_buckets.items()
+                    if not value.is_idle()
+                }
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, 1)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def acquire(self, bucket: TokenBucket) -> None:
+        while (delay := bucket.take()) > 0:
+            await asyncio.sleep(delay)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if isinstance(method, INTERACTIVE_METHODS):
+            priority = INTERACTIVE
+        elif type(method).__name__.startswith("Edit"):
+            priority = EDIT
+        else:
+            priority = BROADCAST
+
+        for attempt in range(self.max_retries + 1):
+            if chat_id is not None and priority != INTERACTIVE:
+                await self.acquire(self.chat_bucket(chat_id))
+            await self.global_bucket.acquire(priority)
+
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt == self.max_retries:
+                    raise
+                logger.warning(
+                    f"Flood control on {type(method).__name__}, "
+                    f"retry in {e.retry_after} s"
+                )
+                if chat_id is not None:
+                    self.chat_bucket(chat_id).block(e.retry_after)
+                else:
+                    self.global_bucket.block(e.retry_after)
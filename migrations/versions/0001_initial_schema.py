@@ -0,0 +1,107 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 12:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def timestamps():
+    return [
+        sa.Column(
+            "created_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+    ]
+
+
+def upgrade():
+    op.create_table(
+        "plans",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        *timestamps(),
+    )
+    op.create_table(
+        "users",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False, unique=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column(
+            "current_plan_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("plans.id"),
+            nullable=True,
+        ),
+        sa.Column(
+            "published_plan_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("plans.id"),
+            nullable=True,
+        ),
+        *timestamps(),
+    )
+    op.create_table(
+        "user_plans",
+        sa.Column("user_id", UUID(as_uuid=True), sa.ForeignKey("users.id")),
+        sa.Column("plan_id", UUID(as_uuid=True), sa.ForeignKey("plans.id")),
+        *timestamps(),
+    )
+    op.create_table(
+        "tasks",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "plan_id", UUID(as_uuid=True), sa.ForeignKey("plans.id"), nullable=False
+        ),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("checked", sa.Boolean(), nullable=False),
+        *timestamps(),
+    )
+    op.create_table(
+        "comments",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "task_id", UUID(as_uuid=True), sa.ForeignKey("tasks.id"), nullable=False
+        ),
+        sa.Column(
+            "author_id", UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False
+        ),
+        sa.Column("body", sa.Text(), nullable=False),
+        *timestamps(),
+    )
+    op.create_table(
+        "statistics",
+        sa.Column("id", UUID(as_uuid=True), primary_key=True),
+        sa.Column(
+            "plan_id", UUID(as_uuid=True), sa.ForeignKey("plans.id"), nullable=False
+        ),
+        sa.Column(
+            "user_id", UUID(as_uuid=True), sa.ForeignKey("users.id"), nullable=False
+        ),
+        sa.Column("group_id", sa.BigInteger(), nullable=True),
+        sa.Column("total_tasks", sa.Integer(), nullable=False),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False),
+        sa.Column("study_hours", sa.Float(), nullable=False),
+        *timestamps(),
+    )
+
+
+def downgrade():
+    op.drop_table("statistics")
+    op.drop_table("comments")
+    op.drop_table("tasks")
+    op.drop_table("user_plans")
+    op.drop_table("users")
+    op.drop_table("plans")
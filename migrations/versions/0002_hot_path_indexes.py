@@ -0,0 +1,57 @@
+"""hot path indexes and user_plans primary key
+
+Duplicate user_plans links are removed by ctid, which exists only in
+PostgreSQL; on other databases the cleanup is skipped.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 12:30:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("DELETE FROM user_plans WHERE user_id IS NULL OR plan_id IS NULL")
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(
+            "DELETE FROM user_plans a USING user_plans b "
+            "WHERE a.ctid < b.ctid AND a.user_id = b.user_id "
+            "AND a.plan_id = b.plan_id"
+        )
+    op.alter_column("user_plans", "user_id", nullable=False)
+    op.alter_column("user_plans", "plan_id", nullable=False)
+    op.create_primary_key("user_plans_pkey", "user_plans", ["user_id", "plan_id"])
+    op.create_index("ix_user_plans_plan_id", "user_plans", ["plan_id"])
+
+    op.create_index("ix_tasks_plan_id", "tasks", ["plan_id"])
+    op.create_index("ix_comments_task_id", "comments", ["task_id"])
+    op.create_index("ix_statistics_plan_id", "statistics", ["plan_id"])
+    op.create_index(
+        "ix_statistics_user_plan_created",
+        "statistics",
+        ["user_id", "plan_id", sa.text("created_at DESC")],
+    )
+    op.create_index(
+        "ix_statistics_group_created", "statistics", ["group_id", "created_at"]
+    )
+
+
+def downgrade():
+    op.drop_index("ix_statistics_group_created", table_name="statistics")
+    op.drop_index("ix_statistics_user_plan_created", table_name="statistics")
+    op.drop_index("ix_statistics_plan_id", table_name="statistics")
+    op.drop_index("ix_comments_task_id", table_name="comments")
+    op.drop_index("ix_tasks_plan_id", table_name="tasks")
+
+    op.drop_index("ix_user_plans_plan_id", table_name="user_plans")
+    op.drop_constraint("user_plans_pkey", "user_plans", type_="primary")
+    op.alter_column("user_plans", "plan_id", nullable=True)
+    op.alter_column("user_plans", "user_id", nullable=True)
@@ -0,0 +1,48 @@
+"""fsm storage table and task positions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "fsm_storage",
+        sa.Column("key", sa.String(), primary_key=True),
+        sa.Column("state", sa.String(), nullable=True),
+        sa.Column("data", sa.JSON(), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+    )
+
+    op.add_column(
+        "tasks",
+        sa.Column("position", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        "UPDATE tasks SET position = ordered.position FROM ("
+        "SELECT id, row_number() OVER "
+        "(PARTITION BY plan_id ORDER BY created_at, id) - 1 AS position "
+        "FROM tasks) AS ordered WHERE tasks.id = ordered.id"
+    )
+    op.drop_index("ix_tasks_plan_id", table_name="tasks")
+    op.create_index("ix_tasks_plan_id_position", "tasks", ["plan_id", "position"])
+
+
+def downgrade():
+    op.drop_index("ix_tasks_plan_id_position", table_name="tasks")
+    op.create_index("ix_tasks_plan_id", "tasks", ["plan_id"])
+    op.drop_column("tasks", "position")
+
+    op.drop_table("fsm_storage")
@@ -0,0 +1,60 @@
+"""daily and lifetime statistics rollups
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "statistics_daily",
+        sa.Column("scope", sa.String(8), primary_key=True),
+        sa.Column("owner_id", sa.BigInteger(), primary_key=True),
+        sa.Column("day", sa.Date(), primary_key=True),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False),
+        sa.Column("study_hours", sa.Float(), nullable=False),
+    )
+    op.create_table(
+        "statistics_lifetime",
+        sa.Column("scope", sa.String(8), primary_key=True),
+        sa.Column("owner_id", sa.BigInteger(), primary_key=True),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False),
+        sa.Column("study_hours", sa.Float(), nullable=False),
+    )
+
+    op.execute(
+        "INSERT INTO statistics_daily "
+        "(scope, owner_id, day, completed_tasks, study_hours) "
+        "SELECT 'user', users.telegram_id, "
+        "(statistics.created_at AT TIME ZONE 'UTC')::date, "
+        "sum(statistics.completed_tasks), sum(statistics.study_hours) "
+        "FROM statistics JOIN users ON statistics.user_id = users.id "
+        "GROUP BY 1, 2, 3 "
+        "UNION ALL "
+        "SELECT 'group', statistics.group_id, "
+        "(statistics.created_at AT TIME ZONE 'UTC')::date, "
+        "sum(statistics.completed_tasks), sum(statistics.study_hours) "
+        "FROM statistics WHERE statistics.group_id IS NOT NULL "
+        "GROUP BY 1, 2, 3"
+    )
+    op.execute(
+        "INSERT INTO statistics_lifetime "
+        "(scope, owner_id, completed_tasks, study_hours) "
+        "SELECT scope, owner_id, sum(completed_tasks), sum(study_hours) "
+        "FROM statistics_daily GROUP BY scope, owner_id"
+    )
+
+
+def downgrade():
+    op.drop_table("statistics_lifetime")
+    op.drop_table("statistics_daily")
@@ -0,0 +1,57 @@
+"""statistics local date and chat timezones
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "chat_settings",
+        sa.Column("chat_id", sa.BigInteger(), primary_key=True),
+        sa.Column("timezone", sa.String(), nullable=False),
+        sa.Column(
+            "updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()
+        ),
+    )
+
+    op.add_column("statistics", sa.Column("local_date", sa.Date(), nullable=True))
+    op.execute(
+        "UPDATE statistics SET local_date = (created_at AT TIME ZONE 'UTC')::date"
+    )
+    op.alter_column("statistics", "local_date", nullable=False)
+
+    op.drop_index("ix_statistics_group_created", table_name="statistics")
+    op.create_index(
+        "ix_statistics_user_local_date",
+        "statistics",
+        ["user_id", "local_date"],
+        postgresql_include=["completed_tasks", "study_hours"],
+    )
+    op.create_index(
+        "ix_statistics_group_local_date",
+        "statistics",
+        ["group_id", "local_date"],
+        postgresql_include=["completed_tasks", "study_hours"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_statistics_group_local_date", table_name="statistics")
+    op.drop_index("ix_statistics_user_local_date", table_name="statistics")
+    op.create_index(
+        "ix_statistics_group_created", "statistics", ["group_id", "created_at"]
+    )
+    op.drop_column("statistics", "local_date")
+
+    op.drop_table("chat_settings")
@@ -0,0 +1,55 @@
+"""weekly group leaderboard
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 17:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "group_leaderboard",
+        sa.Column("group_id", sa.BigInteger(), primary_key=True),
+        sa.Column("week_start", sa.Date(), primary_key=True),
+        sa.Column("telegram_id", sa.BigInteger(), primary_key=True),
+        sa.Column("total_tasks", sa.Integer(), nullable=False),
+        sa.Column("completed_tasks", sa.Integer(), nullable=False),
+        sa.Column("study_hours", sa.Float(), nullable=False),
+    )
+    op.create_index(
+        "ix_group_leaderboard_rank",
+        "group_leaderboard",
+        [
+            "group_id",
+            "week_start",
+            sa.text("completed_tasks DESC"),
+            sa.text("study_hours DESC"),
+        ],
+    )
+
+    op.execute(
+        "INSERT INTO group_leaderboard "
+        "(group_id, week_start, telegram_id, total_tasks, completed_tasks, "
+        "study_hours) "
+        "SELECT statistics.group_id, "
+        "date_trunc('week', statistics.local_date)::date, users.telegram_id, "
+        "sum(statistics.total_tasks), sum(statistics.completed_tasks), "
+        "sum(statistics.study_hours) "
+        "FROM statistics JOIN users ON statistics.user_id = users.id "
+        "WHERE statistics.group_id IS NOT NULL "
+        "GROUP BY 1, 2, 3"
+    )
+
+
+def downgrade():
+    op.drop_index("ix_group_leaderboard_rank", table_name="group_leaderboard")
+    op.drop_table("group_leaderboard")
@@ -0,0 +1,28 @@
+"""keyset pagination indexes for plan lists
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 18:00:00
+
+"""
+
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_plans_created_at_id", "plans", ["created_at", "id"])
+    op.create_index(
+        "ix_user_plans_user_created",
+        "user_plans",
+        ["user_id", "created_at", "plan_id"],
+    )
+
+
+def downgrade():
+    op.drop_index("ix_user_plans_user_created", table_name="user_plans")
+    op.drop_index("ix_plans_created_at_id", table_name="plans")
@@ -0,0 +1,37 @@
+"""trigram indexes for plan search
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00
+
+"""
+
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index(
+        "ix_plans_name_trgm",
+        "plans",
+        ["name"],
+        postgresql_using="gin",
+        postgresql_ops={"name": "gin_trgm_ops"},
+    )
+    op.create_index(
+        "ix_tasks_body_trgm",
+        "tasks",
+        ["body"],
+        postgresql_using="gin",
+        postgresql_ops={"body": "gin_trgm_ops"},
+    )
+
+
+def downgrade():
+    op.drop_index("ix_tasks_body_trgm", table_name="tasks")
+    op.drop_index("ix_plans_name_trgm", table_name="plans")
@@ -0,0 +1,26 @@
+"""plan version counter for the render cache
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 20:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "plans",
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade():
+    op.drop_column("plans", "version")
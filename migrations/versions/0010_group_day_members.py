@@ -0,0 +1,42 @@
+"""group members of the current day for the day rollover
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 22:00:00
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "group_day_members",
+        sa.Column("group_id", sa.BigInteger(), primary_key=True),
+        sa.Column(
+            "user_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("users.id"),
+            primary_key=True,
+        ),
+        sa.Column(
+            "plan_id",
+            UUID(as_uuid=True),
+            sa.ForeignKey("plans.id"),
+            nullable=False,
+        ),
+        sa.Column("published_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_group_day_members_plan_id", "group_day_members", ["plan_id"])
+
+
+def downgrade():
+    op.drop_index("ix_group_day_members_plan_id", table_name="group_day_members")
+    op.drop_table("group_day_members")
@@ -0,0 +1,31 @@
+"""drop unused statistics (user_id, local_date) index
+
+Окна /static читают statistics_daily, а по пользователю и дате сырые
+записи больше никто не фильтрует. Индекс (group_id, local_date) остается:
+его используют перенос дня и дневная сводка группы
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 23:00:00
+
+"""
+
+from alembic import op
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_index("ix_statistics_user_local_date", table_name="statistics")
+
+
+def downgrade():
+    op.create_index(
+        "ix_statistics_user_local_date",
+        "statistics",
+        ["user_id", "local_date"],
+        postgresql_include=["completed_tasks", "study_hours"],
+    )
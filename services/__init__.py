@@ -0,0 +1,4 @@
+from .rollover import DayRolloverScheduler
+from .toggles import TaskToggleBuffer
+
+__all__ = ["DayRolloverScheduler", "TaskToggleBuffer"]
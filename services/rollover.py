@@ -0,0 +1,155 @@
+import asyncio
+import random
+from contextlib import suppress
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from zoneinfo import ZoneInfo
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from prometheus_client import Counter
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from database.chats import get_chat_timezone
+from database.rollover import (
+    as_utc,
+    get_day_digest,
+    get_group_day_plans,
+    get_group_days,
+    roll_over_group,
+)
+from services.toggles import TaskToggleBuffer
+from utils import get_day_digest_message
+import logging
+
+logger = logging.getLogger(__name__)
+
+DAY_ROLLOVERS = Counter(
+    "bot_day_rollovers_total", "Группы, день которых завершен по расписанию"
+)
+DAY_ROLLOVER_MEMBERS = Counter(
+    "bot_day_rollover_members_total", "Участники, день которых завершен по расписанию"
+)
+
+
+def day_start(now: datetime, zone: ZoneInfo) -> datetime:
+    return now.astimezone(zone).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class DayRolloverScheduler:
+    """
+    Завершает день в группах в полночь по часовому поясу группы: пишет
+    статистику участников, которые не завершили день сами, сбрасывает
+    их планы и присылает в группу одно сообщение с итогами. Каждая группа
+    получает постоянную случайную задержку в пределах window секунд
+    после полуночи, поэтому группы одного часового пояса обрабатываются
+    не одновременно. Состояние хранится в таблице group_day_members,
+    так что после перезапуска пропущенные дни завершаются на первом шаге
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        session_pool: async_sessionmaker,
+        toggle_buffer: TaskToggleBuffer | None = None,
+        interval: float = 60,
+        window: float = 900,
+    ):
+        self.bot = bot
+        self.session_pool = session_pool
+        self.toggle_buffer = toggle_buffer
+        self.interval = interval
+        self.window = window
+        self.task: asyncio.Task | None = None
+
+    def jitter(self, group_id: int) -> timedelta:
+        return timedelta(seconds=random.Random(group_id).uniform(0, self.window))
+
+    async def start(self) -> None:
+        if self.interval > 0 and self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Error in day rollover: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def due_groups(self, now: datetime) -> List[Tuple[int, datetime]]:
+        """
+        Находит группы, в которых наступил новый день
+        :param now: Текущее время с часовым поясом
+        :return: ID группы и начало нового дня в ее часовом поясе
+        """
+        due = []
+        async with self.session_pool() as session:
+            for group_id, published_at in await get_group_days(session):
+                boundary = day_start(now, await get_chat_timezone(session, group_id))
+                if as_utc(published_at) < boundary <= now - self.jitter(group_id):
+                    due.append((group_id, boundary))
+        return due
+
+    async def tick(self, now: datetime | None = None) -> int:
+        """
+        Завершает день во всех группах, где он уже закончился
+        :param now: Текущее время, по умолчанию сейчас
+        :return: Количество обработанных групп
+        """
+        due = await self.due_groups(now or datetime.now(timezone.utc))
+        for group_id, boundary in due:
+            try:
+                await self.roll_over(group_id, boundary)
+            except Exception as e:
+                logger.error(f"Error rolling over day in group {group_id}: {e}")
+        return len(due)
+
+    async def roll_over(self, group_id: int, boundary: datetime) -> int:
+        """
+        Завершает день группы и присылает итоги. Если бот не работал
+        несколько дней, итоги приходят отдельно за каждую дату публикации
+        :param group_id: ID группы
+        :param boundary: Начало нового дня с часовым поясом группы
+        :return: Количество участников завершенных дней
+        """
+        async with self.session_pool() as session:
+            if self.toggle_buffer is not None:
+                for plan_id in await get_group_day_plans(session, group_id, boundary):
+                    if str(plan_id) in self.toggle_buffer.pending:
+                        await self.toggle_buffer.flush(
+                            str(plan_id), render=False, session=session
+                        )
+
+            days = await roll_over_group(session, group_id, boundary)
+            if not days:
+                return 0
+            digests: Dict[date, list] = {
+                day: await get_day_digest(session, group_id, day) for day in days
+            }
+            await session.commit()
+
+        members = sum(days.values())
+        DAY_ROLLOVERS.inc()
+        DAY_ROLLOVER_MEMBERS.inc(members)
+        for day, entries in digests.items():
+            logger.info(
+                f"Day {day} finished in group {group_id} for {days[day]} members"
+            )
+            try:
+                await self.bot.send_message(
+                    chat_id=group_id,
+                    text=get_day_digest_message(day, entries),
+                    parse_mode="HTML",
+                )
+            except TelegramAPIError as e:
+                logger.warning(f"Error sending day digest to group {group_id}: {e}")
+        return members
+
+    async def close(self) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
@@ -0,0 +1,166 @@
+import asyncio
+from typing import Dict
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.models import Task
+from database.plan import get_plan_tasks, set_tasks_checked
+from keyboards.inline import task_marking_keyboard
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class TaskToggleBuffer:
+    """
+    Отложенная запись отметок задач. Нажатия копятся по плану в течение
+    окна delay, затем сохраняются одним UPDATE, а клавиатура
+    перерисовывается один раз по итоговому состоянию. Если запись
+    не удалась, она повторяется с удвоением задержки до max_delay
+    """
+
+    def __init__(
+        self,
+        session_pool: async_sessionmaker,
+        delay: float = 0.5,
+        max_delay: float = 30,
+    ):
+        self.session_pool = session_pool
+        self.delay = delay
+        self.max_delay = max_delay
+        self.pending: Dict[str, Dict[str, bool]] = {}
+        self.messages: Dict[str, Message] = {}
+        self.timers: Dict[str, asyncio.Task] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.waiting: Dict[str, int] = {}
+
+    def is_checked(self, plan_id: str, task: Task) -> bool:
+        return self.pending.get(plan_id, {}).get(str(task.id), task.checked)
+
+    def toggle(self, plan_id: str, task: Task, message: Message) -> None:
+        """
+        Переключает отметку задачи и откладывает запись до конца окна
+        :param plan_id: ID плана
+        :param task: Задача в состоянии из базы данных
+        :param message: Сообщение с клавиатурой отметки
+        """
+        changes = self.pending.setdefault(plan_id, {})
+        changes[str(task.id)] = not self.is_checked(plan_id, task)
+        self.messages[plan_id] = message
+        self.schedule(plan_id, self.delay)
+
+    def schedule(self, plan_id: str, delay: float) -> None:
+        if plan_id in self.pending and plan_id not in self.timers:
+            self.timers[plan_id] = asyncio.create_task(self.flush_later(plan_id, delay))
+
+    async def flush_later(self, plan_id: str, delay: float) -> None:
+        await asyncio.sleep(delay)
+        try:
+            await self.flush(plan_id)
+        except Exception as e:
+            logger.error(f"Error flushing task toggles: {e}")
+            self.schedule(plan_id, min(delay * 2, self.max_delay))
+
+    async def flush(
+        self,
+        plan_id: str,
+        render: bool = True,
+        session: AsyncSession | None = None,
+    ) -> None:
+        """
+        Сохраняет накопленные отметки плана и перерисовывает клавиатуру.
+        Отметки остаются в pending, пока запись не зафиксирована: нажатие
+        во время записи видит записываемое значение, а не старое из базы,
+        и при ошибке записи отметки не теряются
+        :param plan_id: ID плана
+        :param render: Перерисовать клавиатуру отметки после записи
+        :param session: Сессия вызывающего, например обновления. Отметки
+            пишутся в ее транзакцию, а фиксирует ее вызывающий. Без нее
+            открывается отдельная сессия из пула
+        """
+        timer = self.timers.pop(plan_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+        if plan_id not in self.pending:
+            return
+
+        lock = self.locks.setdefault(plan_id, asyncio.Lock())
+        self.waiting[plan_id] = self.waiting.get(plan_id, 0) + 1
+        try:
+            async with lock:
+                changes = dict(self.pending.get(plan_id, {}))
+                message = self.messages.get(plan_id)
+                if not changes:
+                    return
+                render = render and message is not None
+                if session is not None:
+                    await set_tasks_checked(session, changes)
+                    self.forget_after_commit(session, plan_id, changes)
+                    if not render:
+                        return
+                    tasks = await get_plan_tasks(session, plan_id)
+                else:
+                    async with self.session_pool() as session:
+                        await set_tasks_checked(session, changes)
+                        await session.commit()
+                        self.forget(plan_id, changes)
+                        if not render:
+                            return
+                        tasks = await get_plan_tasks(session, plan_id)
+        finally:
+            self.waiting[plan_id] -= 1
+            if not self.waiting[plan_id]:
+                del self.waiting[plan_id]
+                del self.locks[plan_id]
+
+        try:
+            await message.edit_reply_markup(reply_markup=task_marking_keyboard(tasks))
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.error(f"Error rendering toggled tasks: {e}")
+
+    def forget(self, plan_id: str, written: Dict[str, bool]) -> None:
+        # Нажатия, пришедшие во время записи, остаются до следующей записи
+        changes = self.pending.get(plan_id, {})
+        for task_id, value in written.items():
+            if changes.get(task_id) == value:
+                del changes[task_id]
+        if not changes:
+            self.pending.pop(plan_id, None)
+            self.messages.pop(plan_id, None)
+
+    def forget_after_commit(
+        self, session: AsyncSession, plan_id: str, written: Dict[str, bool]
+    ) -> None:
+        """
+        Забывает отметки, записанные в транзакцию вызывающего, когда она
+        зафиксирована. Если транзакция откатилась, запись повторяется
+        по таймеру
+        """
+        committed = finished = False
+
+        def after_commit(_) -> None:
+            nonlocal committed
+            committed = not finished
+
+        def after_transaction_end(_, transaction) -> None:
+            nonlocal finished
+            if finished or transaction.parent is not None:
+                return
+            finished = True
+            if committed:
+                self.forget(plan_id, written)
+            else:
+                self.schedule(plan_id, self.delay)
+
+        event.listen(session.sync_session, "after_commit", after_commit)
+        event.listen(
+            session.sync_session, "after_transaction_end", after_transaction_end
+        )
+
+    async def close(self) -> None:
+        for plan_id in list(self.pending):
+            await self.flush(plan_id, render=False)
@@ -0,0 +1,164 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Mapping
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseEventIsolation,
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+from aiogram.fsm.storage.memory import MemoryStorage
+from prometheus_client import Gauge
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from config import Config
+from database.database import update_session
+from database.models import FsmRecord
+
+UPDATES_ACTIVE = Gauge("bot_updates_active", "Обновления в обработке")
+UPDATES_QUEUED = Gauge(
+    "bot_updates_queued", "Обновления, ждущие предыдущих обновлений своего чата"
+)
+
+
+class SqlStorage(BaseStorage):
+    """
+    Хранилище FSM в таблице fsm_storage. Данные сохраняются в JSON,
+    поэтому в состоянии допустимы только ID и небольшие словари.
+    Внутри обновления запросы идут через его сессию: запись состояния
+    фиксируется или откатывается вместе с изменениями обработчика и не
+    занимает отдельное соединение. Начальное состояние aiogram читает
+    до DbSessionMiddleware, такие запросы открывают свою сессию
+    """
+
+    def __init__(
+        self, session_pool: async_sessionmaker, key_builder: KeyBuilder | None = None
+    ):
+        self.session_pool = session_pool
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+        session = update_session.get()
+        if session is not None:
+            yield session
+            return
+        async with self.session_pool.begin() as session:
+            yield session
+
+    def upsert(self, dialect_name: str, key: StorageKey, **values: Any):
+        insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+        row = {"key": self.key_builder.build(key), "state": None, "data": {}, **values}
+        return (
+            insert(FsmRecord)
+            .values(**row)
+            .on_conflict_do_update(index_elements=[FsmRecord.key], set_=values)
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        async with self.session() as session:
+            await session.execute(
+                self.upsert(session.bind.dialect.name, key, state=state)
+            )
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        async with self.session() as session:
+            return await session.scalar(
+                select(FsmRecord.state).filter(
+                    FsmRecord.key == self.key_builder.build(key)
+                )
+            )
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        async with self.session() as session:
+            await session.execute(
+                self.upsert(session.bind.dialect.name, key, data=dict(data))
+            )
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        async with self.session() as session:
+            data = await session.scalar(
+                select(FsmRecord.data).filter(
+                    FsmRecord.key == self.key_builder.build(key)
+                )
+            )
+        return dict(data or {})
+
+    async def close(self) -> None:
+        pass
+
+
+class OrderedEventIsolation(BaseEventIsolation):
+    """
+    Обрабатывает обновления одного пользователя в одном чате строго по
+    очереди, а обновления разных пар (чат, пользователь) — параллельно,
+    не больше max_concurrency одновременно. FSMContextMiddleware берет
+    блокировку до чтения состояния, поэтому следующее обновление видит
+    состояние, записанное предыдущим. Очередь хранится в памяти процесса
+    """
+
+    def __init__(self, max_concurrency: int = 100):
+        self.max_concurrency = max_concurrency
+        self.slots = asyncio.Semaphore(max_concurrency)
+        self.locks: Dict[StorageKey, asyncio.Lock] = {}
+        self.pending: Dict[StorageKey, int] = {}
+        self.active = 0
+        self.queued = 0
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queued": self.queued,
+            "keys": len(self.locks),
+        }
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        lock = self.locks.setdefault(key, asyncio.Lock())
+        self.pending[key] = self.pending.get(key, 0) + 1
+        self.queued += 1
+        UPDATES_QUEUED.inc()
+        queued = True
+        try:
+            # Сначала очередь своего ключа, потом общий слот: обновление,
+            # которое ждет предыдущее в том же чате, не занимает слот
+            async with lock, self.slots:
+                queued = False
+                self.queued -= 1
+                UPDATES_QUEUED.dec()
+                self.active += 1
+                UPDATES_ACTIVE.inc()
+                try:
+                    yield
+                finally:
+                    self.active -= 1
+                    UPDATES_ACTIVE.dec()
+        finally:
+            if queued:
+                self.queued -= 1
+                UPDATES_QUEUED.dec()
+            self.pending[key] -= 1
+            if not self.pending[key]:
+                del self.pending[key]
+                del self.locks[key]
+
+    async def close(self) -> None:
+        pass
+
+
+def create_storage(config: Config, session_pool: async_sessionmaker) -> BaseStorage:
+    if config.fsm_storage == "redis":
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        return RedisStorage.from_url(
+            config.redis_url, key_builder=DefaultKeyBuilder(with_bot_id=True)
+        )
+    if config.fsm_storage == "sql":
+        return SqlStorage(session_pool)
+    return MemoryStorage()
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Iterator, List, TypeVar
+
+# Движок в database.models создается при импорте по настройкам окружения
+os.environ.setdefault("BOT_TOKEN", "123456:test")
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{os.path.join(tempfile.gettempdir(), 'plans_bot_test.db')}",
+)
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from database.chats import timezone_cache
+from database.models import Base
+from database.user import identity_cache
+from utils import plan_body_cache
+
+T = TypeVar("T")
+
+
+@contextmanager
+def collect_statements(engine: AsyncEngine) -> Iterator[List[str]]:
+    statements: List[str] = []
+
+    def collect(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, "after_cursor_execute", collect)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "after_cursor_execute", collect)
+
+
+@pytest.fixture
+def count_statements():
+    """
+    Контекстный менеджер, который собирает SQL-запросы, выполненные
+    движком внутри блока
+    """
+    return collect_statements
+
+
+@pytest.fixture
+def database(tmp_path) -> Callable[[Callable[..., Awaitable[T]]], T]:
+    """
+    Запускает асинхронный тест на чистой базе SQLite. Тест получает
+    движок и фабрику сессий. База пересоздается при каждом запуске
+    """
+    url = f"sqlite+aiosqlite:///{tmp_path / 'test.db'}"
+
+    def run(test: Callable[..., Awaitable[T]]) -> T:
+        async def main() -> T:
+            # Кэши живут в памяти процесса, а база каждый раз новая
+            for cache in (identity_cache, timezone_cache, plan_body_cache):
+                cache.clear()
+            engine = create_async_engine(url)
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.drop_all)
+                await conn.run_sync(Base.metadata.create_all)
+            try:
+                return await test(
+                    engine,
+                    async_sessionmaker(
+                        bind=engine, autoflush=False, expire_on_commit=False
+                    ),
+                )
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
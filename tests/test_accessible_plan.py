@@ -0,0 +1,81 @@
+import uuid
+
+from sqlalchemy import event, insert
+
+from database.models import Plan, Task, User, user_plans
+from database.plan import get_accessible_plan
+
+TELEGRAM_ID = 1
+
+
+async def create_user_plans(session_pool, plans: int) -> str:
+    """
+    Создает пользователя с plans планами по 3 задачи
+    :return: ID последнего плана
+    """
+    async with session_pool() as session:
+        user = User(telegram_id=TELEGRAM_ID, name="Пользователь")
+        session.add(user)
+        await session.flush()
+        plan_ids = [uuid.uuid4() for _ in range(plans)]
+        await session.execute(
+            insert(Plan), [{"id": plan_id, "name": "План"} for plan_id in plan_ids]
+        )
+        await session.execute(
+            insert(user_plans),
+            [{"user_id": user.id, "plan_id": plan_id} for plan_id in plan_ids],
+        )
+        await session.execute(
+            insert(Task),
+            [
+                {"plan_id": plan_id, "body": f"Задача {position}", "position": position}
+                for plan_id in plan_ids
+                for position in range(3)
+            ],
+        )
+        await session.commit()
+        return str(plan_ids[-1])
+
+
+async def lookup_cost(engine, session_pool, count_statements, plans: int):
+    plan_id = await create_user_plans(session_pool, plans)
+    async with session_pool() as session:
+        loaded = []
+        event.listen(
+            session.sync_session,
+            "loaded_as_persistent",
+            lambda _, instance: loaded.append(type(instance).__name__),
+        )
+        with count_statements(engine) as statements:
+            plan = await get_accessible_plan(session, "user", TELEGRAM_ID, plan_id)
+    assert plan is not None and str(plan.id) == plan_id
+    return len(statements), sorted(loaded)
+
+
+def test_accessible_plan_cost_does_not_depend_on_plan_count(database, count_statements):
+    def cost(plans: int):
+        async def test(engine, session_pool):
+            return await lookup_cost(engine, session_pool, count_statements, plans)
+
+        return database(test)
+
+    one = cost(1)
+    assert cost(500) == one
+    # ID пользователя, план, задачи и комментарии задач; пользователь
+    # читается без загрузки объекта, а комментариев у задач нет
+    assert one[0] == 4
+    assert one[1] == ["Plan", "Task", "Task", "Task"]
+
+
+def test_foreign_plan_is_not_accessible(database):
+    async def test(engine, session_pool):
+        plan_id = await create_user_plans(session_pool, 1)
+        async with session_pool() as session:
+            session.add(User(telegram_id=2, name="Другой"))
+            await session.commit()
+            return (
+                await get_accessible_plan(session, "user", 2, plan_id),
+                await get_accessible_plan(session, "base", 2, plan_id),
+            )
+
+    assert database(test) == (None, None)
@@ -0,0 +1,91 @@
+from sqlalchemy import select
+
+from database.models import Plan, Task, User, user_plans
+from database.plan import create_plans_bulk, create_user_plan, split_tasks
+
+TELEGRAM_ID = 1
+
+
+async def create_owner(session_pool) -> User:
+    async with session_pool() as session:
+        owner = User(telegram_id=TELEGRAM_ID, name="Владелец")
+        session.add(owner)
+        await session.commit()
+        return owner
+
+
+async def plan_rows(session, plan_ids) -> dict:
+    """
+    :return: ID плана -> название, владельцы и тексты задач по позициям
+    """
+    rows = {}
+    for plan_id in plan_ids:
+        rows[plan_id] = (
+            await session.scalar(select(Plan.name).filter(Plan.id == plan_id)),
+            list(
+                await session.scalars(
+                    select(user_plans.c.user_id).filter(user_plans.c.plan_id == plan_id)
+                )
+            ),
+            [
+                tuple(row)
+                for row in await session.execute(
+                    select(Task.position, Task.body, Task.checked)
+                    .filter(Task.plan_id == plan_id)
+                    .order_by(Task.position)
+                )
+            ],
+        )
+    return rows
+
+
+def test_bulk_insert_one_statement_per_table(database, count_statements):
+    plans = [("Утро", ["Зарядка", "Завтрак", "Душ"]), ("Вечер", ["Чтение"])]
+
+    async def test(engine, session_pool):
+        owner = await create_owner(session_pool)
+        async with session_pool() as session:
+            with count_statements(engine) as statements:
+                user_plan_ids = await create_plans_bulk(
+                    session, plans, owner_id=owner.id
+                )
+                user_inserts = [s for s in statements if s.startswith("INSERT")]
+                base_plan_ids = await create_plans_bulk(session, plans)
+            base_inserts = [s for s in statements if s.startswith("INSERT")]
+            await session.commit()
+            return (
+                owner.id,
+                user_inserts,
+                base_inserts[len(user_inserts) :],
+                await plan_rows(session, user_plan_ids),
+                await plan_rows(session, base_plan_ids),
+            )
+
+    owner_id, user_inserts, base_inserts, user_rows, base_rows = database(test)
+    # Планы, связи с владельцем и задачи; у базовых планов связей нет
+    assert [s.split()[2] for s in user_inserts] == ["plans", "user_plans", "tasks"]
+    assert [s.split()[2] for s in base_inserts] == ["plans", "tasks"]
+    expected = [
+        (name, [(position, body, False) for position, body in enumerate(bodies)])
+        for name, bodies in plans
+    ]
+    assert [(name, tasks) for name, _, tasks in user_rows.values()] == expected
+    assert [(name, tasks) for name, _, tasks in base_rows.values()] == expected
+    assert all(owners == [owner_id] for _, owners, _ in user_rows.values())
+    assert all(owners == [] for _, owners, _ in base_rows.values())
+
+
+def test_create_user_plan_splits_tasks(database):
+    tasks_text = "Зарядка\n\n  Завтрак  \nДуш"
+
+    async def test(engine, session_pool):
+        owner = await create_owner(session_pool)
+        async with session_pool() as session:
+            plan_id = await create_user_plan(session, "Утро", TELEGRAM_ID, tasks_text)
+            await session.commit()
+            return owner.id, (await plan_rows(session, [plan_id]))[plan_id]
+
+    owner_id, (name, owners, tasks) = database(test)
+    assert name == "Утро" and owners == [owner_id]
+    assert [body for _, body, _ in tasks] == split_tasks(tasks_text)
+    assert [position for position, _, _ in tasks] == [0, 1, 2]
@@ -0,0 +1,57 @@
+import asyncio
+
+from aiogram import Bot
+from aiogram.methods import EditMessageText, SendMessage
+from aiogram.types import Message
+
+from middlewares import EditDedupMiddleware
+
+CHAT_ID = 10
+
+
+def message(message_id: int, text: str) -> Message:
+    return Message.model_validate(
+        {
+            "message_id": message_id,
+            "date": 0,
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "text": text,
+        }
+    )
+
+
+def test_skipped_edit_returns_last_message():
+    calls = []
+
+    async def make_request(bot, method):
+        calls.append(type(method).__name__)
+        if isinstance(method, SendMessage):
+            return message(1, method.text)
+        if method.inline_message_id:
+            return True
+        return message(method.message_id, method.text)
+
+    async def main():
+        middleware = EditDedupMiddleware()
+        bot = Bot("123456:test")
+        sent = await middleware(
+            make_request, bot, SendMessage(chat_id=CHAT_ID, text="a")
+        )
+        edit = EditMessageText(chat_id=CHAT_ID, message_id=sent.message_id, text="a")
+        skipped = await middleware(make_request, bot, edit)
+        changed = await middleware(
+            make_request,
+            bot,
+            EditMessageText(chat_id=CHAT_ID, message_id=sent.message_id, text="b"),
+        )
+        inline = EditMessageText(inline_message_id="inline", text="c")
+        await middleware(make_request, bot, inline)
+        skipped_inline = await middleware(make_request, bot, inline)
+        await bot.session.close()
+        return skipped, changed, skipped_inline
+
+    skipped, changed, skipped_inline = asyncio.run(main())
+    assert isinstance(skipped, Message) and skipped.text == "a"
+    assert isinstance(changed, Message) and changed.text == "b"
+    assert skipped_inline is True
+    assert calls == ["SendMessage", "EditMessageText", "EditMessageText"]
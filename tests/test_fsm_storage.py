@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from dataclasses import replace
+
+import pytest
+from aiogram.fsm.storage.base import StorageKey
+
+from config import load_config
+from database.database import update_session
+from states.storage import (
+    UPDATES_ACTIVE,
+    UPDATES_QUEUED,
+    OrderedEventIsolation,
+    SqlStorage,
+    create_storage,
+)
+from states.user import UserState
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=3)
+
+
+async def round_trip(storage) -> tuple:
+    plan_id = str(uuid.uuid4())
+    await storage.set_state(KEY, UserState.publishing_plan)
+    await storage.set_data(KEY, {"plan_id": plan_id, "group_id": -100})
+    state = await storage.get_state(KEY)
+    data = await storage.get_data(KEY)
+    await storage.set_state(KEY, None)
+    await storage.set_data(KEY, {})
+    return (state, data == {"plan_id": plan_id, "group_id": -100}), (
+        await storage.get_state(KEY),
+        await storage.get_data(KEY),
+    )
+
+
+def test_sql_storage_round_trip(database):
+    async def test(engine, session_pool):
+        return await round_trip(SqlStorage(session_pool))
+
+    saved, cleared = database(test)
+    assert saved == (UserState.publishing_plan.state, True)
+    assert cleared == (None, {})
+
+
+def test_sql_storage_writes_follow_update_transaction(database):
+    async def test(engine, session_pool):
+        storage = SqlStorage(session_pool)
+        await storage.set_state(KEY, UserState.editing_plan)
+
+        async with session_pool() as session:
+            token = update_session.set(session)
+            try:
+                await storage.set_state(KEY, UserState.publishing_plan)
+                # Внутри обновления видна его собственная запись
+                inside = await storage.get_state(KEY)
+                await session.rollback()
+            finally:
+                update_session.reset(token)
+        return inside, await storage.get_state(KEY)
+
+    inside, after_rollback = database(test)
+    assert inside == UserState.publishing_plan.state
+    assert after_rollback == UserState.editing_plan.state
+
+
+def test_redis_storage_round_trip():
+    fakeredis = pytest.importorskip("fakeredis")
+    config = replace(
+        load_config(), fsm_storage="redis", redis_url="redis://localhost:6379/0"
+    )
+    storage = create_storage(config, session_pool=None)
+    storage.redis = fakeredis.FakeAsyncRedis()
+
+    saved, cleared = asyncio.run(round_trip(storage))
+    assert saved == (UserState.publishing_plan.state, True)
+    assert cleared == (None, {})
+    # Ключи разных ботов в одном Redis не пересекаются
+    assert storage.key_builder.build(KEY).startswith("fsm:1:")
+
+
+def test_ordered_event_isolation_orders_keys_and_caps_concurrency():
+    other_keys = [StorageKey(bot_id=1, chat_id=2, user_id=10 + i) for i in range(5)]
+
+    async def main():
+        isolation = OrderedEventIsolation(max_concurrency=3)
+        order = []
+        active = peak = 0
+        gauges = []
+
+        async def update(key: StorageKey, name: str) -> None:
+            nonlocal active, peak
+            async with isolation.lock(key):
+                active += 1
+                peak = max(peak, active)
+                order.append(f"{name} start")
+                await asyncio.sleep(0.01)
+                gauges.append((UPDATES_ACTIVE._value.get(), isolation.stats()))
+                order.append(f"{name} end")
+                active -= 1
+
+        # Два обновления одного ключа и пять обновлений разных ключей
+        await asyncio.gather(
+            update(KEY, "first"),
+            update(KEY, "second"),
+            *(update(key, f"other {i}") for i, key in enumerate(other_keys)),
+        )
+        return order, peak, gauges, isolation.stats()
+
+    active_before = UPDATES_ACTIVE._value.get()
+    queued_before = UPDATES_QUEUED._value.get()
+    order, peak, gauges, stats = asyncio.run(main())
+
+    first, second = order.index("first end"), order.index("second start")
+    assert first < second
+    # Разные ключи идут параллельно, но не больше лимита
+    assert peak == 3
+    assert order[:3] == ["first start", "other 0 start", "other 1 start"]
+    assert all(value - active_before <= 3 for value, _ in gauges)
+    assert all(item["active"] <= 3 for _, item in gauges)
+    # Когда первое обновление заканчивается, три выполняются, четыре ждут
+    assert gauges[0][0] - active_before == 3
+    assert gauges[0][1] == {
+        "max_concurrency": 3,
+        "active": 3,
+        "queued": 4,
+        "keys": 6,
+    }
+    assert stats == {"max_concurrency": 3, "active": 0, "queued": 0, "keys": 0}
+    assert UPDATES_ACTIVE._value.get() == active_before
+    assert UPDATES_QUEUED._value.get() == queued_before
@@ -0,0 +1,188 @@
+import io
+import re
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, select, text
+
+from database.models import Base, Comment, Plan, Statistic, Task, User, user_plans
+
+USERS = 50
+PLANS_PER_USER = 4
+TASKS_PER_PLAN = 10
+GROUPS = 10
+DAYS = 30
+
+# Запросы горячих путей и индекс, которым каждый из них должен пользоваться
+HOT_QUERIES = [
+    (
+        select(Task).filter(Task.plan_id == uuid.uuid4()).order_by(Task.position),
+        "ix_tasks_plan_id_position",
+    ),
+    (
+        select(Comment).filter(Comment.task_id.in_([uuid.uuid4(), uuid.uuid4()])),
+        "ix_comments_task_id",
+    ),
+    (
+        select(user_plans.c.user_id).filter(user_plans.c.plan_id == uuid.uuid4()),
+        "ix_user_plans_plan_id",
+    ),
+    (
+        select(Statistic)
+        .filter(Statistic.user_id == uuid.uuid4(), Statistic.plan_id == uuid.uuid4())
+        .order_by(Statistic.created_at.desc())
+        .limit(1),
+        "ix_statistics_user_plan_created",
+    ),
+    (
+        select(Statistic.id).filter(Statistic.plan_id == uuid.uuid4()),
+        "ix_statistics_plan_id",
+    ),
+    (
+        select(Statistic.user_id).filter(
+            Statistic.group_id == -100, Statistic.local_date == date(2026, 1, 1)
+        ),
+        "ix_statistics_group_local_date",
+    ),
+]
+
+
+async def seed(session_pool) -> None:
+    """
+    Заполняет базу данными, похожими на рабочие, и собирает статистику
+    для планировщика: на пустых таблицах SQLite выбирает индекс по
+    эвристикам, а не по распределению данных
+    """
+    async with session_pool() as session:
+        users = [
+            {"id": uuid.uuid4(), "telegram_id": i, "name": f"Участник {i}"}
+            for i in range(USERS)
+        ]
+        plans = [
+            {"id": uuid.uuid4(), "name": f"План {i}"}
+            for i in range(USERS * PLANS_PER_USER)
+        ]
+        tasks = [
+            {
+                "id": uuid.uuid4(),
+                "plan_id": plan["id"],
+                "body": f"Задача {position}",
+                "position": position,
+            }
+            for plan in plans
+            for position in range(TASKS_PER_PLAN)
+        ]
+        await session.execute(insert(User), users)
+        await session.execute(insert(Plan), plans)
+        await session.execute(
+            insert(user_plans),
+            [
+                {"user_id": users[i // PLANS_PER_USER]["id"], "plan_id": plan["id"]}
+                for i, plan in enumerate(plans)
+            ],
+        )
+        await session.execute(insert(Task), tasks)
+        await session.execute(
+            insert(Comment),
+            [
+                {
+                    "task_id": task["id"],
+                    "author_id": users[i % USERS]["id"],
+                    "body": "Комментарий",
+                }
+                for i, task in enumerate(tasks[::4])
+            ],
+        )
+        await session.execute(
+            insert(Statistic),
+            [
+                {
+                    "plan_id": plans[i * PLANS_PER_USER]["id"],
+                    "user_id": user["id"],
+                    "group_id": -100 - i % GROUPS,
+                    "total_tasks": TASKS_PER_PLAN,
+                    "completed_tasks": day % TASKS_PER_PLAN,
+                    "study_hours": 1,
+                    "local_date": date(2026, 1, 1) + timedelta(days=day),
+                }
+                for i, user in enumerate(users)
+                for day in range(DAYS)
+            ],
+        )
+        await session.commit()
+        await session.execute(text("ANALYZE"))
+
+
+def explain(connection, query) -> str:
+    compiled = query.compile(
+        dialect=connection.dialect, compile_kwargs={"render_postcompile": True}
+    )
+    rows = connection.exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", tuple(None for _ in compiled.positiontup)
+    )
+    return "\n".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize("query, index", HOT_QUERIES, ids=[i for _, i in HOT_QUERIES])
+def test_hot_query_uses_index(database, query, index):
+    async def test(engine, session_pool):
+        await seed(session_pool)
+        async with engine.connect() as connection:
+            return await connection.run_sync(explain, query)
+
+    plan = database(test)
+    assert index in plan, plan
+
+
+def migration_indexes(monkeypatch) -> dict:
+    """
+    Индексы, которые оставляют миграции после upgrade head. Миграции
+    рассчитаны на PostgreSQL, поэтому SQL собирается без подключения
+    :return: Имя индекса -> таблица и колонки
+    """
+    monkeypatch.setenv("DATABASE_URL", "postgresql+asyncpg://bot@localhost/bot")
+    output = io.StringIO()
+    config = Config("alembic.ini", output_buffer=output)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, "head", sql=True)
+
+    indexes = {}
+    for statement in output.getvalue().split(";"):
+        # Перед каждой миграцией идет комментарий "-- Running upgrade ..."
+        lines = [line for line in statement.splitlines() if not line.startswith("--")]
+        statement = " ".join(" ".join(lines).split())
+        created = re.match(
+            r"CREATE (?:UNIQUE )?INDEX (\w+) ON (\w+) (?:USING \w+ )?\((.*?)\)",
+            statement,
+        )
+        dropped = re.match(r"DROP INDEX (\w+)", statement)
+        if created:
+            name, table, columns = created.groups()
+            indexes[name] = (
+                table,
+                tuple(
+                    column.replace(" gin_trgm_ops", "").strip()
+                    for column in columns.split(",")
+                ),
+            )
+        elif dropped:
+            indexes.pop(dropped.group(1))
+    return indexes
+
+
+def test_migrations_match_models(monkeypatch):
+    models = {
+        index.name: (
+            table.name,
+            tuple(
+                str(expression).removeprefix(f"{table.name}.")
+                for expression in index.expressions
+            ),
+        )
+        for table in Base.metadata.sorted_tables
+        for index in table.indexes
+    }
+    assert migration_indexes(monkeypatch) == models
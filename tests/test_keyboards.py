@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from keyboards.inline import (
+    plan_tasks_edit_keyboard,
+    task_comments_keyboard,
+    task_edit_keyboard,
+    task_marking_keyboard,
+    task_position_keyboard,
+)
+
+
+def task(body: str, checked: bool = False) -> SimpleNamespace:
+    return SimpleNamespace(body=body, checked=checked)
+
+
+def texts(keyboard) -> list:
+    return [button.text for row in keyboard.inline_keyboard for button in row]
+
+
+def test_cached_marking_keyboard_follows_text_and_checked_state():
+    tasks = [task("Зарядка"), task("Чтение")]
+    first = task_marking_keyboard(tasks)
+    # Новый список с тем же содержимым получает ту же клавиатуру из кэша
+    assert task_marking_keyboard([task("Зарядка"), task("Чтение")]) is first
+
+    tasks[0].checked = True
+    checked = task_marking_keyboard(tasks)
+    tasks[1].body = "Прогулка"
+    renamed = task_marking_keyboard(tasks)
+    tasks[0].checked = False
+    unchecked = task_marking_keyboard(tasks)
+
+    assert texts(first)[:2] == ["🟩 Зарядка", "🟩 Чтение"]
+    assert texts(checked)[:2] == ["✅ Зарядка", "🟩 Чтение"]
+    assert texts(renamed)[:2] == ["✅ Зарядка", "🟩 Прогулка"]
+    assert texts(unchecked)[:2] == ["🟩 Зарядка", "🟩 Прогулка"]
+    # Изменение состояния не портит ранее выданные клавиатуры
+    assert texts(first)[:2] == ["🟩 Зарядка", "🟩 Чтение"]
+
+
+def test_cached_task_keyboards_follow_task_text_and_count():
+    tasks = [task("Зарядка"), task("Чтение")]
+    comments = task_comments_keyboard(tasks)
+    editing = plan_tasks_edit_keyboard(tasks)
+    edit, position = task_edit_keyboard(tasks), task_position_keyboard(tasks)
+
+    tasks[1].body = "Прогулка"
+    tasks.append(task("Сон"))
+
+    assert texts(task_comments_keyboard(tasks))[:3] == [
+        "1. Зарядка...",
+        "2. Прогулка...",
+        "3. Сон...",
+    ]
+    assert texts(plan_tasks_edit_keyboard(tasks))[:3] == [
+        "1. Зарядка",
+        "2. Прогулка",
+        "3. Сон",
+    ]
+    assert len(texts(task_edit_keyboard(tasks))) == len(texts(edit)) + 1
+    assert len(texts(task_position_keyboard(tasks))) == len(texts(position)) + 1
+    assert texts(comments)[:2] == ["1. Зарядка...", "2. Чтение..."]
+    assert texts(editing)[:2] == ["1. Зарядка", "2. Чтение"]
@@ -0,0 +1,98 @@
+from database.models import Comment, Plan, Task, User
+from database.plan import add_task_to_plan, load_plan_for_render
+from middlewares.metrics import CacheStatsCollector
+from utils import get_plan_body, plan_body_cache, plan_render_stats
+
+# План, задачи, комментарии и авторы комментариев
+MAX_RENDER_STATEMENTS = 4
+
+
+async def create_plan(session_pool, telegram_id: int, tasks: int) -> str:
+    async with session_pool() as session:
+        author = User(telegram_id=telegram_id, name=f"Автор {telegram_id}")
+        plan = Plan(name="План")
+        session.add_all([author, plan])
+        await session.flush()
+        for position in range(tasks):
+            task = Task(plan_id=plan.id, body=f"Задача {position}", position=position)
+            session.add(task)
+            await session.flush()
+            session.add_all(
+                Comment(task_id=task.id, author_id=author.id, body=f"Комментарий {i}")
+                for i in range(2)
+            )
+        await session.commit()
+        return str(plan.id)
+
+
+async def render(engine, session_pool, count_statements, plan_id: str) -> int:
+    async with session_pool() as session:
+        with count_statements(engine) as statements:
+            plan = await load_plan_for_render(session, plan_id)
+            body = get_plan_body(plan)
+    assert body.count("Комментарий") == len(plan.tasks) * 2
+    return len(statements)
+
+
+def test_render_statements_are_bounded(database, count_statements):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool, 1, tasks=30)
+        return await render(engine, session_pool, count_statements, plan_id)
+
+    assert database(test) <= MAX_RENDER_STATEMENTS
+
+
+def test_render_statements_do_not_depend_on_task_count(database, count_statements):
+    async def test(engine, session_pool):
+        small = await create_plan(session_pool, 1, tasks=1)
+        large = await create_plan(session_pool, 2, tasks=50)
+        return [
+            await render(engine, session_pool, count_statements, plan_id)
+            for plan_id in (small, large)
+        ]
+
+    small, large = database(test)
+    assert small == large
+
+
+def test_version_bump_invalidates_cached_body(database):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool, 1, tasks=1)
+        start = plan_body_cache.stats()
+        async with session_pool() as session:
+            plan = await load_plan_for_render(session, plan_id)
+            before = get_plan_body(plan)
+            cached = get_plan_body(plan)
+            await add_task_to_plan(session, plan_id, "Новая задача")
+            # Загруженный план мог отстать от базы: он рисуется мимо кэша
+            stale_version = plan.version
+            stats = plan_body_cache.stats()
+            get_plan_body(plan)
+            bypassed = plan_body_cache.stats() == stats
+            await session.commit()
+        async with session_pool() as session:
+            after = get_plan_body(await load_plan_for_render(session, plan_id))
+        end = plan_body_cache.stats()
+        return before, cached, stale_version, bypassed, after, start, end
+
+    before, cached, stale_version, bypassed, after, start, end = database(test)
+    assert cached is before
+    assert stale_version is None and bypassed
+    assert "Новая задача" not in before and "Новая задача" in after
+    # Две версии плана, одно попадание
+    assert end["size"] == 2
+    assert (end["hits"] - start["hits"], end["misses"] - start["misses"]) == (1, 2)
+
+
+def test_render_cache_bytes_are_exported(database):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool, 1, tasks=3)
+        async with session_pool() as session:
+            get_plan_body(await load_plan_for_render(session, plan_id))
+        collector = CacheStatsCollector()
+        collector.caches["plan_render"] = plan_render_stats
+        return {metric.name: metric.samples[0].value for metric in collector.collect()}
+
+    metrics = database(test)
+    assert metrics["bot_cache_size"] == 1
+    assert metrics["bot_cache_bytes"] == plan_render_stats()["bytes"] > 0
@@ -0,0 +1,94 @@
+import uuid
+
+from sqlalchemy import insert
+
+from database.models import Plan, User, user_plans
+from database.plan import get_plans_page
+
+TELEGRAM_ID = 1
+
+
+async def create_plans(session_pool, user_plan_count: int, base_plan_count: int):
+    async with session_pool() as session:
+        user = User(telegram_id=TELEGRAM_ID, name="Пользователь")
+        session.add(user)
+        await session.flush()
+        user_plan_ids = [uuid.uuid4() for _ in range(user_plan_count)]
+        base_plan_ids = [uuid.uuid4() for _ in range(base_plan_count)]
+        await session.execute(
+            insert(Plan),
+            [
+                {"id": plan_id, "name": f"План {i}"}
+                for i, plan_id in enumerate(user_plan_ids + base_plan_ids)
+            ],
+        )
+        await session.execute(
+            insert(user_plans),
+            [{"user_id": user.id, "plan_id": plan_id} for plan_id in user_plan_ids],
+        )
+        await session.commit()
+        return set(user_plan_ids), set(base_plan_ids)
+
+
+async def walk(session_pool, plan_type: str) -> tuple:
+    """
+    Листает страницы вперед до конца, затем назад до первой
+    :return: ID планов страниц вперед и назад
+    """
+    forward, backward = [], []
+    async with session_pool() as session:
+        page = await get_plans_page(session, plan_type, TELEGRAM_ID)
+        forward.append([plan.id for plan in page.plans])
+        while page.next_cursor:
+            page = await get_plans_page(
+                session, plan_type, TELEGRAM_ID, page.next_cursor
+            )
+            forward.append([plan.id for plan in page.plans])
+        backward.append([plan.id for plan in page.plans])
+        while page.prev_cursor:
+            page = await get_plans_page(
+                session, plan_type, TELEGRAM_ID, page.prev_cursor, before=True
+            )
+            backward.append([plan.id for plan in page.plans])
+    return forward, backward
+
+
+def test_pages_forward_and_backward(database):
+    async def test(engine, session_pool):
+        user_ids, _ = await create_plans(session_pool, 25, 0)
+        return user_ids, await walk(session_pool, "user")
+
+    user_ids, (forward, backward) = database(test)
+    assert [len(page) for page in forward] == [10, 10, 5]
+    assert backward == forward[::-1]
+    assert {plan_id for page in forward for plan_id in page} == user_ids
+
+
+def test_stale_cursor_returns_first_page(database):
+    async def test(engine, session_pool):
+        await create_plans(session_pool, 25, 0)
+        async with session_pool() as session:
+            first = await get_plans_page(session, "user", TELEGRAM_ID)
+            stale = await get_plans_page(session, "user", TELEGRAM_ID, uuid.uuid4().hex)
+            broken = await get_plans_page(session, "user", TELEGRAM_ID, "broken")
+        return first, stale, broken
+
+    first, stale, broken = database(test)
+    assert stale == first
+    assert broken == first
+    assert first.prev_cursor is None and first.next_cursor is not None
+
+
+def test_base_and_user_plans_are_separate(database):
+    async def test(engine, session_pool):
+        user_ids, base_ids = await create_plans(session_pool, 12, 3)
+        return (
+            user_ids,
+            base_ids,
+            await walk(session_pool, "user"),
+            await walk(session_pool, "base"),
+        )
+
+    user_ids, base_ids, (user_pages, _), (base_pages, _) = database(test)
+    assert {plan_id for page in user_pages for plan_id in page} == user_ids
+    assert len(base_pages) == 1 and set(base_pages[0]) == base_ids
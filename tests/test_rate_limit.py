@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from middlewares import RateLimitMiddleware
+
+RETRY_AFTER = 1
+
+
+class FakeBotApi:
+    """
+    Bot API на локальном aiohttp-сервере: записывает вызванные методы и
+    отвечает 429 с retry_after на первые flood_limited вызовов sendMessage
+    """
+
+    def __init__(self, flood_limited: int = 0):
+        self.flood_limited = flood_limited
+        self.calls = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls.append((method, time.monotonic()))
+        if method == "sendMessage" and self.flood_limited:
+            self.flood_limited -= 1
+            return web.json_response(
+                {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {RETRY_AFTER}",
+                    "parameters": {"retry_after": RETRY_AFTER},
+                },
+                status=429,
+            )
+        if method == "sendMessage":
+            result = {
+                "message_id": len(self.calls),
+                "date": 0,
+                "chat": {"id": int(data["chat_id"]), "type": "private"},
+                "text": data["text"],
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def methods(self) -> list:
+        return [method for method, _ in self.calls]
+
+
+async def start(api: FakeBotApi, middleware: RateLimitMiddleware):
+    app = web.Application()
+    app.router.add_post("/bot{token}/{method}", api.handle)
+    server = TestServer(app)
+    await server.start_server()
+    session = AiohttpSession(
+        api=TelegramAPIServer.from_base(str(server.make_url("")).rstrip("/"))
+    )
+    session.middleware(middleware)
+    return server, Bot("123456:test", session=session)
+
+
+def test_retry_after_is_respected():
+    async def main():
+        api = FakeBotApi(flood_limited=1)
+        server, bot = await start(api, RateLimitMiddleware())
+        message = await bot.send_message(1, "text")
+        await bot.session.close()
+        await server.close()
+        return message, api.calls
+
+    message, calls = asyncio.run(main())
+    assert message.text == "text"
+    assert [method for method, _ in calls] == ["sendMessage", "sendMessage"]
+    # Повтор ушел не раньше, чем разрешил Telegram
+    assert calls[1][1] - calls[0][1] >= RETRY_AFTER - 0.05
+
+
+def test_callback_answers_go_before_queued_messages():
+    async def main():
+        api = FakeBotApi()
+        server, bot = await start(
+            api, RateLimitMiddleware(global_rate=5, broadcast_reserve=0)
+        )
+        # Пять сообщений уходят сразу, остальные ждут пополнения лимита
+        sends = [
+            asyncio.create_task(bot.send_message(chat_id, "text"))
+            for chat_id in range(1, 9)
+        ]
+        await asyncio.sleep(0.05)
+        await bot.answer_callback_query("1")
+        await asyncio.gather(*sends)
+        await bot.session.close()
+        await server.close()
+        return api.methods()
+
+    methods = asyncio.run(main())
+    assert methods.index("answerCallbackQuery") == 5
+    assert methods.count("sendMessage") == 8
@@ -0,0 +1,164 @@
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, insert, select
+
+from database.chats import set_chat_timezone
+from database.models import Comment, GroupDayMember, Plan, Statistic, Task, User
+from database.rollups import check_rollups
+from services import DayRolloverScheduler
+
+MOSCOW_GROUP_ID = -100
+UTC_GROUP_ID = -200
+MOSCOW = ZoneInfo("Europe/Moscow")
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.messages.append((chat_id, text))
+
+
+async def create_group_day(session_pool, members) -> None:
+    """
+    Публикует в группе с часовым поясом Москвы планы участников
+    :param members: Telegram ID участника и время публикации в UTC
+    """
+    async with session_pool() as session:
+        await set_chat_timezone(session, MOSCOW_GROUP_ID, "Europe/Moscow")
+        await set_chat_timezone(session, UTC_GROUP_ID, "UTC")
+        for telegram_id, published_at in members:
+            user = User(telegram_id=telegram_id, name=f"Участник {telegram_id}")
+            plan = Plan(name="План")
+            session.add_all([user, plan])
+            await session.flush()
+            await session.execute(
+                insert(Task),
+                [
+                    {"plan_id": plan.id, "body": "Зарядка", "position": 0},
+                    {"plan_id": plan.id, "body": "Чтение", "position": 1},
+                ],
+            )
+            task = await session.scalar(select(Task).filter(Task.plan_id == plan.id))
+            task.checked = True
+            session.add(Comment(task_id=task.id, author_id=user.id, body="Готово"))
+            session.add(
+                GroupDayMember(
+                    group_id=MOSCOW_GROUP_ID,
+                    user_id=user.id,
+                    plan_id=plan.id,
+                    published_at=published_at,
+                )
+            )
+        await session.commit()
+
+
+async def group_state(session_pool):
+    async with session_pool() as session:
+        statistics = (
+            await session.execute(
+                select(
+                    Statistic.local_date,
+                    Statistic.completed_tasks,
+                    Statistic.total_tasks,
+                ).order_by(Statistic.local_date)
+            )
+        ).all()
+        return (
+            [tuple(row) for row in statistics],
+            await session.scalar(select(func.count()).filter(Task.checked)),
+            await session.scalar(select(func.count(Comment.id))),
+            await session.scalar(select(func.count()).select_from(GroupDayMember)),
+            await check_rollups(session),
+        )
+
+
+def test_due_groups_respects_timezone_and_jitter(database):
+    # Полночь по Москве 2 марта — 21:00 UTC 1 марта
+    midnight = datetime(2026, 3, 2, tzinfo=MOSCOW)
+
+    async def test(engine, session_pool):
+        await create_group_day(
+            session_pool, [(1, datetime(2026, 3, 1, 12, tzinfo=timezone.utc))]
+        )
+        async with session_pool() as session:
+            session.add(
+                GroupDayMember(
+                    group_id=UTC_GROUP_ID,
+                    user_id=await session.scalar(select(User.id)),
+                    plan_id=await session.scalar(select(Plan.id)),
+                    published_at=datetime(2026, 3, 1, 12, tzinfo=timezone.utc),
+                )
+            )
+            await session.commit()
+        scheduler = DayRolloverScheduler(FakeBot(), session_pool)
+        jitter = scheduler.jitter(MOSCOW_GROUP_ID)
+        second = timedelta(seconds=1)
+        return (
+            jitter,
+            await scheduler.due_groups(midnight - second),
+            await scheduler.due_groups(midnight + jitter - second),
+            await scheduler.due_groups(midnight + jitter + second),
+        )
+
+    jitter, before_midnight, before_jitter, after_jitter = database(test)
+    assert timedelta(0) < jitter <= timedelta(seconds=900)
+    assert before_midnight == []
+    assert before_jitter == []
+    # В группе с UTC день еще не закончился
+    assert after_jitter == [(MOSCOW_GROUP_ID, midnight)]
+
+
+def test_tick_rolls_over_once(database):
+    now = datetime(2026, 3, 2, 1, tzinfo=MOSCOW)
+
+    async def test(engine, session_pool):
+        # 23:30 по Москве 1 марта
+        await create_group_day(
+            session_pool,
+            [
+                (1, datetime(2026, 3, 1, 20, 30, tzinfo=timezone.utc)),
+                (2, datetime(2026, 3, 1, 9, tzinfo=timezone.utc)),
+                # 00:30 по Москве 2 марта: уже новый день
+                (3, datetime(2026, 3, 1, 21, 30, tzinfo=timezone.utc)),
+            ],
+        )
+        bot = FakeBot()
+        scheduler = DayRolloverScheduler(bot, session_pool)
+        first = await scheduler.tick(now)
+        after_first = await group_state(session_pool)
+        second = await scheduler.tick(now)
+        return first, second, after_first, await group_state(session_pool), bot
+
+    first, second, after_first, after_second, bot = database(test)
+    assert (first, second) == (1, 0)
+    statistics, checked, comments, members, mismatches = after_first
+    assert statistics == [(date(2026, 3, 1), 1, 2), (date(2026, 3, 1), 1, 2)]
+    assert (checked, comments, members) == (1, 1, 1)
+    assert mismatches == []
+    assert after_second == after_first
+    assert len(bot.messages) == 1 and bot.messages[0][0] == MOSCOW_GROUP_ID
+
+
+def test_missed_days_keep_their_dates(database):
+    # Бот не работал три дня
+    now = datetime(2026, 3, 5, 1, tzinfo=MOSCOW)
+
+    async def test(engine, session_pool):
+        await create_group_day(
+            session_pool,
+            [
+                (1, datetime(2026, 3, 1, 20, 30, tzinfo=timezone.utc)),
+                (2, datetime(2026, 3, 3, 9, tzinfo=timezone.utc)),
+            ],
+        )
+        bot = FakeBot()
+        await DayRolloverScheduler(bot, session_pool).tick(now)
+        return await group_state(session_pool), len(bot.messages)
+
+    (statistics, _, _, _, mismatches), messages = database(test)
+    assert [day for day, _, _ in statistics] == [date(2026, 3, 1), date(2026, 3, 3)]
+    assert mismatches == []
+    assert messages == 2
@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+from sqlalchemy import Date, literal, select
+
+from database.models import Plan, Statistic, User
+from database.rollups import (
+    add_to_rollups,
+    check_rollups,
+    rebuild_rollups,
+    week_start,
+    week_start_sql,
+)
+
+GROUP_ID = -100
+# Воскресенье, понедельник и среда: две разные недели
+DAYS = [date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 4)]
+
+
+def test_rollups_check_and_rebuild_on_sqlite(database):
+    async def test(engine, session_pool):
+        async with session_pool() as session:
+            user = User(telegram_id=1, name="Пользователь")
+            plan = Plan(name="План")
+            session.add_all([user, plan])
+            await session.flush()
+            for day in DAYS:
+                session.add(
+                    Statistic(
+                        plan_id=plan.id,
+                        user_id=user.id,
+                        group_id=GROUP_ID,
+                        total_tasks=3,
+                        completed_tasks=2,
+                        study_hours=1.5,
+                        local_date=day,
+                    )
+                )
+                await add_to_rollups(session, 1, GROUP_ID, day, 2, 1.5, 3)
+            await session.commit()
+
+        async with session_pool() as session:
+            consistent = await check_rollups(session)
+            await rebuild_rollups(session)
+            rebuilt = await check_rollups(session)
+            await session.commit()
+        return consistent, rebuilt
+
+    consistent, rebuilt = database(test)
+    assert consistent == []
+    assert rebuilt == []
+
+
+def test_week_start_sql_matches_python(database):
+    days = [date(2026, 3, 1) + timedelta(days=i) for i in range(8)]
+
+    async def test(engine, session_pool):
+        async with session_pool() as session:
+            return [
+                await session.scalar(
+                    select(week_start_sql("sqlite", literal(day, Date)))
+                )
+                for day in days
+            ]
+
+    assert database(test) == [week_start(day) for day in days]
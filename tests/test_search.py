@@ -0,0 +1,116 @@
+import uuid
+
+from sqlalchemy import delete, event, insert, update
+
+from database.models import Plan, Task, User, user_plans
+from database.search import search_plans
+
+TELEGRAM_ID = 1
+OTHER_TELEGRAM_ID = 2
+
+
+async def create_plans(session_pool) -> dict:
+    """
+    Создает базовые планы, план пользователя и план другого пользователя
+    :return: ID планов по названию
+    """
+    async with session_pool() as session:
+        user = User(telegram_id=TELEGRAM_ID, name="Пользователь")
+        other = User(telegram_id=OTHER_TELEGRAM_ID, name="Другой")
+        session.add_all([user, other])
+        await session.flush()
+        plans = {
+            "Утро": ["Зарядка", "Завтрак"],
+            "Работа": ["Важные задачи", "Встречи"],
+            "Мой план": ["Пробежка", "Чтение"],
+            "Чужой план": ["Зарядка"],
+        }
+        ids = {name: uuid.uuid4() for name in plans}
+        await session.execute(
+            insert(Plan), [{"id": ids[name], "name": name} for name in plans]
+        )
+        await session.execute(
+            insert(user_plans),
+            [
+                {"user_id": user.id, "plan_id": ids["Мой план"]},
+                {"user_id": other.id, "plan_id": ids["Чужой план"]},
+            ],
+        )
+        await session.execute(
+            insert(Task),
+            [
+                {"plan_id": ids[name], "body": body, "position": position}
+                for name, bodies in plans.items()
+                for position, body in enumerate(bodies)
+            ],
+        )
+        await session.commit()
+        return ids
+
+
+async def find(session_pool, query: str) -> list:
+    async with session_pool() as session:
+        results = await search_plans(session, TELEGRAM_ID, query)
+    return [(result.plan.name, result.plan_type) for result in results]
+
+
+def test_sqlite_search_matches_case_insensitive_and_fuzzy(database):
+    async def test(engine, session_pool):
+        await create_plans(session_pool)
+        return (
+            await find(session_pool, "ЗАРЯДКА"),
+            await find(session_pool, "зарятка"),
+            await find(session_pool, "пробежка"),
+            await find(session_pool, "плавание"),
+        )
+
+    exact, typo, own, missing = database(test)
+    # План другого пользователя с той же задачей не находится
+    assert exact == [("Утро", "base")]
+    assert typo == [("Утро", "base")]
+    assert own == [("Мой план", "user")]
+    assert missing == []
+
+
+def test_sqlite_search_index_follows_changes(database):
+    async def test(engine, session_pool):
+        ids = await create_plans(session_pool)
+        async with session_pool() as session:
+            await session.execute(
+                update(Plan).filter(Plan.id == ids["Работа"]).values(name="Офис")
+            )
+            await session.execute(delete(Task).filter(Task.body == "Завтрак"))
+            await session.commit()
+        return (
+            await find(session_pool, "Офис"),
+            await find(session_pool, "Работа"),
+            await find(session_pool, "Завтрак"),
+        )
+
+    renamed, old_name, deleted = database(test)
+    assert renamed == [("Офис", "base")]
+    assert old_name == []
+    assert deleted == []
+
+
+def test_sqlite_search_loads_only_matching_plans(database):
+    async def test(engine, session_pool):
+        await create_plans(session_pool)
+        async with session_pool() as session:
+            await session.execute(
+                insert(Plan), [{"name": f"Шаблон {i}"} for i in range(200)]
+            )
+            await session.commit()
+        async with session_pool() as session:
+            loaded = []
+            event.listen(
+                session.sync_session,
+                "loaded_as_persistent",
+                lambda _, instance: loaded.append(instance),
+            )
+            results = await search_plans(session, TELEGRAM_ID, "Зарядка")
+        return len(results), sum(isinstance(item, Plan) for item in loaded)
+
+    found, loaded_plans = database(test)
+    assert found == 1
+    assert loaded_plans == 1
@@ -0,0 +1,165 @@
+import asyncio
+import uuid
+
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from database.models import Plan, Task
+from database.plan import get_plan_tasks
+from services import TaskToggleBuffer
+
+DELAY = 0.01
+
+
+class FakeMessage:
+    def __init__(self):
+        self.markups = []
+
+    async def edit_reply_markup(self, reply_markup=None):
+        self.markups.append(reply_markup)
+
+
+async def create_plan(session_pool) -> str:
+    async with session_pool() as session:
+        plan_id = uuid.uuid4()
+        await session.execute(insert(Plan), [{"id": plan_id, "name": "План"}])
+        await session.execute(
+            insert(Task),
+            [
+                {"plan_id": plan_id, "body": f"Задача {position}", "position": position}
+                for position in range(3)
+            ],
+        )
+        await session.commit()
+        return str(plan_id)
+
+
+async def tap(buffer: TaskToggleBuffer, session_pool, plan_id, index, message):
+    async with session_pool() as session:
+        tasks = await get_plan_tasks(session, plan_id)
+    buffer.toggle(plan_id, tasks[index], message)
+
+
+async def checked(session_pool, plan_id: str) -> list:
+    async with session_pool() as session:
+        return list(
+            await session.scalars(
+                select(Task.checked)
+                .filter(Task.plan_id == uuid.UUID(plan_id))
+                .order_by(Task.position)
+            )
+        )
+
+
+async def settle(buffer: TaskToggleBuffer) -> None:
+    while buffer.timers:
+        await asyncio.gather(*buffer.timers.values(), return_exceptions=True)
+
+
+def test_taps_coalesce_into_one_write_and_one_edit(database, count_statements):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool)
+        buffer = TaskToggleBuffer(session_pool, delay=DELAY)
+        message = FakeMessage()
+        for index in (0, 1, 0, 2):
+            await tap(buffer, session_pool, plan_id, index, message)
+        with count_statements(engine) as statements:
+            await settle(buffer)
+        updates = [s for s in statements if s.startswith("UPDATE tasks")]
+        return len(updates), len(message.markups), await checked(session_pool, plan_id)
+
+    updates, edits, result = database(test)
+    assert updates == 1
+    assert edits == 1
+    assert result == [False, True, True]
+
+
+def test_tap_during_write_is_kept(database):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool)
+        message = FakeMessage()
+
+        class TappingSession(AsyncSession):
+            # Нажатие приходит, пока первая запись еще не зафиксирована
+            async def commit(self):
+                if not tapped:
+                    tapped.append(True)
+                    await tap(buffer, session_pool, plan_id, 1, message)
+                await super().commit()
+
+        tapped = []
+        buffer = TaskToggleBuffer(
+            async_sessionmaker(
+                bind=engine, class_=TappingSession, expire_on_commit=False
+            ),
+            delay=DELAY,
+        )
+        await tap(buffer, session_pool, plan_id, 0, message)
+        await buffer.flush(plan_id)
+        kept = dict(buffer.pending.get(plan_id, {}))
+        await settle(buffer)
+        return kept, buffer.pending, await checked(session_pool, plan_id)
+
+    kept, pending, result = database(test)
+    assert list(kept.values()) == [True]
+    assert pending == {}
+    assert result == [True, True, False]
+
+
+def test_failed_commit_keeps_toggles_and_retries(database):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool)
+        failures = []
+
+        class FailingSession(AsyncSession):
+            async def commit(self):
+                if not failures:
+                    failures.append(True)
+                    raise RuntimeError("database is unavailable")
+                await super().commit()
+
+        buffer = TaskToggleBuffer(
+            async_sessionmaker(
+                bind=engine, class_=FailingSession, expire_on_commit=False
+            ),
+            delay=DELAY,
+        )
+        await tap(buffer, session_pool, plan_id, 2, FakeMessage())
+        await buffer.timers[plan_id]
+        kept = dict(buffer.pending.get(plan_id, {}))
+        retry = plan_id in buffer.timers
+        await settle(buffer)
+        return kept, retry, buffer.pending, await checked(session_pool, plan_id)
+
+    kept, retry, pending, result = database(test)
+    assert list(kept.values()) == [True]
+    assert retry
+    assert pending == {}
+    assert result == [False, False, True]
+
+
+def test_flush_into_caller_session(database):
+    async def test(engine, session_pool):
+        plan_id = await create_plan(session_pool)
+        buffer = TaskToggleBuffer(session_pool, delay=DELAY)
+        await tap(buffer, session_pool, plan_id, 0, FakeMessage())
+
+        # Откат транзакции вызывающего оставляет отметку и ставит таймер
+        async with session_pool() as session:
+            await buffer.flush(plan_id, render=False, session=session)
+            await session.rollback()
+        rolled_back = (plan_id in buffer.pending, plan_id in buffer.timers)
+
+        async with session_pool() as session:
+            await buffer.flush(plan_id, render=False, session=session)
+            # Загруженные задачи видят записанное значение до фиксации
+            tasks = await get_plan_tasks(session, plan_id)
+            seen = tasks[0].checked
+            await session.commit()
+        return rolled_back, seen, buffer.pending, await checked(session_pool, plan_id)
+
+    rolled_back, seen, pending, result = database(test)
+    assert rolled_back == (True, True)
+    assert seen is True
+    assert pending == {}
+    assert result == [True, False, False]
@@ -0,0 +1,73 @@
+import asyncio
+from dataclasses import replace
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from config import load_config
+from webhook import create_app
+
+MAX_CONCURRENCY = 2
+
+
+def update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": update_id, "type": "private"},
+            "from": {"id": update_id, "is_bot": False, "first_name": "User"},
+            "text": text,
+        },
+    }
+
+
+def test_webhook_limits_concurrent_updates():
+    config = replace(
+        load_config(), webhook_path="/webhook", webhook_max_concurrency=MAX_CONCURRENCY
+    )
+
+    async def main():
+        dp = Dispatcher()
+        bot = Bot("123456:test")
+        release = asyncio.Event()
+        running = [0, 0]
+
+        @dp.message()
+        async def handler(message: Message):
+            if message.text == "fail":
+                raise RuntimeError("handler failed")
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+            await release.wait()
+            running[0] -= 1
+
+        async with TestClient(TestServer(create_app(dp, bot, config))) as client:
+            requests = [
+                asyncio.create_task(client.post("/webhook", json=update(i, "slow")))
+                for i in range(1, 5)
+            ]
+            await asyncio.sleep(0.2)
+            # Лишние запросы ждут слота и не получают ответа
+            waiting = sum(not request.done() for request in requests)
+            entered = running[0]
+            healthz = await client.get("/healthz")
+            release.set()
+            statuses = [(await request).status for request in requests]
+            failed = await client.post("/webhook", json=update(9, "fail"))
+            result = (entered, waiting, running[1], statuses)
+            result += (failed.status, healthz.status)
+        await bot.session.close()
+        return result
+
+    entered, waiting, peak, statuses, failed, healthz = asyncio.run(main())
+    assert entered == MAX_CONCURRENCY
+    assert waiting == 4
+    assert peak == MAX_CONCURRENCY
+    assert statuses == [200] * 4
+    # Ошибка обработчика не заставляет Telegram повторять обновление
+    assert failed == 200
+    # Остальные маршруты не ждут слотов вебхука
+    assert healthz == 200
@@ -1,8 +1,13 @@
-from datetime import datetime
-from typing import List, Literal
+import html
+import sys
+from datetime import date, datetime
+from typing import List
 from aiogram.types import Message, InlineKeyboardMarkup, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from database.plan import get_base_plans, get_current_plan, get_user_plans
+from sqlalchemy.ext.asyncio import AsyncSession
+from config import load_config
+from database.cache import TTLCache
+from database.plan import get_current_plan, get_published_plan, load_plan_for_render
 from keyboards import group_keyboard, personal_keyboard, plan_creation_options_keyboard
 import logging
 
@@ -13,11 +18,16 @@ from keyboards.inline import (
     management_keyboard,
 )
 from database.models import Comment, Plan
+from database.rollover import DigestEntry
 from states.user import UserState
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+plan_body_cache = TTLCache(
+    maxsize=load_config().plan_render_cache_size, ttl=float("inf")
+)
+
 
 async def send_message_with_keyboard(
     message: Message,
@@ -43,9 +53,11 @@ async def send_message_with_keyboard(
         await message.answer(text, reply_markup=base_keyboard)
 
 
-async def show_plan_creation_options(message: Message, state: FSMContext):
+async def show_plan_creation_options(
+    message: Message, state: FSMContext, session: AsyncSession
+):
     user_id = message.from_user.id
-    current_plan_name: str | None = get_current_plan(user_id)
+    current_plan_name: str | None = await get_current_plan(session, user_id)
 
     await send_message_with_keyboard(
         message,
@@ -76,7 +88,7 @@ def get_plan_comments(comments: List[Comment]) -> str:
     return "\n    💬 ".join(comment.body for comment in comments)
 
 
-def get_plan_body(plan: Plan) -> str:
+def render_plan_body(plan: Plan) -> str:
     tasks = "\n".join(
         ("✅" if task.checked else " ") + task.body + get_plan_comments(task.comments)
         for task in plan.tasks
@@ -84,6 +96,30 @@ def get_plan_body(plan: Plan) -> str:
     return f"{tasks}"
 
 
+def get_plan_body(plan: Plan) -> str:
+    """
+    Возвращает текст задач плана из кэша по ключу (ID плана, версия).
+    Версия растет при каждом изменении задач и комментариев, поэтому
+    записи не устаревают и вытесняются только по LRU
+    """
+    if plan.version is None:
+        return render_plan_body(plan)
+
+    key = (plan.id, plan.version)
+    body = plan_body_cache.get(key)
+    if body is None:
+        body = render_plan_body(plan)
+        plan_body_cache.set(key, body)
+    return body
+
+
+def plan_render_stats() -> dict:
+    return {
+        **plan_body_cache.stats(),
+        "bytes": sum(sys.getsizeof(body) for _, body in plan_body_cache.items.values()),
+    }
+
+
 def get_full_plan(plan: Plan) -> str:
     current_date = datetime.now().strftime("%d.%m.%Y")
 
@@ -94,6 +130,11 @@ def get_full_plan(plan: Plan) -> str:
 """
 
 
+def get_plan_preview(plan: Plan) -> str:
+    tasks = "\n".join(f"▫️ {html.escape(task.body)}" for task in plan.tasks)
+    return f"<b>📝 {html.escape(plan.name)}</b>\n\n{tasks}"
+
+
 def get_full_current_plan(plan: Plan) -> str:
     return f"<b>Текущий план</b>\n\n{get_full_plan(plan)}"
 
@@ -103,16 +144,38 @@ def get_plan_published_message(plan: Plan, user_name: str) -> str:
     return f"<b><u>{user_name}</u></b> опубликовал(а) свой план на сегодня! 🥳\n\n{get_full_plan(plan)}"
 
 
-def get_plan_by_type_user_id_plan_id(
-    plan_type: Literal["base", "user"], user_id: str | None, plan_id: str
-) -> Plan | None:
+def get_day_digest_message(day: date, entries: List[DigestEntry]) -> str:
+    lines = [f"🌙 <b>Итоги дня {day:%d.%m.%Y}</b>\n"]
+    for number, entry in enumerate(entries, 1):
+        line = (
+            f"{number}. {html.escape(entry.name)} — "
+            f"✅ {entry.completed_tasks}/{entry.total_tasks}"
+        )
+        if entry.study_hours:
+            line += f", 📚 {entry.study_hours:.1f} ч."
+        lines.append(line)
+    lines.append("\nОтметки в планах сброшены, начинается новый день ☀️")
+    return "\n".join(lines)
 
-    if plan_type == "base":
-        plans = get_base_plans()
-    else:
-        plans = get_user_plans(user_id)
 
-    return next((p for p in plans if str(p.id) == plan_id), None)
+async def get_state_plan(
+    state: FSMContext, session: AsyncSession, telegram_id: int | None = None
+) -> Plan | None:
+    """
+    Загружает план, ID которого сохранён в состоянии FSM. Если плана в
+    состоянии нет и передан telegram_id, берётся опубликованный план
+    пользователя и его ID сохраняется в состоянии
+    """
+    plan_id = (await state.get_data()).get("plan_id")
+    if plan_id:
+        return await load_plan_for_render(session, plan_id)
+    if telegram_id is None:
+        return None
+
+    plan = await get_published_plan(session, telegram_id)
+    if plan:
+        await state.update_data(plan_id=str(plan.id))
+    return plan
 
 
 async def send_welcome_message(message: Message, user_name: str):
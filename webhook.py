@@ -0,0 +1,103 @@
+import asyncio
+from functools import partial
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from config import Config
+from database.user import identity_cache
+from utils import logger, plan_render_stats
+
+
+def concurrency_limit(path: str, max_concurrency: int):
+    """
+    aiohttp-middleware, которое держит в работе не больше max_concurrency
+    запросов вебхука. Обновление обрабатывается до ответа Telegram, поэтому
+    пока все слоты заняты, новый запрос ждет свободного слота, Telegram
+    не получает ответа и нагрузка не копится в памяти
+    :param path: Путь вебхука, остальные маршруты не ограничиваются
+    :param max_concurrency: Сколько обновлений обрабатывается одновременно
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    @web.middleware
+    async def middleware(request: web.Request, handler) -> web.StreamResponse:
+        if request.path != path:
+            return await handler(request)
+        async with semaphore:
+            try:
+                return await handler(request)
+            except web.HTTPException:
+                raise
+            except Exception as e:
+                # Ответ с ошибкой заставит Telegram присылать обновление снова
+                logger.error(f"Error processing webhook update: {e}")
+                return web.Response()
+
+    return middleware
+
+
+async def healthz(dp: Dispatcher, request: web.Request) -> web.Response:
+    caches = {"plan_render": plan_render_stats(), "identity": identity_cache.stats()}
+    if "edit_dedup" in dp.workflow_data:
+        caches["edit_dedup"] = dp["edit_dedup"].stats()
+    status = {"status": "ok", "caches": caches}
+    if "update_ordering" in dp.workflow_data:
+        status["updates"] = dp["update_ordering"].stats()
+    return web.json_response(status)
+
+
+async def metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        body=generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+def create_app(dp: Dispatcher, bot: Bot, config: Config) -> web.Application:
+    """
+    Собирает aiohttp-приложение для режима вебхука
+    :param dp: Диспетчер с подключенными роутерами
+    :param bot: Экземпляр бота
+    :param config: Конфигурация бота
+    :return: Приложение с маршрутами вебхука, /healthz и /metrics
+    """
+    app = web.Application(
+        middlewares=[
+            concurrency_limit(config.webhook_path, config.webhook_max_concurrency)
+        ]
+    )
+    app.router.add_get("/healthz", partial(healthz, dp))
+    app.router.add_get("/metrics", metrics)
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        handle_in_background=False,
+        secret_token=config.webhook_secret,
+    ).register(app, path=config.webhook_path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook(dp: Dispatcher, bot: Bot, config: Config) -> None:
+    await bot.set_webhook(
+        f"{config.webhook_url.rstrip('/')}{config.webhook_path}",
+        secret_token=config.webhook_secret,
+        allowed_updates=dp.resolve_used_update_types(),
+        drop_pending_updates=False,
+    )
+
+    runner = web.AppRunner(create_app(dp, bot, config))
+    await runner.setup()
+    site = web.TCPSite(runner, config.webapp_host, config.webapp_port)
+    await site.start()
+    logger.info(
+        f"Webhook server listening on {config.webapp_host}:{config.webapp_port}"
+        f"{config.webhook_path}"
+    )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()